@@ -0,0 +1,152 @@
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from app.config import DATABASE_NAME, ARCHIVE_AFTER_DAYS
+from app.services.transfer import FORMATS, detect_format, import_records, export_chunks
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="Без аргументов запускает бота. Команды импорта и выгрузки данных:"
+    )
+    parser.add_argument("--db", default=DATABASE_NAME, help="файл базы данных")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="загрузить мастеров или записи из файла")
+    import_parser.add_argument("kind", choices=["masters", "appointments"])
+    import_parser.add_argument("path", help="файл CSV с заголовком или JSONL")
+    import_parser.add_argument("--format", choices=FORMATS, help="по умолчанию по расширению")
+
+    export_parser = commands.add_parser("export", help="выгрузить записи, архив записей или отзывы")
+    export_parser.add_argument("kind", choices=["appointments", "archive", "reviews"])
+    export_parser.add_argument("-o", "--output", help="файл (по умолчанию stdout)")
+    export_parser.add_argument("--format", choices=FORMATS, help="по умолчанию по расширению или csv")
+
+    archive_parser = commands.add_parser("archive", help="перенести старые записи в архив")
+    archive_parser.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS,
+                                help="записи старше этого числа дней")
+
+    commands.add_parser("rebuild-ratings", help="пересчитать агрегаты рейтингов по отзывам")
+
+    schedule_parser = commands.add_parser("schedule", help="задать рабочие часы мастера")
+    schedule_parser.add_argument("master_id", type=int)
+    days = schedule_parser.add_mutually_exclusive_group(required=True)
+    days.add_argument("--weekdays", help="дни недели через запятую, 0 — понедельник")
+    days.add_argument("--date", help="исключение на дату ГГГГ-ММ-ДД")
+    days.add_argument("--reset", action="store_true", help="вернуть часы по умолчанию")
+    schedule_parser.add_argument("--hours", help="рабочие часы ЧЧ:ММ-ЧЧ:ММ, без них — выходной")
+    return parser
+
+def parse_hours(hours):
+    """'ЧЧ:ММ-ЧЧ:ММ' -> (начало, конец); None — выходной"""
+    if hours is None:
+        return None, None
+    start_time, end_time = (
+        datetime.strptime(part.strip(), "%H:%M").strftime("%H:%M") for part in hours.split("-")
+    )
+    if start_time >= end_time:
+        raise ValueError("начало рабочего дня должно быть раньше конца")
+    return start_time, end_time
+
+def run_schedule(db, args):
+    """Изменение расписания мастера; возвращает код завершения"""
+    if args.reset:
+        return 0 if db.reset_master_schedule(args.master_id) else 1
+    try:
+        start_time, end_time = parse_hours(args.hours)
+        if args.date:
+            date = datetime.strptime(args.date, "%Y-%m-%d").strftime("%Y-%m-%d")
+            return 0 if db.set_master_exception(args.master_id, date, start_time, end_time) else 1
+        weekdays = [int(day) for day in args.weekdays.split(",")]
+        if any(day not in range(7) for day in weekdays):
+            raise ValueError("дни недели задаются числами от 0 до 6")
+    except ValueError as e:
+        print(f"Неверное расписание: {e}", file=sys.stderr)
+        return 2
+    return 0 if db.set_master_schedule(args.master_id, weekdays, start_time, end_time) else 1
+
+async def run_archive(db_name, days):
+    """Архивация тем же сервисом, что и у бота; возвращает код завершения"""
+    from app.database.async_db import AsyncDatabase
+    from app.services.archive import ArchiveService
+
+    db = AsyncDatabase(db_name)
+    service = ArchiveService(db, scheduler=None)
+    try:
+        total, error = await service.archive_old_appointments(days)
+        is_leader = service.leader.is_leader
+        await service.leader.release()
+    finally:
+        db.close()
+    if error:
+        print(error, file=sys.stderr)
+        return 1
+    if not is_leader and not total:
+        print("Архивацию сейчас выполняет запущенный бот", file=sys.stderr)
+        return 1
+    print(f"Перенесено в архив записей: {total}")
+    return 0
+
+def run_cli(argv):
+    """Выполнение команды; возвращает код завершения"""
+    from app.database.db import Database
+
+    args = build_parser().parse_args(argv)
+    if args.command == "schedule":
+        db = Database(args.db)
+        try:
+            code = run_schedule(db, args)
+        finally:
+            db.close()
+        if code == 1:
+            print("Ошибка сохранения расписания", file=sys.stderr)
+        return code
+
+    if args.command == "rebuild-ratings":
+        db = Database(args.db)
+        try:
+            count = db.rebuild_rating_stats()
+        finally:
+            db.close()
+        if count is None:
+            print("Ошибка пересчета рейтингов", file=sys.stderr)
+            return 1
+        print(f"Пересчитано агрегатов: {count}")
+        return 0
+
+    if args.command == "archive":
+        return asyncio.run(run_archive(args.db, args.days))
+
+    if args.command == "import":
+        fmt = args.format or detect_format(args.path)
+        if fmt is None:
+            print("Не удалось определить формат файла, укажите --format", file=sys.stderr)
+            return 2
+        db = Database(args.db)
+        try:
+            with open(args.path, encoding="utf-8-sig", newline="") as f:
+                count, error = import_records(db, args.kind, f, fmt)
+        finally:
+            db.close()
+        if error:
+            print(f"Импорт отменен: {error}", file=sys.stderr)
+            return 1
+        print(f"Импортировано строк: {count}")
+        return 0
+
+    fmt = args.format or (args.output and detect_format(args.output)) or "csv"
+    db = Database(args.db)
+    output = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for chunk in export_chunks(db, args.kind, fmt):
+            output.write(chunk)
+    except RuntimeError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        db.close()
+    return 0
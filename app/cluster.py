@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+
+from aiogram import Dispatcher
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.config import (
+    BOT_MODE,
+    DROP_PENDING_UPDATES,
+    METRICS_PORT,
+    OUTBOX_GLOBAL_RATE,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_CONCURRENCY
+)
+from app.webhook import WebhookServer
+
+# Типы обновлений, которые обрабатывает бот
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+def shard_key(update):
+    """ID чата обновления: все обновления одного чата идут в один процесс"""
+    for field, event in update.items():
+        if not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        if event.get("from"):
+            return event["from"]["id"]
+    return 0
+
+
+# Процесс-обработчик
+def worker_main(index, queue, ready):
+    # Остановку обработчиков выполняет входной процесс через очередь
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(run_worker(index, queue, ready))
+
+
+async def run_worker(index, queue, ready):
+    from app.database.async_db import AsyncDatabase
+    from app.database.fsm_storage import create_fsm_storage
+    from app.handlers import register_handlers
+    from app.main import create_bot
+
+    db = AsyncDatabase()
+    storage = create_fsm_storage(db)
+    bot = create_bot()
+    dp = Dispatcher(storage=storage)
+    scheduler = AsyncIOScheduler()
+    register_handlers(dp, bot, scheduler, db)
+    scheduler.start()
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    logging.info(f"Обработчик {index} запущен (pid {os.getpid()})")
+    ready.set()
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(WEBHOOK_CONCURRENCY)
+    tasks = set()
+
+    async def process(update):
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logging.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+        finally:
+            semaphore.release()
+
+    try:
+        while True:
+            update = await loop.run_in_executor(None, queue.get)
+            if update is None:
+                break
+            await semaphore.acquire()
+            task = asyncio.create_task(process(update))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # Дожидаемся обработки уже принятых обновлений
+        if tasks:
+            await asyncio.wait(set(tasks))
+    finally:
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        scheduler.shutdown()
+        await storage.close()
+        db.close()
+        logging.info(f"Обработчик {index} остановлен")
+
+
+# Входной процесс
+class ClusterIngress:
+    """Получение обновлений и распределение их по процессам по ID чата"""
+
+    def __init__(self, workers):
+        self.workers_count = workers
+        context = multiprocessing.get_context("spawn")
+        self.queues = [context.Queue() for _ in range(workers)]
+        self.ready = [context.Event() for _ in range(workers)]
+        self.processes = [
+            context.Process(
+                target=worker_main, args=(i, self.queues[i], self.ready[i]), name=f"bot-worker-{i}"
+            )
+            for i in range(workers)
+        ]
+
+    def start(self):
+        # Глобальный лимит исходящих сообщений делится между процессами
+        os.environ["OUTBOX_GLOBAL_RATE"] = str(OUTBOX_GLOBAL_RATE / self.workers_count)
+        for i, process in enumerate(self.processes):
+            # Каждый обработчик отдает метрики на своем порту
+            if METRICS_PORT:
+                os.environ["METRICS_PORT"] = str(METRICS_PORT + i)
+            process.start()
+
+    def wait_ready(self):
+        """Ожидание запуска всех обработчиков"""
+        for event, process in zip(self.ready, self.processes):
+            while not event.wait(1):
+                if not process.is_alive():
+                    raise RuntimeError(f"Обработчик {process.name} завершился при запуске")
+
+    def route(self, update):
+        self.queues[shard_key(update) % self.workers_count].put(update)
+
+    def stop(self):
+        for queue in self.queues:
+            queue.put(None)
+        for process in self.processes:
+            process.join()
+
+
+class IngressWebhookServer(WebhookServer):
+    """Webhook, который не обрабатывает обновления, а передает их обработчикам"""
+
+    def __init__(self, ingress):
+        super().__init__(dp=None, bot=None)
+        self.ingress = ingress
+
+    async def _process(self, update):
+        try:
+            self.ingress.route(update)
+        finally:
+            self.semaphore.release()
+
+
+async def poll_updates(bot, ingress, stop):
+    offset = None
+    while not stop.is_set():
+        try:
+            updates = await bot.get_updates(
+                offset=offset, timeout=10, allowed_updates=ALLOWED_UPDATES
+            )
+        except Exception as e:
+            logging.error(f"Ошибка получения обновлений: {e}")
+            await asyncio.sleep(1)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            ingress.route(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+
+
+async def run_cluster(workers, bot=None, stop=None, ready=None):
+    """Запуск входного процесса и workers процессов-обработчиков"""
+    from aiohttp import web
+    from app.main import create_bot
+
+    bot = bot or create_bot()
+    stop = stop or asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    ingress = ClusterIngress(workers)
+    ingress.start()
+
+    runner = None
+    try:
+        # Обновления начинаем принимать, когда все обработчики готовы
+        await loop.run_in_executor(None, ingress.wait_ready)
+        logging.info(f"Запущено обработчиков: {workers}")
+        if ready:
+            ready.set()
+
+        if BOT_MODE == "webhook":
+            server = IngressWebhookServer(ingress)
+            runner = web.AppRunner(server.create_app())
+            await runner.setup()
+            await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+            await bot.set_webhook(
+                f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+                secret_token=server.secret,
+                allowed_updates=ALLOWED_UPDATES,
+                drop_pending_updates=DROP_PENDING_UPDATES
+            )
+            await stop.wait()
+            await server.drain()
+        else:
+            await bot.delete_webhook(drop_pending_updates=DROP_PENDING_UPDATES)
+            polling = asyncio.create_task(poll_updates(bot, ingress, stop))
+            await stop.wait()
+            polling.cancel()
+            await asyncio.gather(polling, return_exceptions=True)
+    finally:
+        if runner:
+            await runner.cleanup()
+        await loop.run_in_executor(None, ingress.stop)
+        await bot.session.close()
@@ -16,6 +16,89 @@ BOT_TOKEN = os.getenv('BOT_TOKEN', '7300868368:AAG5so8v4nh8QojFobdOL7VhmEm_YLP6W
 ADMIN_ID = int(os.getenv('ADMIN_ID', '5170509558'))
 DATABASE_NAME = os.getenv('DATABASE_NAME', 'salon.db')
 
+# Рассылка напоминаний: размер пачки за один запрос
+REMINDER_BATCH_SIZE = int(os.getenv('REMINDER_BATCH_SIZE', '100'))
+
+# Режим получения обновлений: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+# Сбрасывать ли накопившиеся обновления при старте
+DROP_PENDING_UPDATES = os.getenv('DROP_PENDING_UPDATES', 'false').lower() == 'true'
+
+# Настройки webhook: публичный адрес, секрет и локальный сервер
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+# Максимум одновременно обрабатываемых обновлений и время на дообработку при остановке
+WEBHOOK_CONCURRENCY = int(os.getenv('WEBHOOK_CONCURRENCY', '100'))
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '30'))
+
+# Профиль подключения SQLite: tuned (WAL, synchronous=NORMAL, mmap, кэш страниц)
+# или default (настройки sqlite по умолчанию)
+DB_PROFILE = os.getenv('DB_PROFILE', 'tuned')
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '65536'))
+# Число соединений только для чтения (0 — все запросы через соединение писателя)
+DB_READERS = int(os.getenv('DB_READERS', '4'))
+# Число подготовленных выражений, которые sqlite3 хранит для повторного использования
+DB_STATEMENT_CACHE = int(os.getenv('DB_STATEMENT_CACHE', '256'))
+
+# Адрес Bot API (пусто — api.telegram.org), например для локального Bot API сервера
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', '')
+
+# Число процессов-обработчиков: больше 1 — режим кластера с общей базой
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '1'))
+# Время аренды лидерства (сек): лидер выполняет рассылку напоминаний
+LEADER_LEASE_TTL = int(os.getenv('LEADER_LEASE_TTL', '180'))
+
+# Хранилище состояний FSM: memory, sqlite или redis
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'sqlite')
+# Время жизни неактивной сессии (сек) и период записи изменений на диск (сек)
+FSM_TTL = int(os.getenv('FSM_TTL', str(24 * 60 * 60)))
+FSM_FLUSH_INTERVAL = float(os.getenv('FSM_FLUSH_INTERVAL', '1'))
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+# Количество записей на странице админ-панели
+ADMIN_PAGE_SIZE = int(os.getenv('ADMIN_PAGE_SIZE', '10'))
+
+# Время жизни карты занятости слотов в памяти (сек): другие процессы
+# могут бронировать те же слоты
+SLOT_CACHE_TTL = int(os.getenv('SLOT_CACHE_TTL', '60'))
+
+# Архивация: записи старше ARCHIVE_AFTER_DAYS дней переносятся в архив
+# ежедневно в ARCHIVE_HOUR часов пачками по ARCHIVE_BATCH_SIZE
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '30'))
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '500'))
+ARCHIVE_HOUR = int(os.getenv('ARCHIVE_HOUR', '4'))
+
+# Лист ожидания: освободившийся слот удерживается за первым в очереди
+# WAITLIST_HOLD_MINUTES минут, пока он не подтвердит запись
+WAITLIST_HOLD_MINUTES = int(os.getenv('WAITLIST_HOLD_MINUTES', '15'))
+
+# Рабочие часы мастера, для которого не задано расписание, и шаг сетки
+# времени начала записи в минутах
+WORK_DAY_START = os.getenv('WORK_DAY_START', '11:00')
+WORK_DAY_END = os.getenv('WORK_DAY_END', '23:00')
+SLOT_STEP_MINUTES = int(os.getenv('SLOT_STEP_MINUTES', '60'))
+
+# Сколько ближайших свободных времен показывать при поиске по всем мастерам
+FIRST_AVAILABLE_LIMIT = int(os.getenv('FIRST_AVAILABLE_LIMIT', '8'))
+
+# Кэш мастеров: максимальное число записей и время жизни в секундах
+MASTER_CACHE_SIZE = int(os.getenv('MASTER_CACHE_SIZE', '1024'))
+MASTER_CACHE_TTL = int(os.getenv('MASTER_CACHE_TTL', '300'))
+
+# Метрики в формате Prometheus на http://METRICS_HOST:METRICS_PORT/metrics (0 — выключены)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Очередь исходящих сообщений: лимиты Telegram и повторы
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '8'))
+OUTBOX_GLOBAL_RATE = float(os.getenv('OUTBOX_GLOBAL_RATE', '25'))
+OUTBOX_CHAT_RATE = float(os.getenv('OUTBOX_CHAT_RATE', '1'))
+OUTBOX_MAX_RETRIES = int(os.getenv('OUTBOX_MAX_RETRIES', '5'))
+
 # Список доступных услуг с emoji
 SERVICES = {
     "Маникюр": "💅",
@@ -23,3 +106,12 @@ SERVICES = {
     "Стрижка": "✂️",
     "Покраска": "🎨"
 }
+
+# Длительность услуг в минутах; для услуг не из списка — DEFAULT_SERVICE_DURATION
+SERVICE_DURATIONS = {
+    "Маникюр": 60,
+    "Педикюр": 60,
+    "Стрижка": 60,
+    "Покраска": 180
+}
+DEFAULT_SERVICE_DURATION = 60
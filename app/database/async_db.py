@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import DATABASE_NAME, DB_READERS
+from app.database.db import Database
+from app.database.cache import MasterCache
+from app.utils.metrics import DB_QUERY_LATENCY
+
+def _timed(func, *args, **kwargs):
+    """Вызов метода Database с записью времени выполнения в метрики"""
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        DB_QUERY_LATENCY.observe(time.perf_counter() - started, getattr(func, "__name__", "other"))
+
+class AsyncDatabase:
+    """Асинхронный доступ к базе: запросы Database выполняются вне event loop"""
+
+    def __init__(self, db_name=DATABASE_NAME, readers=DB_READERS):
+        self.sync = Database(db_name)
+        # SQLite допускает одного писателя, поэтому запись идет через один поток
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        # Методы чтения идут в пул соединений только для чтения. В режиме WAL
+        # читатели не ждут писателя и видят последнее зафиксированное состояние.
+        self._reader_executor = None
+        self._reader_local = threading.local()
+        self._readers = []
+        self._readers_lock = threading.Lock()
+        if readers > 0 and self._is_wal():
+            self._reader_executor = ThreadPoolExecutor(
+                max_workers=readers, thread_name_prefix="db-reader"
+            )
+        self.master_cache = MasterCache()
+
+    def _is_wal(self):
+        try:
+            return self.sync.conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+        except Exception:
+            return False
+
+    def __getattr__(self, name):
+        # Вызывается только для атрибутов, которых нет у самой обёртки
+        attr = getattr(self.sync, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        if getattr(attr, 'read_only', False):
+            @functools.wraps(attr)
+            async def method(*args, **kwargs):
+                return await self.run_read(name, *args, **kwargs)
+        else:
+            @functools.wraps(attr)
+            async def method(*args, **kwargs):
+                return await self.run(attr, *args, **kwargs)
+
+        # Кэшируем обёртку, чтобы не создавать её на каждый вызов
+        setattr(self, name, method)
+        return method
+
+    # Мастера читаются через кэш, изменения его сбрасывают
+    async def get_master_by_id(self, master_id):
+        found, master = self.master_cache.get_by_id(master_id)
+        if not found:
+            master = await self.run_read('get_master_by_id', master_id)
+            self.master_cache.put_by_id(master_id, master)
+        return master
+
+    async def get_master_by_telegram_id(self, telegram_id):
+        found, master = self.master_cache.get_by_telegram_id(telegram_id)
+        if not found:
+            master = await self.run_read('get_master_by_telegram_id', telegram_id)
+            self.master_cache.put_by_telegram_id(telegram_id, master)
+        return master
+
+    async def add_master(self, data):
+        success = await self.run(self.sync.add_master, data)
+        # Новый id мог быть закэширован как отсутствующий; мастера добавляют редко
+        self.master_cache.clear()
+        return success
+
+    async def delete_master(self, master_id):
+        success = await self.run(self.sync.delete_master, master_id)
+        self.master_cache.invalidate(master_id=master_id)
+        return success
+
+    async def run(self, func, *args, **kwargs):
+        """Выполнение синхронной функции в потоке базы данных"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(_timed, func, *args, **kwargs)
+        )
+
+    async def run_read(self, name, *args, **kwargs):
+        """Выполнение метода чтения Database в пуле читателей"""
+        if self._reader_executor is None:
+            # Без WAL (или для :memory:) читаем через соединение писателя
+            return await self.run(getattr(self.sync, name), *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._reader_executor, functools.partial(self._read, name, *args, **kwargs)
+        )
+
+    def _read(self, name, *args, **kwargs):
+        # У каждого потока пула свое соединение
+        reader = getattr(self._reader_local, 'db', None)
+        if reader is None:
+            reader = Database(self.sync.db_name, profile=self.sync.profile, readonly=True)
+            self._reader_local.db = reader
+            with self._readers_lock:
+                self._readers.append(reader)
+        return _timed(getattr(reader, name), *args, **kwargs)
+
+    def close(self):
+        try:
+            if self._reader_executor:
+                self._reader_executor.shutdown(wait=True)
+                for reader in self._readers:
+                    reader.close()
+            self._executor.shutdown(wait=True)
+            self.sync.close()
+            logging.info("Соединение с базой данных закрыто")
+        except Exception as e:
+            logging.error(f"Ошибка закрытия базы данных: {e}")
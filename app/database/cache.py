@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+
+from app.config import MASTER_CACHE_SIZE, MASTER_CACHE_TTL
+
+class MasterCache:
+    """LRU-кэш записей мастеров по id и telegram_id с ограниченным временем жизни"""
+
+    def __init__(self, maxsize=MASTER_CACHE_SIZE, ttl=MASTER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._by_id = OrderedDict()
+        self._by_telegram_id = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_by_id(self, master_id):
+        """Возвращает (найдено, мастер); мастер может быть None, если его нет в базе"""
+        return self._get(self._by_id, master_id)
+
+    def get_by_telegram_id(self, telegram_id):
+        return self._get(self._by_telegram_id, telegram_id)
+
+    def put_by_id(self, master_id, master):
+        self._put(self._by_id, master_id, master)
+        if master is not None and master.telegram_id is not None:
+            self._put(self._by_telegram_id, master.telegram_id, master)
+
+    def put_by_telegram_id(self, telegram_id, master):
+        self._put(self._by_telegram_id, telegram_id, master)
+        if master is not None:
+            self._put(self._by_id, master.id, master)
+
+    def invalidate(self, master_id=None, telegram_id=None):
+        """Удаление мастера из кэша (в том числе закэшированного отсутствия)"""
+        if master_id is not None:
+            entry = self._by_id.pop(master_id, None)
+            if entry and entry[1] is not None:
+                self._by_telegram_id.pop(entry[1].telegram_id, None)
+            # Запись по telegram_id могла попасть в кэш без записи по id
+            for key, (_, master) in list(self._by_telegram_id.items()):
+                if master is not None and master.id == master_id:
+                    del self._by_telegram_id[key]
+        if telegram_id is not None:
+            entry = self._by_telegram_id.pop(telegram_id, None)
+            if entry and entry[1] is not None:
+                self._by_id.pop(entry[1].id, None)
+
+    def clear(self):
+        self._by_id.clear()
+        self._by_telegram_id.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size': len(self._by_id) + len(self._by_telegram_id)
+        }
+
+    def _get(self, storage, key):
+        entry = storage.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del storage[key]
+            self.misses += 1
+            return False, None
+        storage.move_to_end(key)
+        self.hits += 1
+        return True, entry[1]
+
+    def _put(self, storage, key, master):
+        storage[key] = (time.monotonic() + self.ttl, master)
+        storage.move_to_end(key)
+        while len(storage) > self.maxsize:
+            storage.popitem(last=False)
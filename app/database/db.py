@@ -1,21 +1,93 @@
 import sqlite3
 import logging
-from app.config import DATABASE_NAME
+import pathlib
+import time as clock
+from app.config import (
+    DATABASE_NAME,
+    DB_PROFILE,
+    DB_MMAP_SIZE,
+    DB_CACHE_SIZE_KB,
+    DB_STATEMENT_CACHE,
+    DEFAULT_SERVICE_DURATION
+)
+from app.database.migrations import apply_migrations, RATING_STATS_BACKFILL
+from app.models.records import Appointment, Master, RatingStats, Review, new_unique_id
+from app.services.availability import service_duration, to_minutes
+
+def read_only(method):
+    """Метод только читает базу: AsyncDatabase выполняет его в пуле читателей"""
+    method.read_only = True
+    return method
+
+def _records(cls, cursor):
+    """Записи cls из строк курсора: имена колонок SELECT совпадают с полями"""
+    names = [column[0] for column in cursor.description]
+    return [cls(**dict(zip(names, row))) for row in cursor]
+
+def _record(cls, cursor):
+    """Первая строка курсора как запись cls или None"""
+    row = cursor.fetchone()
+    return cls(**dict(zip(row.keys(), row))) if row else None
+
+# PRAGMA, которые выполняются при открытии соединения
+DB_PROFILES = {
+    'default': {},
+    'tuned': {
+        # Читатели не блокируют писателя, коммит пишет только в журнал
+        'journal_mode': 'WAL',
+        # В режиме WAL fsync нужен только при checkpoint
+        'synchronous': 'NORMAL',
+        'mmap_size': DB_MMAP_SIZE,
+        # Отрицательное значение — размер в килобайтах
+        'cache_size': -DB_CACHE_SIZE_KB,
+        'temp_store': 'MEMORY',
+    },
+}
 
 class Database:
-    def __init__(self):
+    def __init__(self, db_name=DATABASE_NAME, profile=DB_PROFILE, readonly=False):
+        self.db_name = db_name
+        self.profile = profile
+        # Соединение только для чтения: схему создает и меняет писатель
+        self.readonly = readonly
         self.conn = None
         self.create_connections()
-        self.create_tables()
+        if not readonly:
+            self.create_tables()
 
     def create_connections(self):
+        # SELECT-методы не оборачиваются в with self.conn: чтение не открывает
+        # транзакцию, и коммит для него не нужен
         try:
-            self.conn = sqlite3.connect(DATABASE_NAME, check_same_thread=False)
+            if self.readonly:
+                self.conn = sqlite3.connect(
+                    f"{pathlib.Path(self.db_name).absolute().as_uri()}?mode=ro",
+                    uri=True,
+                    check_same_thread=False,
+                    cached_statements=DB_STATEMENT_CACHE
+                )
+            else:
+                self.conn = sqlite3.connect(
+                    self.db_name,
+                    check_same_thread=False,
+                    cached_statements=DB_STATEMENT_CACHE
+                )
             self.conn.row_factory = sqlite3.Row
-            logging.info("Подключились к базе данных")
+            for pragma, value in DB_PROFILES[self.profile].items():
+                # Режим журнала задает писатель, он хранится в файле базы
+                if self.readonly and pragma == 'journal_mode':
+                    continue
+                self.conn.execute(f"PRAGMA {pragma} = {value}")
+            if not self.readonly:
+                logging.info(f"Подключились к базе данных (профиль {self.profile})")
         except sqlite3.Error as e:
             logging.error(f"Ошибка подключения к базе: {e}")
 
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
     def create_tables(self):
         try:
             with self.conn:
@@ -55,60 +127,227 @@ class Database:
                         telegram_id INTEGER UNIQUE,
                         username TEXT
                     )''')
+
+            # Индексы и последующие изменения схемы
+            apply_migrations(self.conn)
             
             logging.info("Таблицы созданы или уже существуют")
         except sqlite3.Error as e:
+            # Без схемы бот работать не может: не запускаемся на полусобранной базе
             logging.error(f"Ошибка создания таблиц: {e}")
+            raise
 
     # Методы для записей
     def create_appointment(self, data):
+        # Атомарное бронирование: BEGIN IMMEDIATE берет блокировку записи до
+        # проверки пересечений, так что между проверкой и INSERT интервал не
+        # займет другой процесс. Уникальный индекс idx_appointments_slot
+        # остается страховкой. Возвращает None, если время уже занято.
+        # unique_id, уже занятый (в том числе в архиве), заменяется в data.
+        duration = data.get('duration', DEFAULT_SERVICE_DURATION)
         try:
             with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                if self._overlaps(data['master_id'], data['date'], data['time'], duration):
+                    return None
+                while self._unique_id_taken(data['unique_id']):
+                    data['unique_id'] = new_unique_id()
                 self.conn.execute('''
                     INSERT INTO appointments 
-                    (user_id, service, date, time, unique_id, master_id, status) 
-                    VALUES (?, ?, ?, ?, ?, ?, 'active')
+                    (user_id, service, date, time, unique_id, master_id, status, duration) 
+                    VALUES (?, ?, ?, ?, ?, ?, 'active', ?)
                 ''', (data['user_id'], data['service'], data['date'], 
-                      data['time'], data['unique_id'], data['master_id']))
+                      data['time'], data['unique_id'], data['master_id'], duration))
             return True
+        except sqlite3.IntegrityError as e:
+            if 'appointments.master_id' in str(e):
+                return None
+            logging.error(f"Ошибка создания записи: {e}")
+            return False
         except Exception as e:
             logging.error(f"Ошибка создания записи: {e}")
             return False
 
-    def get_booked_times(self, date, service):
+    def _unique_id_taken(self, unique_id):
+        # unique_id уникален в каждой таблице отдельно, а отзывы и выгрузка
+        # ищут запись по обеим: повтор ID из архива сломал бы архивацию
+        row = self.conn.execute('''
+            SELECT 1 FROM appointments WHERE unique_id = ?
+            UNION ALL
+            SELECT 1 FROM appointments_archive WHERE unique_id = ?
+            LIMIT 1
+        ''', (unique_id, unique_id)).fetchone()
+        return row is not None
+
+    def _overlaps(self, master_id, date, time, duration):
+        # Пересекается ли [time, time + duration) с активной или удерживаемой
+        # записью мастера; записи дня выбираются по idx_appointments_slot
+        start = to_minutes(time)
+        row = self.conn.execute('''
+            SELECT 1 FROM appointments
+            WHERE master_id = ? AND date = ? AND status IN ('active', 'held')
+              AND substr(time, 1, 2) * 60 + substr(time, 4, 2) < ?
+              AND substr(time, 1, 2) * 60 + substr(time, 4, 2) + duration > ?
+            LIMIT 1
+        ''', (master_id, date, start + duration, start)).fetchone()
+        return row is not None
+
+    @read_only
+    def get_master_day(self, master_id, date, weekday):
+        # Рабочие часы и занятые интервалы мастера на день.
+        # hours: None — расписание не задано (часы по умолчанию), () — выходной,
+        # (start_time, end_time) — рабочие часы. busy: [(time, duration)].
+        try:
+            row = self.conn.execute('''
+                SELECT start_time, end_time FROM master_schedule_exceptions
+                WHERE master_id = ? AND date = ?
+            ''', (master_id, date)).fetchone()
+            if row is None:
+                row = self.conn.execute('''
+                    SELECT start_time, end_time FROM master_schedules
+                    WHERE master_id = ? AND weekday = ?
+                ''', (master_id, weekday)).fetchone()
+            hours = None if row is None else (tuple(row) if row[0] else ())
+
+            busy = self.conn.execute('''
+                SELECT time, duration FROM appointments
+                WHERE master_id = ? AND date = ? AND status IN ('active', 'held')
+            ''', (master_id, date)).fetchall()
+            return hours, [tuple(interval) for interval in busy]
+        except Exception as e:
+            logging.error(f"Ошибка получения расписания мастера на день: {e}")
+            return None, []
+
+    @read_only
+    def get_service_availability(self, service, date_from, date_to):
+        # Все данные для поиска ближайшего времени по мастерам услуги за один
+        # вызов: мастера, расписания, исключения и занятые интервалы за период.
+        # Записи выбираются по idx_appointments_slot диапазоном дат у каждого мастера.
+        try:
+            masters = _records(Master, self.conn.execute('''
+                SELECT id, first_name, last_name, username
+                FROM masters
+                WHERE service = ?
+            ''', (service,)))
+            schedules = self.conn.execute('''
+                SELECT s.master_id, s.weekday, s.start_time, s.end_time
+                FROM masters m
+                JOIN master_schedules s ON s.master_id = m.id
+                WHERE m.service = ?
+            ''', (service,)).fetchall()
+            exceptions = self.conn.execute('''
+                SELECT e.master_id, e.date, e.start_time, e.end_time
+                FROM masters m
+                JOIN master_schedule_exceptions e ON e.master_id = m.id
+                WHERE m.service = ? AND e.date BETWEEN ? AND ?
+            ''', (service, date_from, date_to)).fetchall()
+            busy = self.conn.execute('''
+                SELECT a.master_id, a.date, a.time, a.duration
+                FROM masters m
+                JOIN appointments a ON a.master_id = m.id
+                WHERE m.service = ? AND a.date BETWEEN ? AND ?
+                  AND a.status IN ('active', 'held')
+            ''', (service, date_from, date_to)).fetchall()
+            return (
+                masters,
+                [tuple(row) for row in schedules],
+                [tuple(row) for row in exceptions],
+                [tuple(row) for row in busy]
+            )
+        except Exception as e:
+            logging.error(f"Ошибка получения занятости мастеров услуги: {e}")
+            return [], [], [], []
+
+    def set_master_schedule(self, master_id, weekdays, start_time, end_time):
+        # Часы по дням недели; start_time None — выходной
         try:
             with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT time FROM appointments 
-                    WHERE date = ? AND service = ? AND status = 'active'
-                ''', (date, service))
-                return [row[0] for row in cursor.fetchall()]
+                self.conn.executemany('''
+                    INSERT INTO master_schedules (master_id, weekday, start_time, end_time)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(master_id, weekday) DO UPDATE SET
+                        start_time = excluded.start_time,
+                        end_time = excluded.end_time
+                ''', [(master_id, weekday, start_time, end_time) for weekday in weekdays])
+            return True
         except Exception as e:
-            logging.error(f"Ошибка получения занятого времени: {e}")
-            return []
+            logging.error(f"Ошибка сохранения расписания мастера: {e}")
+            return False
 
-    def get_appointments_by_service(self, service):
+    def set_master_exception(self, master_id, date, start_time, end_time):
+        # Часы на конкретную дату вместо расписания; start_time None — выходной
         try:
             with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT unique_id, user_id, service, date, time, master_id
-                    FROM appointments 
-                    WHERE service = ? AND status = 'active'
-                    ORDER BY date, time
-                ''', (service,))
-                return cursor.fetchall()
+                self.conn.execute('''
+                    INSERT INTO master_schedule_exceptions (master_id, date, start_time, end_time)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(master_id, date) DO UPDATE SET
+                        start_time = excluded.start_time,
+                        end_time = excluded.end_time
+                ''', (master_id, date, start_time, end_time))
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка сохранения исключения в расписании: {e}")
+            return False
+
+    def reset_master_schedule(self, master_id):
+        # Возврат мастера к часам по умолчанию: удаляет расписание и исключения
+        try:
+            with self.conn:
+                self.conn.execute('DELETE FROM master_schedules WHERE master_id = ?', (master_id,))
+                self.conn.execute(
+                    'DELETE FROM master_schedule_exceptions WHERE master_id = ?', (master_id,)
+                )
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка сброса расписания мастера: {e}")
+            return False
+
+    @read_only
+    def get_appointments_page_by_service(self, service, cursor=None, backward=False, limit=10):
+        # Keyset-пагинация по (date, time, id): cursor — последняя строка
+        # предыдущей страницы. Возвращает до limit + 1 строк, лишняя строка
+        # означает, что в этом направлении есть еще записи.
+        try:
+            query = '''
+                SELECT a.unique_id, a.user_id, a.service, a.date, a.time, a.master_id,
+                       m.first_name, m.last_name, m.username, a.id
+                FROM appointments a
+                LEFT JOIN masters m ON m.id = a.master_id
+                WHERE a.service = ? AND a.status = 'active'
+            '''
+            params = [service]
+            if cursor:
+                query += f" AND (a.date, a.time, a.id) {'<' if backward else '>'} (?, ?, ?)"
+                params.extend(cursor)
+            order = "DESC" if backward else "ASC"
+            query += f" ORDER BY a.date {order}, a.time {order}, a.id {order} LIMIT ?"
+            params.append(limit + 1)
+            return [
+                Appointment(
+                    row['unique_id'], row['user_id'], row['service'], row['date'], row['time'],
+                    master_id=row['master_id'], id=row['id'],
+                    master=Master(
+                        row['master_id'], row['first_name'], row['last_name'],
+                        username=row['username']
+                    ) if row['first_name'] else None
+                )
+                for row in self.conn.execute(query, params)
+            ]
         except Exception as e:
             logging.error(f"Ошибка получения записей по услуге: {e}")
             return []
 
-    def get_appointment_by_id(self, unique_id):
+    @read_only
+    def get_appointment_by_id(self, unique_id, include_archive=False):
+        # include_archive: искать и среди перенесенных в архив записей (для отзывов)
         try:
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT * FROM appointments 
-                    WHERE unique_id = ?
-                ''', (unique_id,))
-                return cursor.fetchone()
+            cursor = self.conn.execute(f'''
+                SELECT unique_id, user_id, service, date, time, status, master_id, duration
+                FROM {'appointments_all' if include_archive else 'appointments'}
+                WHERE unique_id = ?
+            ''', (unique_id,))
+            return _record(Appointment, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения записи: {e}")
             return None
@@ -121,13 +360,364 @@ class Database:
                     SET status = 'canceled' 
                     WHERE unique_id = ?
                 ''', (unique_id,))
+                self.conn.execute('''
+                    UPDATE notification_jobs 
+                    SET status = 'canceled' 
+                    WHERE appointment_id = ? AND status = 'pending'
+                ''', (unique_id,))
             return True
         except Exception as e:
             logging.error(f"Ошибка отмены записи: {e}")
             return False
 
+    def archive_appointments(self, before_date, limit):
+        # Перенос до limit записей с датой раньше before_date в архив одной
+        # транзакцией. Возвращает число перенесенных записей.
+        # Запись, чей unique_id уже есть в архиве (ID, выданный до проверки
+        # по архиву), архивируется как unique_id-id, чтобы не остановить архивацию.
+        try:
+            with self.conn:
+                ids = [row[0] for row in self.conn.execute('''
+                    SELECT id FROM appointments
+                    WHERE date < ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (before_date, limit))]
+                if not ids:
+                    return 0
+                placeholders = ','.join('?' * len(ids))
+                conflicts = [row[0] for row in self.conn.execute(f'''
+                    SELECT unique_id FROM appointments
+                    WHERE id IN ({placeholders})
+                      AND unique_id IN (SELECT unique_id FROM appointments_archive)
+                ''', ids)]
+                if conflicts:
+                    logging.warning(f"ID записей уже есть в архиве, добавлен суффикс: {', '.join(conflicts)}")
+                self.conn.execute(f'''
+                    INSERT INTO appointments_archive
+                    (user_id, service, date, time, unique_id, status, created_at, master_id, duration)
+                    SELECT user_id, service, date, time,
+                           CASE WHEN unique_id IN (SELECT unique_id FROM appointments_archive)
+                                THEN unique_id || '-' || id ELSE unique_id END,
+                           CASE WHEN status = 'active' THEN 'completed' ELSE status END,
+                           created_at, master_id, duration
+                    FROM appointments
+                    WHERE id IN ({placeholders})
+                ''', ids)
+                # Уведомления по прошедшим записям уже отправлены или отменены
+                self.conn.execute(f'''
+                    DELETE FROM notification_jobs
+                    WHERE appointment_id IN (
+                        SELECT unique_id FROM appointments WHERE id IN ({placeholders})
+                    )
+                ''', ids)
+                self.conn.execute(f'''
+                    DELETE FROM appointments WHERE id IN ({placeholders})
+                ''', ids)
+                return len(ids)
+        except Exception as e:
+            logging.error(f"Ошибка архивации записей: {e}")
+            return None
+
+    # Методы для очереди уведомлений
+    def add_notification_jobs(self, appointment_id, jobs):
+        try:
+            with self.conn:
+                self.conn.executemany('''
+                    INSERT INTO notification_jobs (appointment_id, kind, run_at)
+                    VALUES (?, ?, ?)
+                ''', [(appointment_id, kind, run_at) for kind, run_at in jobs])
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка сохранения уведомлений: {e}")
+            return False
+
+    @read_only
+    def get_due_notifications(self, now, limit):
+        try:
+            cursor = self.conn.execute('''
+                SELECT n.id, n.kind, a.unique_id, a.user_id, a.service, a.date, a.time
+                FROM notification_jobs n
+                JOIN appointments a ON a.unique_id = n.appointment_id
+                WHERE n.status = 'pending' AND n.run_at <= ?
+                ORDER BY n.run_at
+                LIMIT ?
+            ''', (now, limit))
+            return cursor.fetchall()
+        except Exception as e:
+            logging.error(f"Ошибка получения уведомлений: {e}")
+            return []
+
+    def reset_sending_notification_jobs(self, keep_ids):
+        # Задачи в sending, кроме keep_ids (их еще отправляет этот процесс),
+        # снова становятся pending. Возвращает их число.
+        try:
+            with self.conn:
+                cursor = self.conn.execute(
+                    "SELECT id FROM notification_jobs WHERE status = 'sending'"
+                )
+                job_ids = [row[0] for row in cursor if row[0] not in keep_ids]
+                self.conn.executemany('''
+                    UPDATE notification_jobs
+                    SET status = 'pending'
+                    WHERE id = ?
+                ''', [(job_id,) for job_id in job_ids])
+            return len(job_ids)
+        except Exception as e:
+            logging.error(f"Ошибка возврата зависших уведомлений: {e}")
+            return 0
+
+    def set_notification_jobs_status(self, job_ids, status):
+        try:
+            with self.conn:
+                self.conn.executemany('''
+                    UPDATE notification_jobs 
+                    SET status = ? 
+                    WHERE id = ?
+                ''', [(status, job_id) for job_id in job_ids])
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка обновления уведомлений: {e}")
+            return False
+
+    def add_dead_letter(self, data):
+        try:
+            with self.conn:
+                self.conn.execute('''
+                    INSERT INTO dead_letters 
+                    (chat_id, text, reply_markup, error, attempts)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (data['chat_id'], data['text'], data['reply_markup'],
+                    data['error'], data['attempts']))
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка сохранения недоставленного сообщения: {e}")
+            return False
+
+    # Аренда лидерства: только один процесс выполняет фоновые задачи
+    def acquire_lease(self, name, holder, ttl):
+        try:
+            now = clock.time()
+            with self.conn:
+                cursor = self.conn.execute('''
+                    INSERT INTO leases (name, holder, expires_at)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(name) DO UPDATE SET
+                        holder = excluded.holder,
+                        expires_at = excluded.expires_at
+                    WHERE leases.holder = excluded.holder OR leases.expires_at < ?
+                ''', (name, holder, now + ttl, now))
+                return cursor.rowcount == 1
+        except Exception as e:
+            logging.error(f"Ошибка получения аренды {name}: {e}")
+            return False
+
+    def release_lease(self, name, holder):
+        try:
+            with self.conn:
+                self.conn.execute('''
+                    DELETE FROM leases WHERE name = ? AND holder = ?
+                ''', (name, holder))
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка освобождения аренды {name}: {e}")
+            return False
+
+    # Методы для хранилища состояний FSM
+    @read_only
+    def get_fsm_record(self, key):
+        try:
+            cursor = self.conn.execute('''
+                SELECT state, data, updated_at 
+                FROM fsm_storage 
+                WHERE key = ?
+            ''', (key,))
+            return cursor.fetchone()
+        except Exception as e:
+            logging.error(f"Ошибка получения состояния FSM: {e}")
+            return None
+
+    def save_fsm_records(self, records, deleted_keys):
+        try:
+            with self.conn:
+                self.conn.executemany('''
+                    INSERT INTO fsm_storage (key, state, data, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET
+                        state = excluded.state,
+                        data = excluded.data,
+                        updated_at = excluded.updated_at
+                ''', records)
+                self.conn.executemany('''
+                    DELETE FROM fsm_storage WHERE key = ?
+                ''', [(key,) for key in deleted_keys])
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка сохранения состояний FSM: {e}")
+            return False
+
+    def delete_expired_fsm_records(self, before):
+        try:
+            with self.conn:
+                self.conn.execute('''
+                    DELETE FROM fsm_storage WHERE updated_at < ?
+                ''', (before,))
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка удаления устаревших состояний FSM: {e}")
+            return False
+
+    # Лист ожидания
+    def add_to_waitlist(self, data):
+        # Возвращает None, если пользователь уже ждет этот слот
+        try:
+            with self.conn:
+                self.conn.execute('''
+                    INSERT INTO waitlist (user_id, master_id, service, date, time)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (data['user_id'], data['master_id'], data['service'],
+                      data['date'], data['time']))
+            return True
+        except sqlite3.IntegrityError:
+            return None
+        except Exception as e:
+            logging.error(f"Ошибка добавления в лист ожидания: {e}")
+            return False
+
+    def hold_slots_for_waiters(self, master_id, date, start_time, end_time,
+                               not_before, expires_at, new_id):
+        # Освободился интервал [start_time, end_time). Ожидающие, чья запись
+        # [time, time + длительность) его задевает, по порядку очереди получают
+        # запись со статусом held до expires_at, если она теперь ни с чем не
+        # пересекается. not_before — самое раннее время ожидающего, которое еще
+        # может задеть интервал (и не прошло). new_id() выдает unique_id записи.
+        # Возвращает созданные записи.
+        start, end = to_minutes(start_time), to_minutes(end_time)
+        try:
+            held = []
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                waiters = self.conn.execute('''
+                    SELECT id, user_id, service, time FROM waitlist
+                    WHERE master_id = ? AND date = ? AND time >= ? AND time < ?
+                      AND status = 'waiting'
+                    ORDER BY id
+                ''', (master_id, date, not_before, end_time)).fetchall()
+                users = set()
+                for waiter in waiters:
+                    duration = service_duration(waiter['service'])
+                    if to_minutes(waiter['time']) + duration <= start or waiter['user_id'] in users:
+                        continue
+                    if self._overlaps(master_id, date, waiter['time'], duration):
+                        continue
+                    unique_id = new_id()
+                    while self._unique_id_taken(unique_id):
+                        unique_id = new_id()
+                    self.conn.execute('''
+                        INSERT INTO appointments
+                        (user_id, service, date, time, unique_id, master_id, status, duration)
+                        VALUES (?, ?, ?, ?, ?, ?, 'held', ?)
+                    ''', (waiter['user_id'], waiter['service'], date, waiter['time'],
+                          unique_id, master_id, duration))
+                    self.conn.execute('''
+                        UPDATE waitlist
+                        SET status = 'offered', appointment_id = ?, expires_at = ?
+                        WHERE id = ?
+                    ''', (unique_id, expires_at, waiter['id']))
+                    users.add(waiter['user_id'])
+                    held.append(Appointment(
+                        unique_id, waiter['user_id'], waiter['service'], date, waiter['time'],
+                        status='held', master_id=master_id, duration=duration
+                    ))
+            return held
+        except Exception as e:
+            logging.error(f"Ошибка удержания слотов для листа ожидания: {e}")
+            return []
+
+    def confirm_hold(self, unique_id, user_id, now):
+        # Удерживаемая запись становится активной; None, если удержание истекло
+        # к now, даже если сборщик истекших удержаний еще не успел его снять
+        try:
+            with self.conn:
+                updated = self.conn.execute('''
+                    UPDATE appointments SET status = 'active'
+                    WHERE unique_id = ? AND user_id = ? AND status = 'held'
+                      AND EXISTS (
+                          SELECT 1 FROM waitlist
+                          WHERE appointment_id = ? AND status = 'offered' AND expires_at > ?
+                      )
+                ''', (unique_id, user_id, unique_id, now)).rowcount
+                if not updated:
+                    return None
+                self.conn.execute('''
+                    UPDATE waitlist SET status = 'booked'
+                    WHERE appointment_id = ? AND status = 'offered'
+                ''', (unique_id,))
+                cursor = self.conn.execute('''
+                    SELECT unique_id, user_id, service, date, time, status, master_id, duration
+                    FROM appointments WHERE unique_id = ?
+                ''', (unique_id,))
+                return _record(Appointment, cursor)
+        except Exception as e:
+            logging.error(f"Ошибка подтверждения записи из листа ожидания: {e}")
+            return None
+
+    def release_hold(self, unique_id, user_id):
+        # Отказ от предложенного слота; возвращает освободившуюся запись или None
+        try:
+            with self.conn:
+                updated = self.conn.execute('''
+                    UPDATE appointments SET status = 'canceled'
+                    WHERE unique_id = ? AND user_id = ? AND status = 'held'
+                ''', (unique_id, user_id)).rowcount
+                if not updated:
+                    return None
+                self.conn.execute('''
+                    UPDATE waitlist SET status = 'declined'
+                    WHERE appointment_id = ? AND status = 'offered'
+                ''', (unique_id,))
+                cursor = self.conn.execute('''
+                    SELECT unique_id, service, date, time, master_id, duration
+                    FROM appointments WHERE unique_id = ?
+                ''', (unique_id,))
+                return _record(Appointment, cursor)
+        except Exception as e:
+            logging.error(f"Ошибка отказа от слота из листа ожидания: {e}")
+            return None
+
+    def expire_holds(self, now, limit):
+        # Снимает удержания, истекшие к now; возвращает освободившиеся записи
+        try:
+            with self.conn:
+                unique_ids = [row[0] for row in self.conn.execute('''
+                    SELECT appointment_id FROM waitlist
+                    WHERE status = 'offered' AND expires_at <= ?
+                    ORDER BY expires_at
+                    LIMIT ?
+                ''', (now, limit))]
+                if not unique_ids:
+                    return []
+                placeholders = ",".join("?" * len(unique_ids))
+                self.conn.execute(f'''
+                    UPDATE waitlist SET status = 'expired'
+                    WHERE appointment_id IN ({placeholders}) AND status = 'offered'
+                ''', unique_ids)
+                self.conn.execute(f'''
+                    UPDATE appointments SET status = 'expired'
+                    WHERE unique_id IN ({placeholders}) AND status = 'held'
+                ''', unique_ids)
+                cursor = self.conn.execute(f'''
+                    SELECT unique_id, service, date, time, master_id, duration
+                    FROM appointments WHERE unique_id IN ({placeholders})
+                ''', unique_ids)
+                return _records(Appointment, cursor)
+        except Exception as e:
+            logging.error(f"Ошибка снятия истекших удержаний: {e}")
+            return []
+
     # Методы для отзывов
     def add_review(self, data):
+        # Отзыв и агрегаты рейтинга обновляются в одной транзакции
         try:
             with self.conn:
                 self.conn.execute('''
@@ -136,49 +726,114 @@ class Database:
                     VALUES (?, ?, ?, ?)
                 ''', (data['unique_id'], data['user_id'],
                     data['rating'], data['comment']))
+                self._update_rating_stats(
+                    data['service'], data.get('master_id'), data['rating'], 1
+                )
             return True
         except Exception as e:
             logging.error(f"Ошибка добавления отзыва: {e}")
             return False
 
-    def get_user_reviews(self, user_id):
+    def _update_rating_stats(self, service, master_id, rating, delta):
+        # delta = 1 для нового отзыва, -1 для заблокированного
+        histogram = [delta if rating == value else 0 for value in range(1, 6)]
+        keys = [('service', service)]
+        if master_id is not None:
+            keys.append(('master', str(master_id)))
+        self.conn.executemany('''
+            INSERT INTO rating_stats (scope, key, count, total, r1, r2, r3, r4, r5)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(scope, key) DO UPDATE SET
+                count = count + excluded.count,
+                total = total + excluded.total,
+                r1 = r1 + excluded.r1,
+                r2 = r2 + excluded.r2,
+                r3 = r3 + excluded.r3,
+                r4 = r4 + excluded.r4,
+                r5 = r5 + excluded.r5
+        ''', [(scope, key, delta, delta * rating, *histogram) for scope, key in keys])
+
+    def rebuild_rating_stats(self):
+        # Полный пересчет агрегатов по отзывам; возвращает число строк или None
         try:
             with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT r.rating, r.comment, a.service, a.date 
-                    FROM reviews r
-                    JOIN appointments a ON r.appointment_id = a.unique_id
-                    WHERE r.user_id = ? AND r.status = 'active'
-                ''', (user_id,))
-                return cursor.fetchall()
+                self.conn.execute("DELETE FROM rating_stats")
+                self.conn.execute(RATING_STATS_BACKFILL)
+                count = self.conn.execute("SELECT COUNT(*) FROM rating_stats").fetchone()[0]
+            return count
+        except Exception as e:
+            logging.error(f"Ошибка пересчета рейтингов: {e}")
+            return None
+
+    @read_only
+    def get_rating_stats(self):
+        # Все агрегаты: сначала услуги, затем мастера с именами
+        try:
+            cursor = self.conn.execute('''
+                SELECT s.scope, s.key, s.count, s.total, s.r1, s.r2, s.r3, s.r4, s.r5,
+                       m.first_name, m.last_name
+                FROM rating_stats s
+                LEFT JOIN masters m ON s.scope = 'master' AND m.id = CAST(s.key AS INTEGER)
+                WHERE s.count > 0
+                ORDER BY s.scope DESC, s.total * 1.0 / s.count DESC
+            ''')
+            return _records(RatingStats, cursor)
+        except Exception as e:
+            logging.error(f"Ошибка получения рейтингов: {e}")
+            return []
+
+    @read_only
+    def get_user_reviews(self, user_id):
+        try:
+            cursor = self.conn.execute('''
+                SELECT r.rating, r.comment, a.service, a.date AS appointment_date
+                FROM reviews r
+                JOIN appointments_all a ON r.appointment_id = a.unique_id
+                WHERE r.user_id = ? AND r.status = 'active'
+            ''', (user_id,))
+            return _records(Review, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения отзывов пользователя: {e}")
             return []
 
-    def get_all_reviews(self):
+    @read_only
+    def get_reviews_page(self, cursor_id=None, backward=False, pending_only=False, limit=10):
+        # Keyset-пагинация по id. Услуга ищется подзапросом только для строк
+        # страницы. Возвращает до limit + 1 строк, лишняя строка означает,
+        # что в этом направлении есть еще отзывы.
         try:
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT r.id, r.rating, r.comment, a.service, r.user_id
-                    FROM reviews r
-                    JOIN appointments a ON r.appointment_id = a.unique_id
-                    WHERE r.status = 'active'
-                ''')
-                return cursor.fetchall()
+            query = '''
+                SELECT r.id, r.rating,
+                       (SELECT a.service FROM appointments_all a
+                        WHERE a.unique_id = r.appointment_id) AS service,
+                       r.user_id
+                FROM reviews r
+                WHERE r.status = 'active'
+            '''
+            params = []
+            if pending_only:
+                query += " AND r.moderated = 0"
+            if cursor_id is not None:
+                query += f" AND r.id {'<' if backward else '>'} ?"
+                params.append(cursor_id)
+            order = "DESC" if backward else "ASC"
+            query += f" ORDER BY r.id {order} LIMIT ?"
+            params.append(limit + 1)
+            return _records(Review, self.conn.execute(query, params))
         except Exception as e:
-            logging.error(f"Ошибка получения всех отзывов: {e}")
+            logging.error(f"Ошибка получения страницы отзывов: {e}")
             return []
-            
+
+    @read_only
     def get_review_by_id(self, review_id):
         try:
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT r.id, r.rating, r.comment, a.service, r.user_id, r.created_at
-                    FROM reviews r
-                    JOIN appointments a ON r.appointment_id = a.unique_id
-                    WHERE r.id = ?
-                ''', (review_id,))
-                return cursor.fetchone()
+            cursor = self.conn.execute('''
+                SELECT r.id, r.rating, r.comment, a.service, r.user_id, r.created_at, r.moderated
+                FROM reviews r
+                JOIN appointments_all a ON r.appointment_id = a.unique_id
+                WHERE r.id = ?
+            ''', (review_id,))
+            return _record(Review, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения отзыва: {e}")
             return None
@@ -186,16 +841,38 @@ class Database:
     def block_review(self, review_id):
         try:
             with self.conn:
+                review = self.conn.execute('''
+                    SELECT r.rating, a.service, a.master_id
+                    FROM reviews r
+                    LEFT JOIN appointments_all a ON a.unique_id = r.appointment_id
+                    WHERE r.id = ? AND r.status = 'active'
+                ''', (review_id,)).fetchone()
                 self.conn.execute('''
                     UPDATE reviews 
-                    SET status = 'blocked' 
+                    SET status = 'blocked', moderated = 1
                     WHERE id = ?
                 ''', (review_id,))
+                # Уже заблокированный отзыв не учтен в агрегатах
+                if review and review[1] is not None:
+                    self._update_rating_stats(review[1], review[2], review[0], -1)
             return True
         except Exception as e:
             logging.error(f"Ошибка блокировки отзыва: {e}")
             return False
 
+    def approve_review(self, review_id):
+        try:
+            with self.conn:
+                self.conn.execute('''
+                    UPDATE reviews
+                    SET moderated = 1
+                    WHERE id = ?
+                ''', (review_id,))
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка одобрения отзыва: {e}")
+            return False
+
     # Методы для мастеров
     def add_master(self, data):
         try:
@@ -211,51 +888,57 @@ class Database:
             logging.error(f"Ошибка добавления мастера: {e}")
             return False
 
+    @read_only
     def get_masters_by_service(self, service):
         try:
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT id, first_name, last_name 
-                    FROM masters 
-                    WHERE service = ?
-                ''', (service,))
-                return cursor.fetchall()
+            # Число и сумма оценок берутся из rating_stats по первичному ключу
+            cursor = self.conn.execute('''
+                SELECT m.id, m.first_name, m.last_name,
+                       s.count AS rating_count, s.total AS rating_total
+                FROM masters m
+                LEFT JOIN rating_stats s
+                    ON s.scope = 'master' AND s.key = CAST(m.id AS TEXT)
+                WHERE m.service = ?
+            ''', (service,))
+            return _records(Master, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения мастеров по услуге: {e}")
             return []
 
+    @read_only
     def get_master_by_id(self, master_id):
         try:
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT * FROM masters 
-                    WHERE id = ?
-                ''', (master_id,))
-                return cursor.fetchone()
+            cursor = self.conn.execute('''
+                SELECT id, first_name, last_name, service, telegram_id, username
+                FROM masters
+                WHERE id = ?
+            ''', (master_id,))
+            return _record(Master, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения мастера по ID: {e}")
             return None
 
+    @read_only
     def get_master_by_telegram_id(self, telegram_id):
         try:
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT * FROM masters 
-                    WHERE telegram_id = ?
-                ''', (telegram_id,))
-                return cursor.fetchone()
+            cursor = self.conn.execute('''
+                SELECT id, first_name, last_name, service, telegram_id, username
+                FROM masters
+                WHERE telegram_id = ?
+            ''', (telegram_id,))
+            return _record(Master, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения мастера по Telegram ID: {e}")
             return None
 
+    @read_only
     def get_all_masters(self):
         try:
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT id, first_name, last_name, service, telegram_id, username 
-                    FROM masters
-                ''')
-                return cursor.fetchall()
+            cursor = self.conn.execute('''
+                SELECT id, first_name, last_name, service, telegram_id, username 
+                FROM masters
+            ''')
+            return _records(Master, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения всех мастеров: {e}")
             return []
@@ -272,34 +955,144 @@ class Database:
             logging.error(f"Ошибка удаления мастера: {e}")
             return False
 
+    @read_only
     def get_today_appointments_for_master(self, master_id):
+        # status IN повторяет условие частичного индекса idx_appointments_slot:
+        # иначе SQLite его не выбирает
         try:
             from datetime import datetime
             today = datetime.now().strftime("%Y-%m-%d")
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT unique_id, user_id, service, time 
-                    FROM appointments 
-                    WHERE date = ? AND master_id = ? AND status = 'active'
-                    ORDER BY time
-                ''', (today, master_id))
-                return cursor.fetchall()
+            cursor = self.conn.execute('''
+                SELECT unique_id, user_id, service, time 
+                FROM appointments 
+                WHERE date = ? AND master_id = ? AND status = 'active'
+                  AND status IN ('active', 'held')
+                ORDER BY time
+            ''', (today, master_id))
+            return _records(Appointment, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения сегодняшних записей мастера: {e}")
             return []
 
+    @read_only
     def get_upcoming_appointments_for_master(self, master_id):
+        # status IN повторяет условие частичного индекса idx_appointments_slot:
+        # иначе SQLite его не выбирает
         try:
             from datetime import datetime
             today = datetime.now().strftime("%Y-%m-%d")
-            with self.conn:
-                cursor = self.conn.execute('''
-                    SELECT unique_id, date, time, service, user_id 
-                    FROM appointments 
-                    WHERE date >= ? AND master_id = ? AND status = 'active'
-                    ORDER BY date, time
-                ''', (today, master_id))
-                return cursor.fetchall()
+            cursor = self.conn.execute('''
+                SELECT unique_id, date, time, service, user_id 
+                FROM appointments 
+                WHERE date >= ? AND master_id = ? AND status = 'active'
+                  AND status IN ('active', 'held')
+                ORDER BY date, time
+            ''', (today, master_id))
+            return _records(Appointment, cursor)
         except Exception as e:
             logging.error(f"Ошибка получения предстоящих записей мастера: {e}")
             return []
+
+    # Массовый импорт и экспорт
+    def import_masters(self, rows):
+        # rows — итератор кортежей (first_name, last_name, service, telegram_id, username).
+        # Все строки вставляются в одной транзакции: при ошибке не вставится ни одна.
+        # Мастер с уже существующим telegram_id обновляется.
+        try:
+            with self.conn:
+                before = self.conn.total_changes
+                self.conn.executemany('''
+                    INSERT INTO masters
+                    (first_name, last_name, service, telegram_id, username)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(telegram_id) DO UPDATE SET
+                        first_name = excluded.first_name,
+                        last_name = excluded.last_name,
+                        service = excluded.service,
+                        username = excluded.username
+                ''', rows)
+                return self.conn.total_changes - before
+        except ValueError:
+            # Ошибку в данных файла показываем пользователю
+            raise
+        except Exception as e:
+            logging.error(f"Ошибка импорта мастеров: {e}")
+            return None
+
+    def import_appointments(self, rows):
+        # rows — итератор кортежей (unique_id, user_id, service, date, time,
+        # master_id, status, created_at, duration). Записи с существующим
+        # unique_id и активные записи, пересекающиеся с занятым временем мастера
+        # (в том числе с уже загруженными строками файла), пропускаются.
+        try:
+            with self.conn:
+                self.conn.execute("BEGIN IMMEDIATE")
+                before = self.conn.total_changes
+                for row in rows:
+                    unique_id, _, _, date, time, master_id, status, _, duration = row
+                    if self._unique_id_taken(unique_id):
+                        continue
+                    if (master_id is not None and status in ('active', 'held')
+                            and self._overlaps(master_id, date, time, duration)):
+                        continue
+                    self.conn.execute('''
+                        INSERT INTO appointments
+                        (unique_id, user_id, service, date, time, master_id, status,
+                         created_at, duration)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+                        ON CONFLICT DO NOTHING
+                    ''', row)
+                return self.conn.total_changes - before
+        except ValueError:
+            raise
+        except Exception as e:
+            logging.error(f"Ошибка импорта записей: {e}")
+            return None
+
+    @read_only
+    def get_appointments_batch(self, after_id=0, limit=1000):
+        # Пачка записей по возрастанию id для потоковой выгрузки
+        try:
+            cursor = self.conn.execute('''
+                SELECT id, unique_id, user_id, service, date, time,
+                       master_id, status, created_at, duration
+                FROM appointments
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (after_id, limit))
+            return cursor.fetchall()
+        except Exception as e:
+            logging.error(f"Ошибка выгрузки записей: {e}")
+            return None
+
+    @read_only
+    def get_archive_batch(self, after_id=0, limit=1000):
+        try:
+            cursor = self.conn.execute('''
+                SELECT id, unique_id, user_id, service, date, time,
+                       master_id, status, created_at, duration
+                FROM appointments_archive
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (after_id, limit))
+            return cursor.fetchall()
+        except Exception as e:
+            logging.error(f"Ошибка выгрузки архива записей: {e}")
+            return None
+
+    @read_only
+    def get_reviews_batch(self, after_id=0, limit=1000):
+        try:
+            cursor = self.conn.execute('''
+                SELECT id, appointment_id, user_id, rating, comment, status, created_at
+                FROM reviews
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (after_id, limit))
+            return cursor.fetchall()
+        except Exception as e:
+            logging.error(f"Ошибка выгрузки отзывов: {e}")
+            return None
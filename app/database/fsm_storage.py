@@ -0,0 +1,150 @@
+import asyncio
+import json
+import logging
+import time
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app.config import (
+    FSM_STORAGE,
+    FSM_TTL,
+    FSM_FLUSH_INTERVAL,
+    REDIS_URL
+)
+
+def create_fsm_storage(db):
+    """Создание хранилища состояний по настройке FSM_STORAGE"""
+    if FSM_STORAGE == 'sqlite':
+        return SQLiteStorage(db)
+    if FSM_STORAGE == 'redis':
+        # Пакет redis нужен только для этого режима
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(REDIS_URL, state_ttl=FSM_TTL, data_ttl=FSM_TTL)
+    return MemoryStorage()
+
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище состояний FSM в той же базе SQLite.
+
+    Чтения обслуживаются из памяти, изменения копятся и раз в
+    FSM_FLUSH_INTERVAL секунд записываются одной транзакцией.
+    Сессии, которые не менялись дольше FSM_TTL секунд, удаляются.
+    """
+
+    def __init__(self, db, ttl=FSM_TTL, flush_interval=FSM_FLUSH_INTERVAL):
+        self.db = db
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        # ключ -> {'state', 'data', 'updated_at'}
+        self._records = {}
+        self._dirty = set()
+        self._flush_task = None
+        self._last_sweep = 0.0
+
+    @staticmethod
+    def _key(key):
+        return ":".join(str(part) for part in (
+            key.bot_id, key.chat_id, key.user_id, key.thread_id,
+            key.business_connection_id, key.destiny
+        ))
+
+    async def _load(self, key):
+        record_key = self._key(key)
+        record = self._records.get(record_key)
+        if record is not None:
+            return record_key, record
+
+        row = await self.db.get_fsm_record(record_key)
+        # Пока шел запрос, запись могла загрузить параллельная корутина
+        if record_key in self._records:
+            return record_key, self._records[record_key]
+        if row and row['updated_at'] >= time.time() - self.ttl:
+            record = {
+                'state': row['state'],
+                'data': json.loads(row['data']) if row['data'] else {},
+                'updated_at': row['updated_at']
+            }
+        else:
+            record = {'state': None, 'data': {}, 'updated_at': time.time()}
+        self._records[record_key] = record
+        return record_key, record
+
+    def _touch(self, record_key, record):
+        record['updated_at'] = time.time()
+        self._dirty.add(record_key)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def set_state(self, key, state=None):
+        record_key, record = await self._load(key)
+        record['state'] = state.state if isinstance(state, State) else state
+        self._touch(record_key, record)
+
+    async def get_state(self, key):
+        _, record = await self._load(key)
+        return record['state']
+
+    async def set_data(self, key, data):
+        record_key, record = await self._load(key)
+        record['data'] = dict(data)
+        self._touch(record_key, record)
+
+    async def get_data(self, key):
+        _, record = await self._load(key)
+        return dict(record['data'])
+
+    async def flush(self):
+        """Запись накопленных изменений одной транзакцией"""
+        if self._dirty:
+            dirty, self._dirty = self._dirty, set()
+            saved, deleted = [], []
+            for record_key in dirty:
+                record = self._records.get(record_key)
+                if record is None:
+                    continue
+                if record['state'] is None and not record['data']:
+                    # Пустая сессия (после state.clear) не хранится
+                    deleted.append(record_key)
+                else:
+                    saved.append((
+                        record_key,
+                        record['state'],
+                        json.dumps(record['data'], ensure_ascii=False),
+                        record['updated_at']
+                    ))
+            success = await self.db.save_fsm_records(saved, deleted)
+            if not success:
+                # Повторим запись при следующем сбросе
+                self._dirty |= dirty
+
+        now = time.time()
+        if now - self._last_sweep >= min(self.ttl, 60):
+            self._last_sweep = now
+            await self._sweep(now)
+
+    async def _sweep(self, now):
+        """Удаление сессий, простаивающих дольше TTL"""
+        expired_before = now - self.ttl
+        await self.db.delete_expired_fsm_records(expired_before)
+        # В памяти держим только сессии, которые менялись недавно
+        idle_before = now - min(self.ttl, 600)
+        for record_key in [
+            k for k, r in self._records.items()
+            if r['updated_at'] < idle_before and k not in self._dirty
+        ]:
+            del self._records[record_key]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logging.error(f"Ошибка сохранения состояний FSM: {e}")
+
+    async def close(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
@@ -0,0 +1,281 @@
+import logging
+
+# Версионированные миграции схемы.
+# Каждая миграция — (версия, описание, шаги). Шаг — SQL-строка или функция(conn).
+# Шаги должны быть идемпотентными: миграция может быть прервана и повторена.
+MIGRATIONS = [
+    (1, "Индексы для горячих запросов", [
+        # Занятое время по дате и услуге (удален миграцией 12)
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_active_date_service
+           ON appointments(date, service, time) WHERE status = 'active' ''',
+        # get_appointments_page_by_service: service с сортировкой по дате и времени
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_active_service
+           ON appointments(service, date, time) WHERE status = 'active' ''',
+        # Записи мастера на день и предстоящие записи (удален миграцией 12:
+        # те же колонки есть в idx_appointments_slot)
+        '''CREATE INDEX IF NOT EXISTS idx_appointments_active_master
+           ON appointments(master_id, date, time) WHERE status = 'active' ''',
+        # Отзывы пользователя; JOIN с appointments идет по UNIQUE(unique_id)
+        '''CREATE INDEX IF NOT EXISTS idx_reviews_active_user
+           ON reviews(user_id) WHERE status = 'active' ''',
+        '''CREATE INDEX IF NOT EXISTS idx_reviews_active
+           ON reviews(id) WHERE status = 'active' ''',
+        '''CREATE INDEX IF NOT EXISTS idx_reviews_appointment
+           ON reviews(appointment_id)''',
+        # Список мастеров по услуге
+        '''CREATE INDEX IF NOT EXISTS idx_masters_service
+           ON masters(service)''',
+    ]),
+    (2, "Уникальность слота мастера", [
+        # Гонка при бронировании могла оставить дубли: без их отмены индекс не создастся
+        lambda conn: cancel_duplicate_slots(conn),
+        # Один мастер не может иметь две активные записи на одно время
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_slot
+           ON appointments(master_id, date, time) WHERE status = 'active' ''',
+    ]),
+    (3, "Очередь уведомлений", [
+        # Хранит только ID записи: данные подгружаются в момент отправки
+        '''CREATE TABLE IF NOT EXISTS notification_jobs(
+               id INTEGER PRIMARY KEY,
+               appointment_id TEXT,
+               kind TEXT,
+               run_at TEXT,
+               status TEXT DEFAULT 'pending',
+               created_at TEXT DEFAULT CURRENT_TIMESTAMP
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_notification_jobs_pending
+           ON notification_jobs(run_at) WHERE status = 'pending' ''',
+        '''CREATE INDEX IF NOT EXISTS idx_notification_jobs_appointment
+           ON notification_jobs(appointment_id)''',
+    ]),
+    (4, "Недоставленные сообщения", [
+        '''CREATE TABLE IF NOT EXISTS dead_letters(
+               id INTEGER PRIMARY KEY,
+               chat_id INTEGER,
+               text TEXT,
+               reply_markup TEXT,
+               error TEXT,
+               attempts INTEGER,
+               created_at TEXT DEFAULT CURRENT_TIMESTAMP
+           )''',
+    ]),
+    (5, "Хранилище состояний FSM", [
+        '''CREATE TABLE IF NOT EXISTS fsm_storage(
+               key TEXT PRIMARY KEY,
+               state TEXT,
+               data TEXT,
+               updated_at REAL
+           )''',
+        '''CREATE INDEX IF NOT EXISTS idx_fsm_storage_updated
+           ON fsm_storage(updated_at)''',
+    ]),
+    (6, "Аренда лидерства между процессами", [
+        '''CREATE TABLE IF NOT EXISTS leases(
+               name TEXT PRIMARY KEY,
+               holder TEXT,
+               expires_at REAL
+           )''',
+    ]),
+    (7, "Архив записей", [
+        # Прошедшие и отмененные записи переносятся сюда из appointments
+        '''CREATE TABLE IF NOT EXISTS appointments_archive(
+               id INTEGER PRIMARY KEY,
+               user_id INTEGER,
+               service TEXT,
+               date TEXT,
+               time TEXT,
+               unique_id TEXT UNIQUE,
+               status TEXT,
+               created_at TEXT,
+               master_id INTEGER,
+               archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+           )''',
+        # Все записи для отзывов и выгрузки: горячая таблица и архив
+        '''CREATE VIEW IF NOT EXISTS appointments_all AS
+           SELECT id, user_id, service, date, time, unique_id, status, created_at, master_id
+           FROM appointments
+           UNION ALL
+           SELECT id, user_id, service, date, time, unique_id, status, created_at, master_id
+           FROM appointments_archive''',
+    ]),
+    (8, "Модерация отзывов", [
+        # 1 — отзыв просмотрен админом (одобрен или заблокирован)
+        lambda conn: add_column(conn, 'reviews', 'moderated', 'INTEGER DEFAULT 0'),
+        '''CREATE INDEX IF NOT EXISTS idx_reviews_pending
+           ON reviews(id) WHERE status = 'active' AND moderated = 0''',
+    ]),
+    (9, "Агрегаты рейтингов", [
+        # Число, сумма и гистограмма оценок активных отзывов по мастеру
+        # (scope = 'master', key = id мастера) и по услуге (scope = 'service')
+        '''CREATE TABLE IF NOT EXISTS rating_stats(
+               scope TEXT,
+               key TEXT,
+               count INTEGER DEFAULT 0,
+               total INTEGER DEFAULT 0,
+               r1 INTEGER DEFAULT 0,
+               r2 INTEGER DEFAULT 0,
+               r3 INTEGER DEFAULT 0,
+               r4 INTEGER DEFAULT 0,
+               r5 INTEGER DEFAULT 0,
+               PRIMARY KEY (scope, key)
+           ) WITHOUT ROWID''',
+        lambda conn: conn.execute(RATING_STATS_BACKFILL),
+    ]),
+    (10, "Лист ожидания", [
+        # Статусы: waiting — в очереди, offered — слот удерживается за ним
+        # до expires_at, booked, declined, expired — очередь для него закончена
+        '''CREATE TABLE IF NOT EXISTS waitlist(
+               id INTEGER PRIMARY KEY,
+               user_id INTEGER,
+               master_id INTEGER,
+               service TEXT,
+               date TEXT,
+               time TEXT,
+               status TEXT DEFAULT 'waiting',
+               appointment_id TEXT,
+               expires_at TEXT,
+               created_at TEXT DEFAULT CURRENT_TIMESTAMP
+           )''',
+        # Первый в очереди на слот
+        '''CREATE INDEX IF NOT EXISTS idx_waitlist_slot
+           ON waitlist(master_id, date, time, id) WHERE status = 'waiting' ''',
+        # Пользователь стоит в очереди на слот не больше одного раза
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_waitlist_user_slot
+           ON waitlist(user_id, master_id, date, time) WHERE status = 'waiting' ''',
+        # Истекшие удержания и ответ на предложение
+        '''CREATE INDEX IF NOT EXISTS idx_waitlist_offered
+           ON waitlist(expires_at) WHERE status = 'offered' ''',
+        '''CREATE INDEX IF NOT EXISTS idx_waitlist_offered_appointment
+           ON waitlist(appointment_id) WHERE status = 'offered' ''',
+        # Удерживаемая запись (status = 'held') занимает слот так же, как активная
+        'DROP INDEX IF EXISTS idx_appointments_slot',
+        '''CREATE UNIQUE INDEX IF NOT EXISTS idx_appointments_slot
+           ON appointments(master_id, date, time) WHERE status IN ('active', 'held')''',
+    ]),
+    (11, "Расписание мастеров и длительность записей", [
+        # Длительность записи в минутах; старые записи занимают один часовой слот
+        lambda conn: add_column(conn, 'appointments', 'duration', 'INTEGER DEFAULT 60'),
+        # Рабочие часы по дням недели (0 — понедельник). В дни без строки
+        # мастер работает в часы по умолчанию, start_time IS NULL — выходной
+        '''CREATE TABLE IF NOT EXISTS master_schedules(
+               master_id INTEGER,
+               weekday INTEGER,
+               start_time TEXT,
+               end_time TEXT,
+               PRIMARY KEY (master_id, weekday)
+           ) WITHOUT ROWID''',
+        # Исключения на конкретную дату: другие часы или выходной (start_time IS NULL)
+        '''CREATE TABLE IF NOT EXISTS master_schedule_exceptions(
+               master_id INTEGER,
+               date TEXT,
+               start_time TEXT,
+               end_time TEXT,
+               PRIMARY KEY (master_id, date)
+           ) WITHOUT ROWID''',
+        lambda conn: add_column(conn, 'appointments_archive', 'duration', 'INTEGER DEFAULT 60'),
+        'DROP VIEW IF EXISTS appointments_all',
+        '''CREATE VIEW appointments_all AS
+           SELECT id, user_id, service, date, time, unique_id, status, created_at, master_id, duration
+           FROM appointments
+           UNION ALL
+           SELECT id, user_id, service, date, time, unique_id, status, created_at, master_id, duration
+           FROM appointments_archive''',
+    ]),
+    (12, "Удаление лишних индексов записей", [
+        # Занятое время теперь читается по мастеру (idx_appointments_slot)
+        'DROP INDEX IF EXISTS idx_appointments_active_date_service',
+        # Повторял колонки idx_appointments_slot и замедлял каждую запись
+        'DROP INDEX IF EXISTS idx_appointments_active_master',
+    ]),
+]
+
+# Пересчет rating_stats по активным отзывам; выполняется по пустой таблице
+RATING_STATS_BACKFILL = '''
+    INSERT INTO rating_stats (scope, key, count, total, r1, r2, r3, r4, r5)
+    SELECT scope, key, COUNT(*), SUM(rating),
+           SUM(rating = 1), SUM(rating = 2), SUM(rating = 3), SUM(rating = 4), SUM(rating = 5)
+    FROM (
+        SELECT 'master' AS scope, CAST(a.master_id AS TEXT) AS key, r.rating
+        FROM reviews r
+        JOIN appointments_all a ON a.unique_id = r.appointment_id
+        WHERE r.status = 'active' AND a.master_id IS NOT NULL
+        UNION ALL
+        SELECT 'service', a.service, r.rating
+        FROM reviews r
+        JOIN appointments_all a ON a.unique_id = r.appointment_id
+        WHERE r.status = 'active'
+    )
+    GROUP BY scope, key
+'''
+
+
+def add_column(conn, table, column, definition):
+    """Идемпотентное добавление колонки в таблицу"""
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def cancel_duplicate_slots(conn):
+    """Отмена повторных активных записей на один слот мастера: остается самая
+    ранняя. Отмененные записи попадают в лог, чтобы админ мог связаться с клиентами"""
+    duplicates = conn.execute('''
+        SELECT id, unique_id, user_id, master_id, date, time FROM appointments
+        WHERE status = 'active' AND master_id IS NOT NULL
+          AND id NOT IN (
+              SELECT MIN(id) FROM appointments
+              WHERE status = 'active' AND master_id IS NOT NULL
+              GROUP BY master_id, date, time
+          )
+    ''').fetchall()
+    if not duplicates:
+        return
+    for _, unique_id, user_id, master_id, date, time in duplicates:
+        logging.warning(
+            f"Отменена повторная запись {unique_id} пользователя {user_id} "
+            f"к мастеру {master_id} на {date} {time}"
+        )
+    logging.warning(f"Отменено повторных записей на занятые слоты: {len(duplicates)}")
+    conn.executemany(
+        "UPDATE appointments SET status = 'canceled' WHERE id = ?",
+        [(row[0],) for row in duplicates]
+    )
+
+
+def get_schema_version(conn):
+    row = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()
+    return row[0]
+
+
+def apply_migrations(conn):
+    """Применение всех миграций, которые еще не были применены"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version(
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )''')
+    conn.commit()
+
+    current = get_schema_version(conn)
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            # Явная транзакция: иначе sqlite3 выполняет DDL вне транзакции
+            conn.execute("BEGIN")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+            logging.info(f"Применена миграция {version}: {description}")
+        except Exception:
+            conn.rollback()
+            logging.error(f"Ошибка применения миграции {version}: {description}")
+            raise
@@ -7,22 +7,62 @@ from app.handlers.master import router as master_router, init_services as init_m
 from app.services.appointment import AppointmentService
 from app.services.review import ReviewService
 from app.services.notification import NotificationService
-from app.database.db import Database
+from app.services.transfer import TransferService
+from app.services.archive import ArchiveService
+from app.database.async_db import AsyncDatabase
+from app.middleware.fsm_cache import FSMCacheMiddleware, get_fsm_stats
+from app.middleware.metrics import MetricsMiddleware, HandlerLabelMiddleware
+from app.utils.metrics import MetricsServer, register_runtime_gauges
+from app.config import METRICS_HOST, METRICS_PORT
 
-def register_handlers(dp: Dispatcher, bot, scheduler):
+def register_handlers(dp: Dispatcher, bot, scheduler, db=None):
     """Регистрирует все обработчики и инициализирует сервисы"""
     
     # Инициализация базы данных и сервисов
-    db = Database()
+    if db is None:
+        db = AsyncDatabase()
     notification_service = NotificationService(bot, db, scheduler)
     appointment_service = AppointmentService(db, notification_service)
     review_service = ReviewService(db)
+    transfer_service = TransferService(db)
     
     # Инициализация сервисов для обработчиков
     init_user_services(appointment_service, review_service, db)
-    init_admin_services(appointment_service, review_service, db, bot)
+    init_admin_services(appointment_service, review_service, db, bot, transfer_service)
     init_master_services(db)
     
+    # Периодическая рассылка сохраненных уведомлений
+    notification_service.start_dispatcher()
+
+    # Снятие истекших удержаний слотов из листа ожидания
+    appointment_service.waitlist.start(scheduler)
+
+    # Ежедневный перенос старых записей в архив
+    archive_service = ArchiveService(db, scheduler)
+    archive_service.start()
+
+    # Очередь исходящих сообщений дорабатывает при остановке бота
+    dp.startup.register(notification_service.queue.start)
+    dp.shutdown.register(notification_service.queue.stop)
+    dp.shutdown.register(notification_service.leader.release)
+    dp.shutdown.register(archive_service.leader.release)
+    dp.shutdown.register(appointment_service.waitlist.leader.release)
+    
+    # Время обработчиков по роутерам и префиксам callback data
+    dp.message.outer_middleware(MetricsMiddleware())
+    dp.callback_query.outer_middleware(MetricsMiddleware())
+    dp.message.middleware(HandlerLabelMiddleware())
+    dp.callback_query.middleware(HandlerLabelMiddleware())
+    if METRICS_PORT:
+        register_runtime_gauges(db.master_cache, get_fsm_stats)
+        metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT)
+        dp.startup.register(metrics_server.start)
+        dp.shutdown.register(metrics_server.stop)
+
+    # Одно чтение и одна запись состояния FSM на обработчик
+    dp.message.middleware(FSMCacheMiddleware())
+    dp.callback_query.middleware(FSMCacheMiddleware())
+    
     # Регистрация роутеров
     dp.include_router(user_router)
     dp.include_router(admin_router)
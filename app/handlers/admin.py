@@ -1,41 +1,52 @@
+import io
 import logging
+import os
+import tempfile
+from datetime import datetime
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 
-from app.config import ADMIN_ID
+from app.config import ADMIN_ID, ADMIN_PAGE_SIZE
 from app.models.states import AdminStates
 from app.keyboards.admin_kb import (
     get_admin_main_kb, 
     get_admin_masters_kb, 
+    get_admin_appointments_kb,
     get_admin_reviews_kb,
     get_admin_review_detail_kb,
-    get_admin_back_kb
+    get_admin_back_kb,
+    get_admin_export_kb
 )
 from app.services.appointment import AppointmentService
 from app.services.review import ReviewService
-from app.utils.helpers import get_user_info, format_master_info
+from app.services.transfer import detect_format
+from app.utils.helpers import get_user_info, keyset_page
 
 # Создаем роутер для команд администратора
-router = Router()
+router = Router(name="admin")
 
 # Инициализируем сервисы (они будут переданы при регистрации роутера)
 appointment_service = None
 review_service = None
+transfer_service = None
 db = None
 bot = None
 
-def init_services(appointment_svc, review_svc, database, bot_instance):
+def init_services(appointment_svc, review_svc, database, bot_instance, transfer_svc=None):
     """Функция для инициализации сервисов при старте бота"""
-    global appointment_service, review_service, db, bot
+    global appointment_service, review_service, transfer_service, db, bot
     appointment_service = appointment_svc
     review_service = review_svc
+    transfer_service = transfer_svc
     db = database
     bot = bot_instance
 
 # Проверка прав администратора
-def is_admin(message: types.Message):
-    return message.from_user.id == ADMIN_ID
+def is_admin(event: types.Message | types.CallbackQuery):
+    # У callback.message отправитель — бот, поэтому для кнопок проверяется
+    # сам callback: его from_user — нажавший пользователь
+    return event.from_user.id == ADMIN_ID
 
 # Главное меню администратора
 @router.message(Command("admin"))
@@ -53,55 +64,125 @@ async def admin_handler(message: types.Message):
         logging.error(f"Ошибка в обработчике admin: {e}")
         await message.answer("⚠️ Ошибка админ-панели")
 
+# Рейтинги услуг и мастеров
+@router.message(Command("stats"))
+async def admin_stats_handler(message: types.Message):
+    if not is_admin(message):
+        return
+
+    try:
+        stats, error = await review_service.get_rating_stats()
+
+        if error:
+            await message.answer(f"⚠️ {error}")
+            return
+
+        if not stats:
+            await message.answer("📭 Нет отзывов")
+            return
+
+        # Агрегаты уже посчитаны, отзывы не читаются
+        text = "📊 Рейтинги\n"
+        scope = None
+        for row in stats:
+            if row.scope != scope:
+                scope = row.scope
+                text += "\n💅 Услуги:\n" if scope == "service" else "\n👨‍🔧 Мастера:\n"
+            if scope == "service":
+                name = row.key
+            elif row.first_name:
+                name = f"{row.first_name} {row.last_name}"
+            else:
+                name = f"Мастер #{row.key} (удален)"
+            histogram = " ".join(f"{value}⭐{count}" for value, count in row.histogram)
+            text += f"{name}: ⭐ {row.average:.2f} ({row.count}) — {histogram}\n"
+
+        await message.answer(text)
+    except Exception as e:
+        logging.error(f"Ошибка в обработчике stats: {e}")
+        await message.answer("⚠️ Ошибка загрузки рейтингов")
+
 # Показ записей по услуге
 @router.callback_query(F.data.startswith("admin_service_"))
 async def admin_service_handler(callback: types.CallbackQuery):
-    if not is_admin(callback.message):
+    if not is_admin(callback):
         return
 
     try:
-        # Извлекаем название услуги
+        # Извлекаем название услуги и показываем первую страницу
         service = callback.data.split("_")[2]
-        appointments = db.get_appointments_by_service(service)
-
-        if not appointments:
-            await callback.answer("📭 Нет записей")
-            return
+        await show_service_page(callback, service)
+    except Exception as e:
+        logging.error(f"Ошибка в обработчике просмотра записей по услуге: {e}")
+        await callback.answer("⚠️ Ошибка загрузки записей")
 
-        # Формируем текст с записями
-        text = "📋 Список записей:\n\n"
-        for app in appointments:
-            master = db.get_master_by_id(app[5]) if len(app) > 5 else None
-            master_info = f"👨‍🔧 Мастер: {format_master_info(master)}\n" if master else ""
-            
-            text += (
-                f"🔑 ID: {app[0]}\n"
-                f"👤 User ID: {app[1]}\n"
-                f"💅 Услуга: {app[2]}\n"
-                f"{master_info}"
-                f"📅 Дата: {app[3]}\n"
-                f"⏰ Время: {app[4]}\n"
-                "━━━━━━━━━━━━━━\n"
-            )
+# Переход по страницам записей услуги
+@router.callback_query(F.data.startswith("admin_page_"))
+async def admin_service_page_handler(callback: types.CallbackQuery):
+    if not is_admin(callback):
+        return
 
-        # Выводим с кнопкой Назад
-        await callback.message.edit_text(
-            text,
-            reply_markup=get_admin_back_kb()
+    try:
+        # Формат: admin_page_{услуга}_{n|p}_{дата}_{время}_{id}
+        _, _, service, direction, date, time, appointment_id = callback.data.split("_")
+        await show_service_page(
+            callback,
+            service,
+            cursor=(date, time, int(appointment_id)),
+            backward=direction == "p"
         )
     except Exception as e:
-        logging.error(f"Ошибка в обработчике просмотра записей по услуге: {e}")
+        logging.error(f"Ошибка в обработчике страницы записей: {e}")
         await callback.answer("⚠️ Ошибка загрузки записей")
 
+async def show_service_page(callback, service, cursor=None, backward=False):
+    """Вывод одной страницы записей услуги одним запросом"""
+    appointments = await db.get_appointments_page_by_service(
+        service, cursor, backward, ADMIN_PAGE_SIZE
+    )
+    appointments, has_prev, has_next = keyset_page(
+        appointments, ADMIN_PAGE_SIZE, cursor is not None, backward
+    )
+
+    if not appointments:
+        await callback.answer("📭 Нет записей")
+        return
+
+    # Формируем текст с записями
+    text = "📋 Список записей:\n\n"
+    for app in appointments:
+        if app.master:
+            master_info = f"👨‍🔧 Мастер: {app.master.full_name}\n"
+        else:
+            master_info = ""
+
+        text += (
+            f"🔑 ID: {app.unique_id}\n"
+            f"👤 User ID: {app.user_id}\n"
+            f"💅 Услуга: {app.service}\n"
+            f"{master_info}"
+            f"📅 Дата: {app.date}\n"
+            f"⏰ Время: {app.time}\n"
+            "━━━━━━━━━━━━━━\n"
+        )
+
+    # Выводим с кнопками навигации
+    await callback.message.edit_text(
+        text,
+        reply_markup=get_admin_appointments_kb(
+            service, appointments[0], appointments[-1], has_prev, has_next
+        )
+    )
+
 # Управление мастерами
 @router.callback_query(F.data == "admin_masters")
 async def admin_masters_handler(callback: types.CallbackQuery):
-    if not is_admin(callback.message):
+    if not is_admin(callback):
         return
 
     try:
         # Получаем список всех мастеров
-        masters = db.get_all_masters()
+        masters = await db.get_all_masters()
 
         if not masters:
             text = "👨‍🔧 Список мастеров пуст."
@@ -109,12 +190,11 @@ async def admin_masters_handler(callback: types.CallbackQuery):
             # Формируем текст с мастерами
             text = "👨‍🔧 Список мастеров:\n\n"
             for master in masters:
-                username = f" (@{master[5]})" if master[5] else ""
                 text += (
-                    f"🔑 ID: {master[0]}\n"
-                    f"👤 Имя: {master[1]} {master[2]}{username}\n"
-                    f"💅 Услуга: {master[3]}\n"
-                    f"🆔 TG ID: {master[4]}\n"
+                    f"🔑 ID: {master.id}\n"
+                    f"👤 Имя: {master.full_name}\n"
+                    f"💅 Услуга: {master.service}\n"
+                    f"🆔 TG ID: {master.telegram_id}\n"
                     "━━━━━━━━━━━━━━\n"
                 )
 
@@ -130,7 +210,7 @@ async def admin_masters_handler(callback: types.CallbackQuery):
 # Добавление мастера - запрос имени
 @router.callback_query(F.data == "admin_add_master")
 async def admin_add_master_handler(callback: types.CallbackQuery, state: FSMContext):
-    if not is_admin(callback.message):
+    if not is_admin(callback):
         return
 
     await callback.message.answer("Введите имя и фамилию мастера (например, Иван Иванов):")
@@ -202,7 +282,7 @@ async def admin_add_master_telegram_handler(message: types.Message, state: FSMCo
             "username": username
         }
         
-        success = db.add_master(master_data)
+        success = await db.add_master(master_data)
         
         if success:
             await message.answer("✅ Мастер успешно добавлен")
@@ -220,7 +300,7 @@ async def admin_add_master_telegram_handler(message: types.Message, state: FSMCo
 # Удаление мастера - запрос ID
 @router.callback_query(F.data == "admin_delete_master")
 async def admin_delete_master_handler(callback: types.CallbackQuery, state: FSMContext):
-    if not is_admin(callback.message):
+    if not is_admin(callback):
         return
 
     await callback.message.answer("Введите ID мастера для удаления:")
@@ -237,16 +317,16 @@ async def admin_delete_master_id_handler(message: types.Message, state: FSMConte
         master_id = int(message.text.strip())
         
         # Получаем мастера по ID
-        master = db.get_master_by_id(master_id)
+        master = await db.get_master_by_id(master_id)
         if not master:
             await message.answer("⚠️ Мастер с таким ID не найден")
             return
 
         # Удаляем мастера
-        success = db.delete_master(master_id)
+        success = await db.delete_master(master_id)
         
         if success:
-            await message.answer(f"✅ Мастер {master[1]} {master[2]} успешно удален")
+            await message.answer(f"✅ Мастер {master.first_name} {master.last_name} успешно удален")
         else:
             await message.answer("⚠️ Ошибка удаления мастера из базы данных")
             
@@ -259,42 +339,76 @@ async def admin_delete_master_id_handler(message: types.Message, state: FSMConte
         await message.answer("⚠️ Ошибка удаления мастера")
 
 # Просмотр отзывов
-@router.callback_query(F.data == "admin_reviews")
+@router.callback_query(F.data.in_({"admin_reviews", "admin_reviews_pending"}))
 async def admin_reviews_handler(callback: types.CallbackQuery):
-    if not is_admin(callback.message):
+    if not is_admin(callback):
         return
 
     try:
-        # Получаем все отзывы
-        reviews, error = review_service.get_all_reviews()
-        
-        if error:
-            await callback.answer(f"⚠️ {error}")
-            return
-            
-        if not reviews:
-            await callback.answer("📭 Нет отзывов")
-            return
+        # Первая страница всех отзывов или ожидающих модерации
+        review_filter = "pending" if callback.data.endswith("_pending") else "all"
+        await show_reviews_page(callback, review_filter)
+    except Exception as e:
+        logging.error(f"Ошибка в обработчике просмотра отзывов: {e}")
+        await callback.answer("⚠️ Ошибка загрузки отзывов")
 
-        # Отображаем список отзывов
-        await callback.message.edit_text(
-            "📝 Список отзывов:",
-            reply_markup=get_admin_reviews_kb(reviews)
+# Переход по страницам отзывов
+@router.callback_query(F.data.startswith("admin_rpage_"))
+async def admin_reviews_page_handler(callback: types.CallbackQuery):
+    if not is_admin(callback):
+        return
+
+    try:
+        # Формат: admin_rpage_{all|pending}_{n|p}_{id}
+        _, _, review_filter, direction, review_id = callback.data.split("_")
+        await show_reviews_page(
+            callback,
+            review_filter,
+            cursor_id=int(review_id),
+            backward=direction == "p"
         )
     except Exception as e:
-        logging.error(f"Ошибка в обработчике просмотра отзывов: {e}")
+        logging.error(f"Ошибка в обработчике страницы отзывов: {e}")
         await callback.answer("⚠️ Ошибка загрузки отзывов")
 
+async def show_reviews_page(callback, review_filter, cursor_id=None, backward=False):
+    """Вывод одной страницы отзывов одним запросом"""
+    page, error = await review_service.get_reviews_page(
+        cursor_id, backward, review_filter == "pending", ADMIN_PAGE_SIZE
+    )
+
+    if error:
+        await callback.answer(f"⚠️ {error}")
+        return
+
+    reviews, has_prev, has_next = page
+    if not reviews:
+        if review_filter == "pending":
+            await callback.message.edit_text(
+                "✅ Нет отзывов, ожидающих модерации",
+                reply_markup=get_admin_reviews_kb([], review_filter, False, False)
+            )
+        else:
+            await callback.answer("📭 Нет отзывов")
+        return
+
+    # Отображаем страницу отзывов
+    title = "🕓 Отзывы, ожидающие модерации:" if review_filter == "pending" else "📝 Список отзывов:"
+    await callback.message.edit_text(
+        title,
+        reply_markup=get_admin_reviews_kb(reviews, review_filter, has_prev, has_next)
+    )
+
 # Просмотр деталей отзыва
 @router.callback_query(F.data.startswith("admin_review_"))
 async def admin_review_detail_handler(callback: types.CallbackQuery):
-    if not is_admin(callback.message):
+    if not is_admin(callback):
         return
 
     try:
-        # Извлекаем ID отзыва
-        review_id = callback.data.split("_")[2]
-        review = db.get_review_by_id(review_id)
+        # Формат: admin_review_{id}_{all|pending}
+        review_id, review_filter = parse_review_callback(callback.data)
+        review = await db.get_review_by_id(review_id)
 
         if not review:
             await callback.answer("⚠️ Отзыв не найден")
@@ -302,49 +416,162 @@ async def admin_review_detail_handler(callback: types.CallbackQuery):
 
         # Формируем текст с деталями отзыва
         text = (
-            f"⭐ Рейтинг: {review[1]}\n"
-            f"💬 Комментарий: {review[2]}\n"
-            f"💅 Услуга: {review[3]}\n"
-            f"👤 User ID: {review[4]}\n"
-            f"📅 Дата: {review[5]}"
+            f"⭐ Рейтинг: {review.rating}\n"
+            f"💬 Комментарий: {review.comment}\n"
+            f"💅 Услуга: {review.service}\n"
+            f"👤 User ID: {review.user_id}\n"
+            f"📅 Дата: {review.created_at}\n"
+            f"{'✅ Проверен' if review.moderated else '🕓 Ожидает модерации'}"
         )
 
         # Отображаем с кнопками управления
         await callback.message.edit_text(
             text,
-            reply_markup=get_admin_review_detail_kb(review_id)
+            reply_markup=get_admin_review_detail_kb(review_id, review_filter)
         )
     except Exception as e:
         logging.error(f"Ошибка в обработчике просмотра деталей отзыва: {e}")
         await callback.answer("⚠️ Ошибка загрузки отзыва")
 
+def parse_review_callback(data):
+    """ID отзыва и фильтр списка из callback_data вида admin_{действие}_{id}_{фильтр}"""
+    parts = data.split("_")
+    review_filter = parts[3] if len(parts) > 3 else "all"
+    return int(parts[2]), review_filter
+
+# Одобрение отзыва
+@router.callback_query(F.data.startswith("admin_approve_"))
+async def admin_approve_review_handler(callback: types.CallbackQuery):
+    if not is_admin(callback):
+        return
+
+    try:
+        review_id, review_filter = parse_review_callback(callback.data)
+
+        success, error = await review_service.approve_review(review_id)
+
+        if success:
+            await callback.answer("✅ Отзыв одобрен")
+            # Возвращаемся к списку, из которого открыт отзыв
+            await show_reviews_page(callback, review_filter)
+        else:
+            await callback.answer(f"⚠️ {error}")
+    except Exception as e:
+        logging.error(f"Ошибка в обработчике одобрения отзыва: {e}")
+        await callback.answer("⚠️ Ошибка одобрения отзыва")
+
 # Блокировка отзыва
 @router.callback_query(F.data.startswith("admin_block_"))
 async def admin_block_review_handler(callback: types.CallbackQuery):
-    if not is_admin(callback.message):
+    if not is_admin(callback):
         return
 
     try:
         # Извлекаем ID отзыва
-        review_id = callback.data.split("_")[2]
+        review_id, review_filter = parse_review_callback(callback.data)
         
         # Блокируем отзыв
-        success, error = review_service.block_review(review_id)
+        success, error = await review_service.block_review(review_id)
         
         if success:
             await callback.answer("✅ Отзыв заблокирован")
             # Возвращаемся к списку отзывов
-            await admin_reviews_handler(callback)
+            await show_reviews_page(callback, review_filter)
         else:
             await callback.answer(f"⚠️ {error}")
     except Exception as e:
         logging.error(f"Ошибка в обработчике блокировки отзыва: {e}")
         await callback.answer("⚠️ Ошибка блокировки отзыва")
 
+# Импорт - запрос файла
+@router.callback_query(F.data == "admin_import")
+async def admin_import_handler(callback: types.CallbackQuery, state: FSMContext):
+    if not is_admin(callback):
+        return
+
+    await callback.message.answer(
+        "📥 Отправьте файл CSV (с заголовком) или JSONL.\n"
+        "Имя файла должно начинаться с masters или appointments.\n\n"
+        "masters: first_name, last_name, service, telegram_id, username\n"
+        "appointments: unique_id, user_id, service, date, time, master_id, status, created_at, duration\n\n"
+        "duration — длительность в минутах; если ее нет, берется длительность услуги. "
+        "Активные записи, пересекающиеся с занятым временем мастера, пропускаются."
+    )
+    await state.set_state(AdminStates.importing_file)
+
+# Импорт - загрузка файла одной транзакцией
+@router.message(AdminStates.importing_file, F.document)
+async def admin_import_file_handler(message: types.Message, state: FSMContext):
+    if not is_admin(message):
+        return
+
+    try:
+        filename = message.document.file_name or ""
+        kind = next((k for k in ("masters", "appointments") if filename.lower().startswith(k)), None)
+        fmt = detect_format(filename)
+        if kind is None or fmt is None:
+            await message.answer("⚠️ Ожидается файл masters.csv, appointments.jsonl и т.п.")
+            return
+
+        buffer = await bot.download(message.document)
+        lines = io.TextIOWrapper(buffer, encoding="utf-8-sig", newline="")
+        count, error = await transfer_service.import_file(kind, lines, fmt)
+
+        if error:
+            await message.answer(f"⚠️ Импорт отменен: {error}")
+        else:
+            await message.answer(f"✅ Импортировано строк: {count}")
+        await state.clear()
+    except Exception as e:
+        logging.error(f"Ошибка в обработчике импорта: {e}")
+        await message.answer("⚠️ Ошибка импорта файла")
+
+# Выгрузка - выбор данных и формата
+@router.callback_query(F.data == "admin_export")
+async def admin_export_handler(callback: types.CallbackQuery):
+    if not is_admin(callback):
+        return
+
+    await callback.message.edit_text(
+        "📤 Что выгрузить?",
+        reply_markup=get_admin_export_kb()
+    )
+
+# Выгрузка - отправка файла
+@router.callback_query(F.data.startswith("admin_export_"))
+async def admin_export_file_handler(callback: types.CallbackQuery):
+    if not is_admin(callback):
+        return
+
+    path = None
+    try:
+        _, _, kind, fmt = callback.data.split("_")
+        await callback.answer("⏳ Готовим файл...")
+
+        # Файл пишется на диск по пачкам, чтобы не держать таблицу в памяти
+        fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+        os.close(fd)
+        count, error = await transfer_service.export_to_file(kind, fmt, path)
+        if error:
+            await callback.message.answer(f"⚠️ {error}")
+            return
+
+        filename = f"{kind}_{datetime.now().strftime('%Y%m%d_%H%M')}.{fmt}"
+        await callback.message.answer_document(
+            types.FSInputFile(path, filename=filename),
+            caption=f"Строк: {count}"
+        )
+    except Exception as e:
+        logging.error(f"Ошибка в обработчике выгрузки: {e}")
+        await callback.message.answer("⚠️ Ошибка выгрузки")
+    finally:
+        if path:
+            os.remove(path)
+
 # Возврат в главное меню админа
 @router.callback_query(F.data == "admin_back")
 async def admin_back_handler(callback: types.CallbackQuery):
-    if not is_admin(callback.message):
+    if not is_admin(callback):
         return
 
     try:
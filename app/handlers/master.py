@@ -5,7 +5,7 @@ from aiogram.filters import Command
 from app.utils.helpers import format_master_info
 
 # Создаем роутер для команд мастеров
-router = Router()
+router = Router(name="master")
 
 # Инициализируем сервисы
 db = None
@@ -20,13 +20,13 @@ def init_services(database):
 async def my_appointments_handler(message: types.Message):
     try:
         # Проверяем, является ли пользователь мастером
-        master = db.get_master_by_telegram_id(message.from_user.id)
+        master = await db.get_master_by_telegram_id(message.from_user.id)
         if not master:
             await message.answer("⚠️ Вы не зарегистрированы как мастер.")
             return
 
         # Получаем все предстоящие записи
-        appointments = db.get_upcoming_appointments_for_master(master[0])
+        appointments = await db.get_upcoming_appointments_for_master(master.id)
         
         if not appointments:
             await message.answer("📭 У вас нет предстоящих записей.")
@@ -38,7 +38,7 @@ async def my_appointments_handler(message: types.Message):
         # Группируем записи по дате
         appointments_by_date = {}
         for app in appointments:
-            date = app[1]
+            date = app.date
             if date not in appointments_by_date:
                 appointments_by_date[date] = []
             appointments_by_date[date].append(app)
@@ -46,11 +46,11 @@ async def my_appointments_handler(message: types.Message):
         # Выводим записи сгруппированные по датам
         for date, apps in sorted(appointments_by_date.items()):
             text += f"📅 {date}:\n"
-            for app in sorted(apps, key=lambda x: x[2]):  # Сортируем по времени
+            for app in sorted(apps, key=lambda x: x.time):  # Сортируем по времени
                 text += (
-                    f"⏰ {app[2]} - {app[3]}\n"
-                    f"👤 Клиент: ID {app[4]}\n"
-                    f"🔑 ID записи: {app[0]}\n"
+                    f"⏰ {app.time} - {app.service}\n"
+                    f"👤 Клиент: ID {app.user_id}\n"
+                    f"🔑 ID записи: {app.unique_id}\n"
                 )
             text += "━━━━━━━━━━━━━━\n"
 
@@ -64,13 +64,13 @@ async def my_appointments_handler(message: types.Message):
 async def today_appointments_handler(message: types.Message):
     try:
         # Проверяем, является ли пользователь мастером
-        master = db.get_master_by_telegram_id(message.from_user.id)
+        master = await db.get_master_by_telegram_id(message.from_user.id)
         if not master:
             await message.answer("⚠️ Вы не зарегистрированы как мастер.")
             return
 
         # Получаем сегодняшние записи
-        appointments = db.get_today_appointments_for_master(master[0])
+        appointments = await db.get_today_appointments_for_master(master.id)
         
         if not appointments:
             await message.answer("📭 У вас нет записей на сегодня.")
@@ -79,11 +79,11 @@ async def today_appointments_handler(message: types.Message):
         # Формируем список записей
         text = f"👨‍🔧 {format_master_info(master)}\n📋 Ваши записи на сегодня:\n\n"
         
-        for app in sorted(appointments, key=lambda x: x[3]):  # Сортируем по времени
+        for app in sorted(appointments, key=lambda x: x.time):  # Сортируем по времени
             text += (
-                f"⏰ {app[3]} - {app[2]}\n"
-                f"👤 Клиент: ID {app[1]}\n"
-                f"🔑 ID записи: {app[0]}\n"
+                f"⏰ {app.time} - {app.service}\n"
+                f"👤 Клиент: ID {app.user_id}\n"
+                f"🔑 ID записи: {app.unique_id}\n"
                 "━━━━━━━━━━━━━━\n"
             )
 
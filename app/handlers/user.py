@@ -9,14 +9,16 @@ from app.keyboards.user_kb import (
     get_masters_kb, 
     get_dates_kb, 
     get_times_kb, 
-    get_confirmation_kb
+    get_confirmation_kb,
+    get_first_available_kb
 )
 from app.services.appointment import AppointmentService
+from app.services.availability import service_duration
 from app.services.review import ReviewService
 from app.utils.helpers import format_master_info
 
 # Создаем роутер для пользовательских команд
-router = Router()
+router = Router(name="user")
 
 # Инициализируем сервисы (они будут переданы при регистрации роутера)
 appointment_service = None
@@ -53,7 +55,7 @@ async def service_handler(callback: types.CallbackQuery, state: FSMContext):
         await state.update_data(service=service)
 
         # Получаем список мастеров для выбранной услуги
-        masters = db.get_masters_by_service(service)
+        masters = await db.get_masters_by_service(service)
         if not masters:
             await callback.message.answer("⚠ Нет доступных мастеров для этой услуги")
             return
@@ -68,22 +70,75 @@ async def service_handler(callback: types.CallbackQuery, state: FSMContext):
         logging.error(f"Ошибка в обработчике выбора услуги: {e}")
         await callback.message.answer("⚠ Ошибка выбора услуги")
 
+def confirmation_text(data):
+    """Текст подтверждения записи по данным состояния"""
+    return (
+        "✅ Подтвердите запись:\n"
+        f"💅 Услуга: {data['service']}\n"
+        f"👨‍🔧 Мастер: {data['master_name']}\n"
+        f"📅 Дата: {data['date']}\n"
+        f"⏰ Время: {data['time']}\n"
+        f"⏱ Длительность: {service_duration(data['service'])} мин"
+    )
+
+# Ближайшее свободное время у всех мастеров услуги
+@router.callback_query(F.data == "first_available", BookingStates.choosing_master)
+async def first_available_handler(callback: types.CallbackQuery, state: FSMContext):
+    try:
+        data = await state.get_data()
+        slots = await appointment_service.find_first_available(data['service'])
+        if not slots:
+            await callback.answer("⚠️ Нет свободного времени на ближайший месяц", show_alert=True)
+            return
+
+        await callback.message.edit_text(
+            "⚡ Ближайшее свободное время:",
+            reply_markup=get_first_available_kb(slots)
+        )
+    except Exception as e:
+        logging.error(f"Ошибка поиска ближайшего свободного времени: {e}")
+        await callback.answer("⚠️ Ошибка поиска свободного времени")
+
+@router.callback_query(F.data.startswith("earliest_"), BookingStates.choosing_master)
+async def earliest_slot_handler(callback: types.CallbackQuery, state: FSMContext):
+    try:
+        # earliest_{master_id}_{дата}_{время}
+        _, master_id, selected_date, selected_time = callback.data.split("_")
+        master = await db.get_master_by_id(int(master_id))
+        if not master:
+            await callback.answer("⚠️ Мастер не найден")
+            return
+
+        data = await state.update_data(
+            master_id=master.id,
+            master_name=format_master_info(master),
+            date=selected_date,
+            time=selected_time
+        )
+        await callback.message.edit_text(
+            confirmation_text(data),
+            reply_markup=get_confirmation_kb()
+        )
+        await state.set_state(BookingStates.confirmation)
+    except Exception as e:
+        logging.error(f"Ошибка выбора ближайшего свободного времени: {e}")
+        await callback.answer("⚠️ Ошибка выбора времени")
+
 # Выбор мастера
 @router.callback_query(F.data.startswith("master_"), BookingStates.choosing_master)
 async def master_handler(callback: types.CallbackQuery, state: FSMContext):
     try:
         # Извлекаем ID мастера из callback_data
         master_id = int(callback.data.split("_")[1])
-        master = db.get_master_by_id(master_id)
+        master = await db.get_master_by_id(master_id)
         
         if not master:
             await callback.answer("⚠️ Мастер не найден")
             return
 
         # Сохраняем информацию о мастере
-        await state.update_data(master_id=master_id)
         master_name = format_master_info(master)
-        await state.update_data(master_name=master_name)
+        await state.update_data(master_id=master_id, master_name=master_name)
 
         # Отображаем доступные даты
         await callback.message.edit_text(
@@ -106,12 +161,19 @@ async def date_handler(callback: types.CallbackQuery, state: FSMContext):
         selected_date = callback.data.split("_")[1]
         data = await state.get_data()
 
-        if 'service' not in data:
-            await callback.answer("⚠ Сначала выберите услугу!")
+        if 'master_id' not in data:
+            await callback.answer("⚠ Сначала выберите мастера!")
             return
 
-        # Получаем уже забронированное время
-        booked_times = db.get_booked_times(selected_date, data['service'])
+        # Времена начала по рабочим часам мастера и длительности услуги
+        slots = await appointment_service.get_time_slots(
+            data['master_id'],
+            selected_date,
+            data['service']
+        )
+        if not slots:
+            await callback.answer("⚠️ Мастер не работает в этот день, выберите другую дату")
+            return
         
         # Сохраняем выбранную дату
         await state.update_data(date=selected_date)
@@ -119,7 +181,7 @@ async def date_handler(callback: types.CallbackQuery, state: FSMContext):
         # Отображаем доступное время
         await callback.message.edit_text(
             f"⏰ Выберите время для {selected_date}:",
-            reply_markup=get_times_kb(selected_date, booked_times)
+            reply_markup=get_times_kb(selected_date, slots)
         )
         await state.set_state(BookingStates.choosing_time)
     except Exception as e:
@@ -130,28 +192,18 @@ async def date_handler(callback: types.CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("time_"), BookingStates.choosing_time)
 async def time_handler(callback: types.CallbackQuery, state: FSMContext):
     try:
-        # Проверяем, не заблокировано ли время
+        # Кнопка занятого времени из сообщений до появления листа ожидания
         if callback.data == "time_blocked":
             await callback.answer("⚠️ Это время уже занято!")
             return
             
         # Извлекаем выбранное время
         selected_time = callback.data.split("_")[1]
-        await state.update_data(time=selected_time)
-        data = await state.get_data()
-
-        # Формируем текст подтверждения
-        text = (
-            "✅ Подтвердите запись:\n"
-            f"💅 Услуга: {data['service']}\n"
-            f"👨‍🔧 Мастер: {data['master_name']}\n"
-            f"📅 Дата: {data['date']}\n"
-            f"⏰ Время: {data['time']}"
-        )
+        data = await state.update_data(time=selected_time)
 
         # Отображаем подтверждение
         await callback.message.edit_text(
-            text, 
+            confirmation_text(data), 
             reply_markup=get_confirmation_kb()
         )
         await state.set_state(BookingStates.confirmation)
@@ -159,6 +211,82 @@ async def time_handler(callback: types.CallbackQuery, state: FSMContext):
         logging.error(f"Ошибка в обработчике выбора времени: {e}")
         await callback.message.answer("⚠️ Ошибка выбора времени")
 
+# Постановка в лист ожидания на занятое время
+@router.callback_query(F.data.startswith("wait_"), BookingStates.choosing_time)
+async def waitlist_join_handler(callback: types.CallbackQuery, state: FSMContext):
+    try:
+        selected_time = callback.data.split("_")[1]
+        data = await state.get_data()
+
+        success, error = await appointment_service.waitlist.join(
+            callback.from_user.id,
+            data['service'],
+            data['master_id'],
+            data['date'],
+            selected_time
+        )
+
+        if error:
+            await callback.answer(f"⚠️ {error}", show_alert=True)
+            return
+
+        # Пользователь может выбрать другое время, состояние не меняется
+        await callback.answer(
+            f"⏳ Вы в листе ожидания на {data['date']} {selected_time}. "
+            "Если время освободится, мы пришлем предложение.",
+            show_alert=True
+        )
+    except Exception as e:
+        logging.error(f"Ошибка постановки в лист ожидания: {e}")
+        await callback.answer("⚠️ Ошибка постановки в лист ожидания")
+
+# Ответ на предложение слота из листа ожидания
+@router.callback_query(F.data.startswith("waitlist_accept_"))
+async def waitlist_accept_handler(callback: types.CallbackQuery):
+    try:
+        unique_id = callback.data.split("_")[2]
+
+        appointment_data, error = await appointment_service.waitlist.accept(
+            unique_id,
+            callback.from_user.id
+        )
+
+        if error:
+            await callback.message.edit_text(f"⚠️ {error}")
+            return
+
+        # Уведомления и напоминания как для обычной записи
+        await appointment_service.process_appointment(callback.from_user.id, appointment_data)
+        await callback.message.edit_text(
+            f"✅ Запись успешно создана!\n"
+            f"💅 Услуга: {appointment_data['service']}\n"
+            f"📅 Дата: {appointment_data['date']}\n"
+            f"⏰ Время: {appointment_data['time']}\n"
+            f"Ваш ID: {appointment_data['unique_id']}"
+        )
+    except Exception as e:
+        logging.error(f"Ошибка подтверждения записи из листа ожидания: {e}")
+        await callback.answer("⚠️ Ошибка создания записи")
+
+@router.callback_query(F.data.startswith("waitlist_decline_"))
+async def waitlist_decline_handler(callback: types.CallbackQuery):
+    try:
+        unique_id = callback.data.split("_")[2]
+
+        success, error = await appointment_service.waitlist.decline(
+            unique_id,
+            callback.from_user.id
+        )
+
+        if error:
+            await callback.message.edit_text(f"⚠️ {error}")
+            return
+
+        await callback.message.edit_text("❌ Вы отказались от предложенного времени")
+    except Exception as e:
+        logging.error(f"Ошибка отказа от слота из листа ожидания: {e}")
+        await callback.answer("⚠️ Ошибка отказа от записи")
+
 # Подтверждение записи
 @router.callback_query(F.data == "confirm_yes", BookingStates.confirmation)
 async def confirm_yes_handler(callback: types.CallbackQuery, state: FSMContext):
@@ -167,7 +295,7 @@ async def confirm_yes_handler(callback: types.CallbackQuery, state: FSMContext):
         data = await state.get_data()
         
         # Создаем запись
-        appointment_data, error = appointment_service.create_appointment(
+        appointment_data, error = await appointment_service.create_appointment(
             callback.from_user.id,
             data['service'],
             data['date'],
@@ -250,8 +378,8 @@ async def review_handler(callback: types.CallbackQuery, state: FSMContext):
             
         unique_id, rating = parts[1], parts[2]
         
-        # Проверяем существование записи
-        appointment = db.get_appointment_by_id(unique_id)
+        # Проверяем существование записи (отзыв можно оставить и на архивную)
+        appointment = await db.get_appointment_by_id(unique_id, include_archive=True)
         if not appointment:
             await callback.answer("⚠️ Запись не найдена!")
             return
@@ -280,7 +408,7 @@ async def review_comment_handler(message: types.Message, state: FSMContext):
         comment = message.text if message.text != "-" else ""
 
         # Добавляем отзыв
-        success, error = review_service.add_review(
+        success, error = await review_service.add_review(
             data['review_unique_id'],
             message.from_user.id,
             data['review_rating'],
@@ -303,7 +431,7 @@ async def review_comment_handler(message: types.Message, state: FSMContext):
 async def user_reviews_handler(message: types.Message):
     try:
         # Получаем отзывы пользователя
-        reviews, error = review_service.get_user_reviews(message.from_user.id)
+        reviews, error = await review_service.get_user_reviews(message.from_user.id)
         
         if error:
             await message.answer(f"⚠️ {error}")
@@ -317,10 +445,10 @@ async def user_reviews_handler(message: types.Message):
         text = "⭐ Ваши отзывы:\n\n"
         for review in reviews:
             text += (
-                f"💅 Услуга: {review[2]}\n"
-                f"📅 Дата: {review[3]}\n"
-                f"Рейтинг: {review[0]}⭐\n"
-                f"💬 Комментарий: {review[1]}\n"
+                f"💅 Услуга: {review.service}\n"
+                f"📅 Дата: {review.appointment_date}\n"
+                f"Рейтинг: {review.rating}⭐\n"
+                f"💬 Комментарий: {review.comment}\n"
                 "━━━━━━━━━━━━━━\n"
             )
 
@@ -1,19 +1,19 @@
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from app.config import SERVICES
 
-def get_admin_main_kb():
-    """Основная клавиатура админа"""
+def _build_admin_main_kb():
     builder = InlineKeyboardBuilder()
     for service, emoji in SERVICES.items():
         builder.button(text=f"{emoji} {service}", callback_data=f"admin_service_{service}")
     
     builder.button(text="👨‍🔧 Управление мастерами", callback_data="admin_masters")
     builder.button(text="📝 Отзывы", callback_data="admin_reviews")
+    builder.button(text="📥 Импорт", callback_data="admin_import")
+    builder.button(text="📤 Выгрузка", callback_data="admin_export")
     builder.adjust(2)
     return builder.as_markup()
 
-def get_admin_masters_kb():
-    """Клавиатура управления мастерами"""
+def _build_admin_masters_kb():
     builder = InlineKeyboardBuilder()
     builder.button(text="➕ Добавить мастера", callback_data="admin_add_master")
     builder.button(text="➖ Удалить мастера", callback_data="admin_delete_master")
@@ -21,28 +21,94 @@ def get_admin_masters_kb():
     builder.adjust(1)
     return builder.as_markup()
 
-def get_admin_reviews_kb(reviews):
-    """Клавиатура с отзывами для админа"""
+def _build_admin_back_kb():
+    builder = InlineKeyboardBuilder()
+    builder.button(text="🔙 Назад", callback_data="admin_back")
+    return builder.as_markup()
+
+def _build_admin_export_kb():
+    builder = InlineKeyboardBuilder()
+    for kind, title in (("appointments", "Записи"), ("archive", "Архив"), ("reviews", "Отзывы")):
+        for fmt in ("csv", "jsonl"):
+            builder.button(text=f"{title} ({fmt.upper()})", callback_data=f"admin_export_{kind}_{fmt}")
+    builder.button(text="🔙 Назад", callback_data="admin_back")
+    builder.adjust(2, 2, 2, 1)
+    return builder.as_markup()
+
+# Статичные клавиатуры строятся один раз при импорте
+ADMIN_MAIN_KB = _build_admin_main_kb()
+ADMIN_MASTERS_KB = _build_admin_masters_kb()
+ADMIN_BACK_KB = _build_admin_back_kb()
+ADMIN_EXPORT_KB = _build_admin_export_kb()
+
+def get_admin_main_kb():
+    """Основная клавиатура админа"""
+    return ADMIN_MAIN_KB
+
+def get_admin_masters_kb():
+    """Клавиатура управления мастерами"""
+    return ADMIN_MASTERS_KB
+
+def get_admin_appointments_kb(service, first, last, has_prev, has_next):
+    """Клавиатура навигации по страницам записей услуги"""
+    builder = InlineKeyboardBuilder()
+    buttons = 0
+    if has_prev:
+        builder.button(
+            text="⬅️",
+            callback_data=f"admin_page_{service}_p_{first.date}_{first.time}_{first.id}"
+        )
+        buttons += 1
+    if has_next:
+        builder.button(
+            text="➡️",
+            callback_data=f"admin_page_{service}_n_{last.date}_{last.time}_{last.id}"
+        )
+        buttons += 1
+    builder.button(text="🔙 Назад", callback_data="admin_back")
+    builder.adjust(*([buttons] if buttons else []), 1)
+    return builder.as_markup()
+
+def reviews_list_callback(review_filter):
+    """callback_data первой страницы списка отзывов с фильтром all или pending"""
+    return "admin_reviews_pending" if review_filter == "pending" else "admin_reviews"
+
+def get_admin_reviews_kb(reviews, review_filter, has_prev, has_next):
+    """Клавиатура страницы отзывов для админа"""
     builder = InlineKeyboardBuilder()
     for review in reviews:
         builder.button(
-            text=f"⭐ {review[1]} от пользователя {review[4]}",
-            callback_data=f"admin_review_{review[0]}"
+            text=f"⭐ {review.rating} от пользователя {review.user_id}",
+            callback_data=f"admin_review_{review.id}_{review_filter}"
         )
+    buttons = 0
+    if has_prev:
+        builder.button(text="⬅️", callback_data=f"admin_rpage_{review_filter}_p_{reviews[0].id}")
+        buttons += 1
+    if has_next:
+        builder.button(text="➡️", callback_data=f"admin_rpage_{review_filter}_n_{reviews[-1].id}")
+        buttons += 1
+    if review_filter == "pending":
+        builder.button(text="📝 Все отзывы", callback_data=reviews_list_callback("all"))
+    else:
+        builder.button(text="🕓 Ожидают модерации", callback_data=reviews_list_callback("pending"))
     builder.button(text="🔙 Назад", callback_data="admin_back")
-    builder.adjust(1)
+    builder.adjust(*([1] * len(reviews)), *([buttons] if buttons else []), 1, 1)
     return builder.as_markup()
 
-def get_admin_review_detail_kb(review_id):
+def get_admin_review_detail_kb(review_id, review_filter="all"):
     """Клавиатура деталей отзыва"""
     builder = InlineKeyboardBuilder()
-    builder.button(text="🚫 Заблокировать", callback_data=f"admin_block_{review_id}")
-    builder.button(text="🔙 Назад", callback_data="admin_reviews")
+    builder.button(text="✅ Одобрить", callback_data=f"admin_approve_{review_id}_{review_filter}")
+    builder.button(text="🚫 Заблокировать", callback_data=f"admin_block_{review_id}_{review_filter}")
+    builder.button(text="🔙 Назад", callback_data=reviews_list_callback(review_filter))
     builder.adjust(1)
     return builder.as_markup()
 
 def get_admin_back_kb():
     """Клавиатура с кнопкой Назад"""
-    builder = InlineKeyboardBuilder()
-    builder.button(text="🔙 Назад", callback_data="admin_back")
-    return builder.as_markup()
+    return ADMIN_BACK_KB
+
+def get_admin_export_kb():
+    """Клавиатура выбора выгрузки"""
+    return ADMIN_EXPORT_KB
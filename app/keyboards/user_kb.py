@@ -1,65 +1,98 @@
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.types import InlineKeyboardButton
-from datetime import datetime, timedelta
+from datetime import date, timedelta
+from functools import lru_cache
 from app.config import SERVICES
 
-def get_services_kb():
-    """Клавиатура для выбора услуги"""
+def _build_services_kb():
     builder = InlineKeyboardBuilder()
     for service, emoji in SERVICES.items():
         builder.button(text=f"{emoji} {service}", callback_data=f"service_{service}")
     builder.adjust(2)
     return builder.as_markup()
 
+# Статичные клавиатуры строятся один раз при импорте
+SERVICES_KB = _build_services_kb()
+
+def get_services_kb():
+    """Клавиатура для выбора услуги"""
+    return SERVICES_KB
+
 def get_masters_kb(masters):
     """Клавиатура для выбора мастера"""
     builder = InlineKeyboardBuilder()
     for master in masters:
+        # Средняя оценка, если у мастера есть отзывы
+        badge = f" ⭐ {master.rating:.1f} ({master.rating_count})" if master.rating_count else ""
         builder.button(
-            text=f"{master[1]} {master[2]}",
-            callback_data=f"master_{master[0]}"
+            text=f"{master.first_name} {master.last_name}{badge}",
+            callback_data=f"master_{master.id}"
+        )
+    builder.button(text="⚡ Ближайшее свободное время", callback_data="first_available")
+    builder.adjust(1)
+    return builder.as_markup()
+
+def get_first_available_kb(slots):
+    """Клавиатура ближайших свободных времен у всех мастеров услуги"""
+    builder = InlineKeyboardBuilder()
+    for date, time, master in slots:
+        day = f"{date[8:10]}.{date[5:7]}"
+        builder.button(
+            text=f"{day} {time} — {master.first_name} {master.last_name}",
+            callback_data=f"earliest_{master.id}_{date}_{time}"
         )
     builder.adjust(1)
     return builder.as_markup()
 
 def get_dates_kb():
     """Клавиатура с датами на месяц вперёд"""
+    # Клавиатура меняется только со сменой календарного дня
+    return _build_dates_kb(date.today())
+
+@lru_cache(maxsize=2)
+def _build_dates_kb(today):
     # Генерируем даты на месяц вперед
-    dates = []
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    for i in range(1, 31):
-        dates.append(today + timedelta(days=i))
+    dates = [today + timedelta(days=i) for i in range(1, 31)]
 
     builder = InlineKeyboardBuilder()
-    for date in dates:
+    for day in dates:
         builder.add(InlineKeyboardButton(
-            text=date.strftime("%d.%m.%Y"),
-            callback_data=f"date_{date.strftime('%Y-%m-%d')}"
+            text=day.strftime("%d.%m.%Y"),
+            callback_data=f"date_{day.isoformat()}"
         ))
     builder.adjust(3)
     return builder.as_markup()
 
-def get_times_kb(selected_date, booked_times):
+def get_times_kb(selected_date, slots):
     """Клавиатура с доступным временем"""
+    # slots — [(время, свободно)]: разметка зависит только от них
+    return _build_times_kb(tuple(slots))
+
+@lru_cache(maxsize=4096)
+def _build_times_kb(slots):
     builder = InlineKeyboardBuilder()
-    all_times = [f"{hour:02d}:00" for hour in range(11, 23)]
-    
-    for time in all_times:
-        if time in booked_times:
-            builder.button(text=f"❌ {time}", callback_data="time_blocked")
+    for time, free in slots:
+        if not free:
+            # Занятое время: нажатие ставит в лист ожидания
+            builder.button(text=f"❌ {time}", callback_data=f"wait_{time}")
         else:
             builder.button(text=time, callback_data=f"time_{time}")
     
     builder.adjust(4)
     return builder.as_markup()
 
-def get_confirmation_kb():
-    """Клавиатура подтверждения записи"""
+def _build_confirmation_kb():
     builder = InlineKeyboardBuilder()
     builder.button(text="✅ Подтвердить", callback_data="confirm_yes")
     builder.button(text="❌ Отменить", callback_data="confirm_no")
     return builder.as_markup()
 
+CONFIRMATION_KB = _build_confirmation_kb()
+
+def get_confirmation_kb():
+    """Клавиатура подтверждения записи"""
+    return CONFIRMATION_KB
+
 def get_rating_kb(unique_id):
     """Клавиатура для оценки"""
     builder = InlineKeyboardBuilder()
@@ -67,3 +100,11 @@ def get_rating_kb(unique_id):
         builder.button(text=f"{i}⭐", callback_data=f"review_{unique_id}_{i}")
     builder.adjust(5)
     return builder.as_markup()
+
+def get_waitlist_offer_kb(unique_id):
+    """Клавиатура предложения слота из листа ожидания"""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="✅ Записаться", callback_data=f"waitlist_accept_{unique_id}")
+    builder.button(text="❌ Отказаться", callback_data=f"waitlist_decline_{unique_id}")
+    builder.adjust(2)
+    return builder.as_markup()
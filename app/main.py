@@ -1,11 +1,15 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from app.config import BOT_TOKEN
+from app.config import BOT_TOKEN, BOT_MODE, BOT_WORKERS, DROP_PENDING_UPDATES, TELEGRAM_API_URL
+from app.database.async_db import AsyncDatabase
+from app.database.fsm_storage import create_fsm_storage
 from app.handlers import register_handlers
+from app.webhook import run_webhook
 
 # Инициализация логирования
 logging.basicConfig(
@@ -13,34 +17,53 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+# Создание бота с учетом адреса Bot API
+def create_bot():
+    if TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+        return Bot(token=BOT_TOKEN, session=session)
+    return Bot(token=BOT_TOKEN)
+
 # Функция запуска бота
 async def main():
+    if BOT_WORKERS > 1:
+        # Несколько процессов-обработчиков с общей базой
+        from app.cluster import run_cluster
+        await run_cluster(BOT_WORKERS)
+        return
+
     # Инициализация планировщика задач
     scheduler = AsyncIOScheduler()
     
-    # Инициализация хранилища состояний
-    storage = MemoryStorage()
+    # Инициализация базы данных и хранилища состояний
+    db = AsyncDatabase()
+    storage = create_fsm_storage(db)
     
     # Инициализация бота и диспетчера
-    bot = Bot(token=BOT_TOKEN)
+    bot = create_bot()
     dp = Dispatcher(storage=storage)
     
     # Регистрация обработчиков
-    db = register_handlers(dp, bot, scheduler)
+    register_handlers(dp, bot, scheduler, db)
     
     # Запуск планировщика
     scheduler.start()
     
-    # Включаем режим пропуска обновлений
-    await bot.delete_webhook(drop_pending_updates=True)
-    
     try:
-        # Запуск поллинга
-        await dp.start_polling(bot)
+        if BOT_MODE == 'webhook':
+            # Запуск aiohttp-сервера для приема обновлений
+            await run_webhook(dp, bot)
+        else:
+            # Обновления, пришедшие во время деплоя, по умолчанию сохраняются
+            await bot.delete_webhook(drop_pending_updates=DROP_PENDING_UPDATES)
+            # Запуск поллинга
+            await dp.start_polling(bot)
     finally:
         # Корректное завершение работы
         await bot.session.close()
         scheduler.shutdown()
+        await storage.close()
+        db.close()
 
 if __name__ == "__main__":
     # Запуск бота
@@ -0,0 +1,104 @@
+import copy
+from collections import defaultdict
+from aiogram import BaseMiddleware
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State
+
+# Статистика обращений к хранилищу FSM по обработчикам:
+# имя обработчика -> {'calls', 'reads', 'writes'}
+FSM_STATS = defaultdict(lambda: {'calls': 0, 'reads': 0, 'writes': 0})
+
+def get_fsm_stats():
+    """Среднее число операций с хранилищем на один вызов обработчика"""
+    return {
+        name: {
+            **stats,
+            'ops_per_call': (stats['reads'] + stats['writes']) / stats['calls']
+        }
+        for name, stats in list(FSM_STATS.items()) if stats['calls']
+    }
+
+
+class CachedFSMContext(FSMContext):
+    """Контекст FSM, который читает хранилище один раз и пишет один раз в конце"""
+
+    def __init__(self, storage, key, state):
+        super().__init__(storage=storage, key=key)
+        # Состояние уже прочитано FSMContextMiddleware (raw_state)
+        self._state = state
+        self._data = None
+        self._state_changed = False
+        self._data_changed = False
+        self.reads = 1
+        self.writes = 0
+
+    async def _load_data(self):
+        if self._data is None:
+            self._data = await self.storage.get_data(key=self.key)
+            self.reads += 1
+        return self._data
+
+    async def set_state(self, state=None):
+        self._state = state.state if isinstance(state, State) else state
+        self._state_changed = True
+
+    async def get_state(self):
+        return self._state
+
+    async def set_data(self, data):
+        self._data = dict(data)
+        self._data_changed = True
+
+    async def get_data(self):
+        return dict(await self._load_data())
+
+    async def get_value(self, key, default=None):
+        data = await self._load_data()
+        return copy.copy(data.get(key, default))
+
+    async def update_data(self, data=None, **kwargs):
+        if data:
+            kwargs.update(data)
+        current = await self._load_data()
+        current.update(kwargs)
+        self._data_changed = True
+        return dict(current)
+
+    async def clear(self):
+        self._state = None
+        self._data = {}
+        self._state_changed = True
+        self._data_changed = True
+
+    async def flush(self):
+        """Запись накопленных изменений в хранилище"""
+        if self._state_changed:
+            await self.storage.set_state(key=self.key, state=self._state)
+            self.writes += 1
+            self._state_changed = False
+        if self._data_changed:
+            await self.storage.set_data(key=self.key, data=self._data)
+            self.writes += 1
+            self._data_changed = False
+
+
+class FSMCacheMiddleware(BaseMiddleware):
+    """Подменяет FSMContext кэширующим на время обработки одного события"""
+
+    async def __call__(self, handler, event, data):
+        state = data.get('state')
+        if state is None or isinstance(state, CachedFSMContext):
+            return await handler(event, data)
+
+        context = CachedFSMContext(state.storage, state.key, data.get('raw_state'))
+        data['state'] = context
+        try:
+            return await handler(event, data)
+        finally:
+            await context.flush()
+            handler_object = data.get('handler')
+            name = handler_object.callback.__name__ if handler_object else 'unknown'
+            stats = FSM_STATS[name]
+            stats['calls'] += 1
+            stats['reads'] += context.reads
+            stats['writes'] += context.writes
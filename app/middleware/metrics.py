@@ -0,0 +1,60 @@
+import time
+from aiogram import BaseMiddleware
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery, Message
+
+from app.utils.metrics import HANDLER_LATENCY, HANDLER_ERRORS
+
+def event_prefix(event, handler):
+    """Метка события, обработанного handler: префикс callback data или команда.
+    Метка берется из фильтров обработчика, а не из текста пользователя:
+    иначе каждая выдуманная команда создавала бы новую серию метрик"""
+    if isinstance(event, CallbackQuery):
+        return (event.data or "").split("_", 1)[0] or "empty"
+    if isinstance(event, Message):
+        commands = any(isinstance(f.callback, Command) for f in handler.filters or ())
+        if commands and event.text and event.text.startswith("/"):
+            return event.text.split(maxsplit=1)[0].split("@", 1)[0]
+        return "text" if event.text else (event.content_type or "other")
+    return type(event).__name__
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Внешний middleware: время обработки события целиком, включая фильтры"""
+
+    async def __call__(self, handler, event, data):
+        # Роутер, обработчик и префикс становятся известны после фильтров,
+        # их записывает HandlerLabelMiddleware
+        labels = data['metrics_labels'] = {}
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(*self._labels(labels))
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, *self._labels(labels))
+
+    @staticmethod
+    def _labels(labels):
+        # Необработанные события — одна серия: их данные не проверены фильтрами
+        return (
+            labels.get('router', 'none'),
+            labels.get('handler', 'unhandled'),
+            labels.get('prefix', 'other')
+        )
+
+
+class HandlerLabelMiddleware(BaseMiddleware):
+    """Внутренний middleware: запоминает роутер и обработчик для метрик"""
+
+    async def __call__(self, handler, event, data):
+        labels = data.get('metrics_labels')
+        if labels is not None:
+            router = data.get('event_router')
+            handler_object = data.get('handler')
+            labels['router'] = router.name if router else 'none'
+            labels['handler'] = handler_object.callback.__name__ if handler_object else 'unknown'
+            if handler_object:
+                labels['prefix'] = event_prefix(event, handler_object)
+        return await handler(event, data)
@@ -0,0 +1,87 @@
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+# Записи, которые Database строит из строк запросов. Поля, которых нет в
+# SELECT, остаются None: запросы выбирают только нужные колонки.
+# slots=True — без __dict__ у каждого объекта (их держат кэши и планировщик).
+
+@dataclass(slots=True, frozen=True)
+class Master:
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    service: Optional[str] = None
+    telegram_id: Optional[int] = None
+    username: Optional[str] = None
+    # Из rating_stats: число и сумма оценок активных отзывов
+    rating_count: Optional[int] = None
+    rating_total: Optional[int] = None
+
+    @property
+    def full_name(self):
+        """Имя, фамилия и @username, если он есть"""
+        username = f" (@{self.username})" if self.username else ""
+        return f"{self.first_name} {self.last_name}{username}"
+
+    @property
+    def rating(self):
+        """Средняя оценка или None, если отзывов нет"""
+        return self.rating_total / self.rating_count if self.rating_count else None
+
+def new_unique_id():
+    """Короткий ID записи, который видит пользователь. Database проверяет,
+    что он не занят ни в appointments, ни в архиве"""
+    return str(uuid.uuid4())[:8].upper()
+
+@dataclass(slots=True, frozen=True)
+class Appointment:
+    unique_id: str
+    user_id: Optional[int] = None
+    service: Optional[str] = None
+    date: Optional[str] = None
+    time: Optional[str] = None
+    status: Optional[str] = None
+    master_id: Optional[int] = None
+    id: Optional[int] = None
+    # Длительность в минутах
+    duration: Optional[int] = None
+    # Мастер записи для списков админа
+    master: Optional[Master] = None
+
+@dataclass(slots=True, frozen=True)
+class Review:
+    id: Optional[int] = None
+    rating: Optional[int] = None
+    comment: Optional[str] = None
+    user_id: Optional[int] = None
+    service: Optional[str] = None
+    # Дата записи, к которой оставлен отзыв
+    appointment_date: Optional[str] = None
+    created_at: Optional[str] = None
+    moderated: Optional[int] = None
+
+@dataclass(slots=True, frozen=True)
+class RatingStats:
+    # Строка rating_stats: scope — 'service' или 'master', key — услуга или id мастера
+    scope: str
+    key: str
+    count: int
+    total: int
+    r1: int = 0
+    r2: int = 0
+    r3: int = 0
+    r4: int = 0
+    r5: int = 0
+    # Имя мастера; None для услуг и удаленных мастеров
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+
+    @property
+    def average(self):
+        return self.total / self.count
+
+    @property
+    def histogram(self):
+        """[(оценка, число отзывов)] от 5 к 1"""
+        return [(5, self.r5), (4, self.r4), (3, self.r3), (2, self.r2), (1, self.r1)]
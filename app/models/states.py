@@ -17,3 +17,4 @@ class AdminStates(StatesGroup):
     adding_master_service = State()
     adding_master_telegram = State()
     deleting_master = State()
+    importing_file = State()
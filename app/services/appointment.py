@@ -1,30 +1,43 @@
 import logging
-import uuid
 from datetime import datetime, timedelta
+from app.config import FIRST_AVAILABLE_LIMIT
+from app.models.records import new_unique_id
+from app.services.availability import AvailabilityIndex, service_duration
+from app.services.waitlist import WaitlistService
 
 class AppointmentService:
     def __init__(self, db, notification_service):
         self.db = db
         self.notification_service = notification_service
+        self.availability = AvailabilityIndex(db)
+        self.waitlist = WaitlistService(db, notification_service, self.availability)
 
     def generate_dates(self):
         """Генерация дат на месяц вперед"""
         today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         return [today + timedelta(days=i) for i in range(1, 31)]
 
-    def generate_times(self):
-        """Генерация доступного времени"""
-        return [f"{hour:02d}:00" for hour in range(11, 23)]
+    async def get_time_slots(self, master_id, date, service):
+        """Времена начала записи на услугу к мастеру: [(время, свободно)]"""
+        return await self.availability.get_slots(master_id, date, service_duration(service))
 
-    def create_appointment(self, user_id, service, date, time, master_id):
+    async def find_first_available(self, service, limit=FIRST_AVAILABLE_LIMIT):
+        """Ближайшие свободные времена на услугу у всех мастеров: [(дата, время, мастер)]"""
+        dates = [day.strftime("%Y-%m-%d") for day in self.generate_dates()]
+        return await self.availability.find_earliest(
+            service, dates, service_duration(service), limit
+        )
+
+    async def create_appointment(self, user_id, service, date, time, master_id):
         """Создание записи в базе"""
         try:
             # Генерация уникального ID записи
-            unique_id = str(uuid.uuid4())[:8].upper()
+            unique_id = new_unique_id()
             
-            # Проверяем, свободно ли выбранное время
-            booked_times = self.db.get_booked_times(date, service)
-            if time in booked_times:
+            duration = service_duration(service)
+
+            # Быстрая проверка по рабочим часам и занятым интервалам мастера
+            if not await self.availability.is_free(master_id, date, time, duration):
                 return None, "Выбранное время уже занято"
             
             # Создаем словарь с данными записи
@@ -34,14 +47,20 @@ class AppointmentService:
                 'date': date,
                 'time': time,
                 'unique_id': unique_id,
-                'master_id': master_id
+                'master_id': master_id,
+                'duration': duration
             }
             
-            # Создаем запись в базе
-            success = self.db.create_appointment(appointment_data)
+            # Создаем запись в базе (атомарно резервирует интервал мастера)
+            success = await self.db.create_appointment(appointment_data)
+            if success is None:
+                # Время успели занять параллельно: день перечитается из базы
+                self.availability.invalidate(master_id, date)
+                return None, "Выбранное время уже занято"
             if not success:
                 return None, "Ошибка создания записи в базе"
-                
+
+            self.availability.mark_booked(master_id, date, time, duration)
             return appointment_data, None
         except Exception as e:
             logging.error(f"Ошибка создания записи: {e}")
@@ -50,7 +69,7 @@ class AppointmentService:
     async def process_appointment(self, user_id, appointment_data):
         """Обработка новой записи и отправка уведомлений"""
         try:
-            # Отправляем уведомление администратору
+            # Уведомления ставятся в очередь и не задерживают ответ пользователю
             await self.notification_service.send_admin_notification(appointment_data)
             
             # Отправляем уведомление мастеру
@@ -60,7 +79,7 @@ class AppointmentService:
             )
             
             # Планируем напоминания
-            self.notification_service.schedule_notifications(user_id, appointment_data)
+            await self.notification_service.schedule_notifications(user_id, appointment_data)
             
             return True
         except Exception as e:
@@ -71,43 +90,46 @@ class AppointmentService:
         """Отмена записи"""
         try:
             # Получаем информацию о записи
-            appointment = self.db.get_appointment_by_id(unique_id)
+            appointment = await self.db.get_appointment_by_id(unique_id)
             if not appointment:
                 return False, "Запись не найдена"
                 
             # Проверяем права на отмену
-            if appointment[1] != user_id and not is_admin:
+            if appointment.user_id != user_id and not is_admin:
                 return False, "У вас нет прав на отмену этой записи"
                 
             # Проверяем статус записи
-            if appointment[6] != 'active':
+            if appointment.status != 'active':
                 return False, "Запись уже отменена"
                 
             # Отменяем запись
-            success = self.db.cancel_appointment(unique_id)
+            success = await self.db.cancel_appointment(unique_id)
             if not success:
                 return False, "Ошибка отмены записи"
+
+            # Освобождаем интервал и предлагаем его листу ожидания
+            await self.waitlist.release(appointment)
                 
             # Отправляем уведомление об отмене администратору
             await self.notification_service.send_admin_notification({
                 'unique_id': unique_id,
                 'status': 'canceled',
-                'service': appointment[2],
-                'date': appointment[3],
-                'time': appointment[4],
-                'user_id': appointment[1],
-                'master_id': appointment[8] if len(appointment) > 8 else None
+                'service': appointment.service,
+                'date': appointment.date,
+                'time': appointment.time,
+                'user_id': appointment.user_id,
+                'master_id': appointment.master_id
             })
             
             # Если запись отменена администратором, отправляем уведомление пользователю
-            if is_admin and appointment[1] != user_id:
+            if is_admin and appointment.user_id != user_id:
                 await self.notification_service.send_cancellation_notification(
-                    appointment[1],
+                    appointment.user_id,
                     {
-                        'unique_id': appointment[5],
-                        'service': appointment[2],
-                        'date': appointment[3],
-                        'time': appointment[4]
+                        'unique_id': appointment.unique_id,
+                        'service': appointment.service,
+                        'date': appointment.date,
+                        'time': appointment.time
                     }
                 )
                 
@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from app.config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_HOUR
+from app.services.leader import LeaderElection
+
+class ArchiveService:
+    """Перенос прошедших и отмененных записей в appointments_archive"""
+
+    def __init__(self, db, scheduler):
+        self.db = db
+        self.scheduler = scheduler
+        # При нескольких процессах архивирует только один
+        self.leader = LeaderElection(db, 'appointments_archiver')
+
+    def start(self):
+        """Ежедневная архивация в ARCHIVE_HOUR часов"""
+        self.scheduler.add_job(
+            self.archive_old_appointments,
+            'cron',
+            hour=ARCHIVE_HOUR,
+            id='appointments_archiver',
+            max_instances=1,
+            coalesce=True
+        )
+
+    async def archive_old_appointments(self, days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+        """Архивация записей старше days дней; возвращает (число записей, ошибка)"""
+        try:
+            before_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+            total = 0
+            while True:
+                # Аренда продлевается на каждой пачке
+                if not await self.leader.ensure():
+                    return total, None
+
+                moved = await self.db.archive_appointments(before_date, batch_size)
+                if moved is None:
+                    return total, "Ошибка архивации записей"
+                total += moved
+                if moved < batch_size:
+                    break
+                # Между пачками база свободна для обработчиков бота
+                await asyncio.sleep(0)
+
+            if total:
+                logging.info(f"Перенесено в архив записей: {total}")
+            return total, None
+        except Exception as e:
+            logging.error(f"Ошибка архивации записей: {e}")
+            return None, str(e)
@@ -0,0 +1,204 @@
+import heapq
+import time as clock
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import islice
+
+from app.config import (
+    SLOT_CACHE_TTL,
+    SLOT_STEP_MINUTES,
+    WORK_DAY_START,
+    WORK_DAY_END,
+    SERVICE_DURATIONS,
+    DEFAULT_SERVICE_DURATION
+)
+
+def to_minutes(time):
+    """'HH:MM' -> минуты от начала суток"""
+    hours, minutes = time.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def to_time(minutes):
+    """Минуты от начала суток -> 'HH:MM'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+def service_duration(service):
+    """Длительность услуги в минутах"""
+    return SERVICE_DURATIONS.get(service, DEFAULT_SERVICE_DURATION)
+
+def default_start_times(duration=DEFAULT_SERVICE_DURATION):
+    """Непересекающиеся записи подряд в рабочие часы по умолчанию"""
+    start, end = to_minutes(WORK_DAY_START), to_minutes(WORK_DAY_END)
+    return [to_time(minute) for minute in range(start, end - duration + 1, duration)]
+
+class DayAvailability:
+    """Рабочие часы и занятые интервалы мастера на один день"""
+
+    __slots__ = ("opens", "closes", "starts", "ends", "reach")
+
+    def __init__(self, hours, busy):
+        # hours: (start_time, end_time) или () — выходной
+        self.opens, self.closes = (to_minutes(hours[0]), to_minutes(hours[1])) if hours else (0, 0)
+        # Занятые интервалы [starts[i], ends[i]), отсортированные по началу
+        intervals = sorted((to_minutes(time), to_minutes(time) + duration) for time, duration in busy)
+        self.starts = [start for start, _ in intervals]
+        self.ends = [end for _, end in intervals]
+        self._rebuild_reach()
+
+    def _rebuild_reach(self):
+        # reach[i] — самый поздний конец среди первых i + 1 интервалов: с ним
+        # проверка пересечения — один bisect даже при пересекающихся записях
+        self.reach = []
+        latest = 0
+        for end in self.ends:
+            latest = max(latest, end)
+            self.reach.append(latest)
+
+    def is_free(self, start, duration):
+        """Помещается ли [start, start + duration) в рабочие часы без пересечений"""
+        end = start + duration
+        if start < self.opens or end > self.closes:
+            return False
+        # Интервалы, начавшиеся до end, не должны заканчиваться позже start
+        i = bisect_left(self.starts, end)
+        return i == 0 or self.reach[i - 1] <= start
+
+    def slots(self, duration, step):
+        """Времена начала по сетке step: [(время, свободно)]"""
+        return [
+            (to_time(start), self.is_free(start, duration))
+            for start in range(self.opens, self.closes - duration + 1, step)
+        ]
+
+    def free_starts(self, duration, step):
+        """Свободные времена начала по сетке step по возрастанию"""
+        for start in range(self.opens, self.closes - duration + 1, step):
+            if self.is_free(start, duration):
+                yield to_time(start)
+
+    def add(self, start, duration):
+        i = bisect_right(self.starts, start)
+        self.starts.insert(i, start)
+        self.ends.insert(i, start + duration)
+        self._rebuild_reach()
+
+    def remove(self, start, duration):
+        i = bisect_left(self.starts, start)
+        while i < len(self.starts) and self.starts[i] == start:
+            if self.ends[i] == start + duration:
+                del self.starts[i], self.ends[i]
+                self._rebuild_reach()
+                return
+            i += 1
+
+class AvailabilityIndex:
+    """Кэш рабочих часов и занятых интервалов по мастеру и дню"""
+
+    def __init__(self, db, step=SLOT_STEP_MINUTES, ttl=SLOT_CACHE_TTL):
+        self.db = db
+        self.ttl = ttl
+        self.step = step
+        self.default_hours = (WORK_DAY_START, WORK_DAY_END)
+        # (master_id, date) -> DayAvailability
+        self._days = {}
+        # Время загрузки дня: по истечении ttl он перечитывается из базы
+        self._loaded_at = {}
+        # Счетчики изменений: защищают от записи устаревшего дня после загрузки
+        self._versions = {}
+        self._pruned_on = None
+
+    async def get_slots(self, master_id, date, duration):
+        """Времена начала записи мастера на день: [(время, свободно)]"""
+        day = await self._get_day(master_id, date)
+        return day.slots(duration, self.step)
+
+    async def is_free(self, master_id, date, time, duration):
+        start = to_minutes(time)
+        day = await self._get_day(master_id, date)
+        return (start - day.opens) % self.step == 0 and day.is_free(start, duration)
+
+    def mark_booked(self, master_id, date, time, duration):
+        self._update(master_id, date, time, duration, booked=True)
+
+    def mark_free(self, master_id, date, time, duration):
+        self._update(master_id, date, time, duration, booked=False)
+
+    async def _get_day(self, master_id, date):
+        self._prune()
+        key = (master_id, date)
+        day = self._days.get(key)
+        if day is not None and clock.monotonic() - self._loaded_at[key] < self.ttl:
+            return day
+
+        version = self._versions.get(key, 0)
+        weekday = datetime.strptime(date, "%Y-%m-%d").weekday()
+        hours, busy = await self.db.get_master_day(master_id, date, weekday)
+        day = DayAvailability(self.default_hours if hours is None else hours, busy)
+
+        # Если пока шел запрос время забронировали или освободили, не кэшируем
+        if self._versions.get(key, 0) == version:
+            self._days[key] = day
+            self._loaded_at[key] = clock.monotonic()
+        return day
+
+    async def find_earliest(self, service, dates, duration, limit):
+        """Ближайшие свободные времена у всех мастеров услуги: [(дата, время, мастер)]"""
+        masters, schedules, exceptions, busy = await self.db.get_service_availability(
+            service, dates[0], dates[-1]
+        )
+        weekly = {}
+        for master_id, weekday, start_time, end_time in schedules:
+            weekly[(master_id, weekday)] = (start_time, end_time) if start_time else ()
+        special = {}
+        for master_id, date, start_time, end_time in exceptions:
+            special[(master_id, date)] = (start_time, end_time) if start_time else ()
+        intervals = {}
+        for master_id, date, time, length in busy:
+            intervals.setdefault((master_id, date), []).append((time, length))
+        weekdays = [datetime.strptime(date, "%Y-%m-%d").weekday() for date in dates]
+
+        def master_slots(master):
+            # Свободные времена мастера по возрастанию; день строится, только
+            # когда до него дошло слияние
+            for date, weekday in zip(dates, weekdays):
+                key = (master.id, date)
+                hours = special.get(key, weekly.get((master.id, weekday), self.default_hours))
+                if not hours:
+                    continue
+                day = DayAvailability(hours, intervals.get(key, ()))
+                for time in day.free_starts(duration, self.step):
+                    yield date, time, master.id, master
+
+        # Слияние отсортированных потоков мастеров: берутся только первые limit
+        merged = heapq.merge(*(master_slots(master) for master in masters))
+        return [(date, time, master) for date, time, _, master in islice(merged, limit)]
+
+    def invalidate(self, master_id, date):
+        """День перечитается из базы при следующем запросе"""
+        key = (master_id, date)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        self._days.pop(key, None)
+        self._loaded_at.pop(key, None)
+
+    def _update(self, master_id, date, time, duration, booked):
+        key = (master_id, date)
+        self._versions[key] = self._versions.get(key, 0) + 1
+        day = self._days.get(key)
+        if day is None:
+            return
+        if booked:
+            day.add(to_minutes(time), duration)
+        else:
+            day.remove(to_minutes(time), duration)
+
+    def _prune(self):
+        """Раз в день удаляем прошедшие дни"""
+        today = datetime.now().strftime("%Y-%m-%d")
+        if self._pruned_on == today:
+            return
+        self._pruned_on = today
+        for key in [key for key in self._days if key[1] < today]:
+            del self._days[key]
+            del self._loaded_at[key]
+        for key in [key for key in self._versions if key[1] < today]:
+            del self._versions[key]
@@ -0,0 +1,32 @@
+import logging
+import os
+import socket
+import uuid
+
+from app.config import LEADER_LEASE_TTL
+
+class LeaderElection:
+    """Выбор единственного процесса для фоновых задач через аренду в SQLite"""
+
+    def __init__(self, db, name, ttl=LEADER_LEASE_TTL):
+        self.db = db
+        self.name = name
+        self.ttl = ttl
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+
+    async def ensure(self):
+        """Продление аренды; True, если этот процесс — лидер"""
+        is_leader = await self.db.acquire_lease(self.name, self.holder, self.ttl)
+        if is_leader != self.is_leader:
+            logging.info(
+                f"Процесс {self.holder} {'стал' if is_leader else 'больше не'} "
+                f"лидером для {self.name}"
+            )
+        self.is_leader = is_leader
+        return is_leader
+
+    async def release(self):
+        if self.is_leader:
+            await self.db.release_lease(self.name, self.holder)
+            self.is_leader = False
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramNetworkError,
+    TelegramServerError
+)
+
+from app.config import (
+    OUTBOX_WORKERS,
+    OUTBOX_GLOBAL_RATE,
+    OUTBOX_CHAT_RATE,
+    OUTBOX_MAX_RETRIES
+)
+
+class TokenBucket:
+    """Ограничитель частоты: rate токенов в секунду, не более capacity подряд"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self.tokens = self.capacity
+        self.updated = None
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self, now):
+        if self.updated is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def is_idle(self, now):
+        self._refill(now)
+        return (
+            self.tokens >= self.capacity
+            and now >= self.blocked_until
+            and not self.lock.locked()
+        )
+
+    def reserve(self):
+        """Занимает токен без ожидания: через сколько секунд им можно пользоваться"""
+        now = asyncio.get_running_loop().time()
+        self._refill(now)
+        # Токены уходят в долг: следующие сообщения получают более поздние слоты
+        self.tokens -= 1
+        start = now + max(0.0, -self.tokens) / self.rate
+        if start < self.blocked_until:
+            # Во время паузы токены не копятся: долг переносится на ее конец
+            self.tokens -= (self.blocked_until - start) * self.rate
+            start = self.blocked_until
+        return start - now
+
+    def block(self, seconds):
+        """Пауза после ответа 429 от Telegram"""
+        loop = asyncio.get_running_loop()
+        self.blocked_until = max(self.blocked_until, loop.time() + seconds)
+
+    async def acquire(self):
+        # Lock в asyncio справедливый: ожидающие получают токены в порядке очереди
+        async with self.lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class MessageQueue:
+    """Очередь исходящих сообщений с учетом лимитов Telegram"""
+
+    def __init__(self, bot, db, workers=OUTBOX_WORKERS):
+        self.bot = bot
+        self.db = db
+        self.workers_count = workers
+        self.queue = asyncio.Queue()
+        self.global_bucket = TokenBucket(OUTBOX_GLOBAL_RATE)
+        self.chat_buckets = {}
+        self.workers = []
+        # Сообщения, ждущие слота своего чата вне очереди: id -> (handle, сообщение)
+        self.delayed = {}
+        # Сообщения, которые обработчики не успели отправить до остановки
+        self.unsent = []
+        # Задачи notification_jobs, которые еще не доставлены и не сброшены
+        self.pending_jobs = set()
+
+    async def send(self, chat_id, text, reply_markup=None, job_id=None):
+        """Постановка сообщения в очередь, не дожидаясь отправки.
+        job_id — задача из notification_jobs: ее статус sent или failed
+        выставляется после доставки или окончательной ошибки"""
+        self._start_workers()
+        if job_id:
+            self.pending_jobs.add(job_id)
+        await self.queue.put({
+            'chat_id': chat_id,
+            'text': text,
+            'reply_markup': reply_markup,
+            'attempts': 0,
+            'job_id': job_id,
+            'reserved': False
+        })
+
+    def backlog(self):
+        """Число сообщений, ожидающих отправки"""
+        return self.queue.qsize() + len(self.delayed)
+
+    async def start(self):
+        """Запуск обработчиков очереди (хук запуска диспетчера)"""
+        self._start_workers()
+
+    def _start_workers(self):
+        if self.workers:
+            return
+        self.workers = [
+            asyncio.create_task(self._worker()) for _ in range(self.workers_count)
+        ]
+
+    async def stop(self, timeout=10):
+        """Дожидаемся отправки очереди и останавливаем обработчики"""
+        if not self.workers:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+        unsent, self.unsent = self.unsent, []
+        for handle, message in self.delayed.values():
+            handle.cancel()
+            unsent.append(message)
+        self.delayed = {}
+        while not self.queue.empty():
+            unsent.append(self.queue.get_nowait())
+            self.queue.task_done()
+        if unsent:
+            logging.error(f"Не отправлено сообщений при остановке: {len(unsent)}")
+            await self._save_unsent(unsent)
+
+    async def _drain(self):
+        """Ожидание, пока не опустеют очередь и отложенные сообщения"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.queue.join()
+            if not self.delayed:
+                return
+            nearest = min(handle.when() for handle, _ in self.delayed.values())
+            await asyncio.sleep(max(0.0, nearest - loop.time()))
+
+    def _delay(self, message, seconds):
+        """Возврат сообщения в очередь, когда наступит слот его чата"""
+        loop = asyncio.get_running_loop()
+        handle = loop.call_later(seconds, self._requeue, message)
+        self.delayed[id(message)] = (handle, message)
+
+    def _requeue(self, message):
+        del self.delayed[id(message)]
+        self.queue.put_nowait(message)
+
+    async def _save_unsent(self, messages):
+        """Напоминания возвращаются в очередь задач, остальное — в dead_letters"""
+        job_ids = [message['job_id'] for message in messages if message['job_id']]
+        if job_ids:
+            await self.db.set_notification_jobs_status(job_ids, 'pending')
+            self.pending_jobs.difference_update(job_ids)
+        for message in messages:
+            if not message['job_id']:
+                await self._dead_letter(message, "Бот остановлен до отправки")
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            # Не даем словарю расти бесконечно: удаляем простаивающие корзины
+            if len(self.chat_buckets) > 10000:
+                now = asyncio.get_running_loop().time()
+                for key in [k for k, b in self.chat_buckets.items() if b.is_idle(now)]:
+                    del self.chat_buckets[key]
+            bucket = self.chat_buckets[chat_id] = TokenBucket(OUTBOX_CHAT_RATE, 1)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self._deliver(message)
+            except asyncio.CancelledError:
+                # Остановка во время ожидания лимита или отправки. Сообщение
+                # сохраняется в stop(); если Telegram успел его принять, оно
+                # может прийти повторно, но не потеряется
+                self.unsent.append(message)
+                raise
+            except Exception as e:
+                logging.error(f"Ошибка обработки исходящего сообщения: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, message):
+        chat_bucket = self._chat_bucket(message['chat_id'])
+        if message['reserved']:
+            message['reserved'] = False
+        else:
+            # Обработчик не ждет лимита чата: иначе один активный чат (например,
+            # администратор) занял бы все обработчики и задержал остальных
+            delay = chat_bucket.reserve()
+            if delay > 0:
+                message['reserved'] = True
+                self._delay(message, delay)
+                return
+        await self.global_bucket.acquire()
+
+        message['attempts'] += 1
+        try:
+            await self.bot.send_message(
+                message['chat_id'],
+                message['text'],
+                reply_markup=message['reply_markup']
+            )
+        except TelegramRetryAfter as e:
+            # Flood wait: приостанавливаем чат и повторяем без учета попытки
+            logging.warning(f"Telegram просит подождать {e.retry_after} с (чат {message['chat_id']})")
+            chat_bucket.block(e.retry_after)
+            message['attempts'] -= 1
+            await self.queue.put(message)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            if message['attempts'] >= OUTBOX_MAX_RETRIES:
+                await self._dead_letter(message, e)
+                return
+            # Экспоненциальная задержка перед повтором
+            chat_bucket.block(2 ** message['attempts'])
+            await self.queue.put(message)
+        except Exception as e:
+            # Ошибки вроде заблокированного бота повторять бессмысленно
+            await self._dead_letter(message, e)
+        else:
+            if message['job_id']:
+                self.pending_jobs.discard(message['job_id'])
+                await self.db.set_notification_jobs_status([message['job_id']], 'sent')
+
+    async def _dead_letter(self, message, error):
+        logging.error(f"Сообщение в чат {message['chat_id']} не доставлено: {error}")
+        if message['job_id']:
+            self.pending_jobs.discard(message['job_id'])
+            await self.db.set_notification_jobs_status([message['job_id']], 'failed')
+        reply_markup = message['reply_markup']
+        await self.db.add_dead_letter({
+            'chat_id': message['chat_id'],
+            'text': message['text'],
+            'reply_markup': reply_markup.model_dump_json() if reply_markup else None,
+            'error': str(error),
+            'attempts': message['attempts']
+        })
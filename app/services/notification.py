@@ -1,18 +1,29 @@
 import logging
 from datetime import datetime, timedelta
-from app.config import ADMIN_ID
-from app.keyboards.user_kb import get_rating_kb
+from app.config import ADMIN_ID, REMINDER_BATCH_SIZE, OUTBOX_GLOBAL_RATE
+from app.keyboards.user_kb import get_rating_kb, get_waitlist_offer_kb
+from app.services.message_queue import MessageQueue
+from app.services.leader import LeaderElection
+
+JOB_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# Сколько уведомлений держим в очереди отправки: столько она успевает отправить
+# до следующего запуска диспетчера (раз в минуту). Остальные ждут в базе
+DISPATCH_BACKLOG = int(OUTBOX_GLOBAL_RATE * 60)
 
 class NotificationService:
     def __init__(self, bot, db, scheduler):
         self.bot = bot
         self.db = db
         self.scheduler = scheduler
+        # Все исходящие сообщения идут через очередь с учетом лимитов Telegram
+        self.queue = MessageQueue(bot, db)
+        # При нескольких процессах рассылку выполняет только лидер
+        self.leader = LeaderElection(db, 'notification_dispatcher')
 
     async def send_admin_notification(self, appointment):
         """Отправка уведомления админу о новой/отмененной записи"""
         try:
-            master = self.db.get_master_by_id(appointment.get('master_id'))
+            master = await self.db.get_master_by_id(appointment.get('master_id'))
             if not master and 'master_id' in appointment:
                 logging.error(f"Мастер с ID {appointment['master_id']} не найден")
                 return
@@ -31,8 +42,7 @@ class NotificationService:
             )
         else:
             if master:
-                username = f" (@{master[5]})" if master[5] else ""
-                master_info = f"👨‍🔧 Мастер: {master[1]} {master[2]}{username}\n"
+                master_info = f"👨‍🔧 Мастер: {master.full_name}\n"
             else:
                 master_info = ""
                 
@@ -46,17 +56,17 @@ class NotificationService:
                 f"👤 User ID: {appointment['user_id']}"
             )
             
-        await self.bot.send_message(ADMIN_ID, text)
+        await self.queue.send(ADMIN_ID, text)
 
     async def send_master_notification(self, master_id, appointment):
         """Отправка уведомления мастеру о новой записи"""
-        master = self.db.get_master_by_id(master_id)
-        if not master or not master[4]:  # Проверяем, есть ли мастер и его Telegram ID
+        master = await self.db.get_master_by_id(master_id)
+        if not master or not master.telegram_id:  # Проверяем, есть ли мастер и его Telegram ID
             return
 
         try:
-            await self.bot.send_message(
-                master[4],
+            await self.queue.send(
+                master.telegram_id,
                 f"📌 У вас новая запись!\n"
                 f"💅 Услуга: {appointment['service']}\n"
                 f"📅 Дата: {appointment['date']}\n"
@@ -65,7 +75,7 @@ class NotificationService:
         except Exception as e:
             logging.error(f"Ошибка отправки уведомления мастеру: {e}")
 
-    async def send_reminder(self, user_id, appointment):
+    async def send_reminder(self, user_id, appointment, job_id=None):
         """Отправка напоминания о записи"""
         text = (
             "🔔 Напоминание о записи!\n"
@@ -73,15 +83,31 @@ class NotificationService:
             f"📅 Дата: {appointment['date']}\n"
             f"⏰ Время: {appointment['time']}"
         )
-        await self.bot.send_message(user_id, text)
+        await self.queue.send(user_id, text, job_id=job_id)
 
-    async def request_review(self, user_id, unique_id):
+    async def request_review(self, user_id, unique_id, job_id=None):
         """Запрос отзыва после посещения"""
         keyboard = get_rating_kb(unique_id)
-        await self.bot.send_message(
+        await self.queue.send(
             user_id,
             "Пожалуйста, оцените наше обслуживание:",
-            reply_markup=keyboard
+            reply_markup=keyboard,
+            job_id=job_id
+        )
+
+    async def send_waitlist_offer(self, appointment, expires_at):
+        """Предложение освободившегося слота пользователю из листа ожидания"""
+        text = (
+            "🔔 Освободилось время, которое вы ждали!\n"
+            f"💅 Услуга: {appointment.service}\n"
+            f"📅 Дата: {appointment.date}\n"
+            f"⏰ Время: {appointment.time}\n"
+            f"Слот закреплен за вами до {expires_at:%H:%M}"
+        )
+        await self.queue.send(
+            appointment.user_id,
+            text,
+            reply_markup=get_waitlist_offer_kb(appointment.unique_id)
         )
 
     async def send_cancellation_notification(self, user_id, appointment):
@@ -93,9 +119,9 @@ class NotificationService:
             f"📅 Дата: {appointment['date']}\n"
             f"⏰ Время: {appointment['time']}"
         )
-        await self.bot.send_message(user_id, text)
+        await self.queue.send(user_id, text)
         
-    def schedule_notifications(self, user_id, appointment_data):
+    async def schedule_notifications(self, user_id, appointment_data):
         """Планирование отправки напоминаний и запроса отзыва"""
         try:
             # Преобразуем строковую дату и время в объект datetime
@@ -104,30 +130,100 @@ class NotificationService:
                 "%Y-%m-%d %H:%M"
             )
 
-            # Напоминание за день до записи
-            self.scheduler.add_job(
-                self.send_reminder,
-                'date',
-                run_date=appointment_datetime - timedelta(days=1),
-                args=[user_id, appointment_data]
-            )
-
-            # Напоминание за 2 часа до записи
-            self.scheduler.add_job(
-                self.send_reminder,
-                'date',
-                run_date=appointment_datetime - timedelta(hours=2),
-                args=[user_id, appointment_data]
-            )
+            jobs = [
+                # Напоминание за день до записи
+                ('reminder', appointment_datetime - timedelta(days=1)),
+                # Напоминание за 2 часа до записи
+                ('reminder', appointment_datetime - timedelta(hours=2)),
+                # Запрос отзыва через 2 часа после записи
+                ('review', appointment_datetime + timedelta(hours=2)),
+            ]
+            # Уже прошедшие напоминания (запись менее чем за сутки) не планируем
+            now = datetime.now()
+            jobs = [(kind, run_at) for kind, run_at in jobs if run_at > now]
 
-            # Запрос отзыва через 2 часа после записи
-            self.scheduler.add_job(
-                self.request_review,
-                'date',
-                run_date=appointment_datetime + timedelta(hours=2),
-                args=[user_id, appointment_data['unique_id']]
+            # Сохраняем задачи в базе: их отправит периодический диспетчер
+            success = await self.db.add_notification_jobs(
+                appointment_data['unique_id'],
+                [(kind, run_at.strftime(JOB_TIME_FORMAT)) for kind, run_at in jobs]
             )
+            if not success:
+                return
             
             logging.info(f"Запланированы уведомления для записи {appointment_data['unique_id']}")
         except Exception as e:
             logging.error(f"Ошибка планирования уведомлений: {e}")
+
+    def start_dispatcher(self):
+        """Регистрация единственной периодической задачи рассылки уведомлений"""
+        self.scheduler.add_job(
+            self.dispatch_due_notifications,
+            'interval',
+            minutes=1,
+            id='notification_dispatcher',
+            next_run_time=datetime.now(),
+            max_instances=1,
+            coalesce=True
+        )
+
+    async def dispatch_due_notifications(self):
+        """Отправка всех уведомлений, срок которых наступил, пачками"""
+        try:
+            was_leader = self.leader.is_leader
+            if not await self.leader.ensure():
+                return
+
+            if not was_leader:
+                # Задачи в sending остались от прежнего лидера (упал до доставки)
+                # или от этого процесса до потери аренды, кроме еще стоящих в очереди
+                reset = await self.db.reset_sending_notification_jobs(set(self.queue.pending_jobs))
+                if reset:
+                    logging.warning(f"Возвращено в отправку зависших уведомлений: {reset}")
+
+            while True:
+                # Не набираем в память больше, чем очередь успеет отправить
+                limit = min(REMINDER_BATCH_SIZE, DISPATCH_BACKLOG - self.queue.backlog())
+                if limit <= 0:
+                    return
+                now = datetime.now()
+                jobs = await self.db.get_due_notifications(
+                    now.strftime(JOB_TIME_FORMAT),
+                    limit
+                )
+                if not jobs:
+                    return
+
+                # Отмечаем пачку до отправки, чтобы напоминание не ушло дважды.
+                # sent или failed выставит очередь после доставки
+                await self.db.set_notification_jobs_status([job[0] for job in jobs], 'sending')
+                skipped, failed = await self._send_batch(jobs, now)
+                await self.db.set_notification_jobs_status(skipped, 'skipped')
+                await self.db.set_notification_jobs_status(failed, 'failed')
+
+                if len(jobs) < limit:
+                    return
+        except Exception as e:
+            logging.error(f"Ошибка рассылки уведомлений: {e}")
+
+    async def _send_batch(self, jobs, now):
+        """Постановка пачки в очередь отправки (лимиты соблюдает очередь).
+        Возвращает задачи, которые не отправляются, и задачи с ошибкой постановки"""
+        skipped, failed = [], []
+        for job in jobs:
+            appointment = {'service': job[4], 'date': job[5], 'time': job[6]}
+            appointment_datetime = datetime.strptime(
+                f"{job[5]} {job[6]}", "%Y-%m-%d %H:%M"
+            )
+            try:
+                if job[1] == 'review':
+                    await self.request_review(job[3], job[2], job_id=job[0])
+                elif appointment_datetime > now:
+                    await self.send_reminder(job[3], appointment, job_id=job[0])
+                else:
+                    # Напоминание о прошедшей записи (например, после простоя) не отправляем
+                    skipped.append(job[0])
+            except Exception as e:
+                logging.error(f"Ошибка отправки уведомления {job[0]}: {e}")
+                failed.append(job[0])
+
+        return skipped, failed
@@ -1,27 +1,40 @@
 import logging
 
+from app.utils.helpers import keyset_page
+
 class ReviewService:
     def __init__(self, db):
         self.db = db
         
-    def add_review(self, unique_id, user_id, rating, comment):
+    async def add_review(self, unique_id, user_id, rating, comment):
         """Добавление отзыва"""
         try:
+            # Оценка приходит строкой из callback_data, а гистограмма рейтинга
+            # сравнивает ее с числами 1..5
+            try:
+                rating = int(rating)
+            except (TypeError, ValueError):
+                return False, "Неверная оценка"
+            if not 1 <= rating <= 5:
+                return False, "Оценка должна быть от 1 до 5"
+
             # Получаем запись по уникальному ID
-            appointment = self.db.get_appointment_by_id(unique_id)
+            appointment = await self.db.get_appointment_by_id(unique_id, include_archive=True)
             if not appointment:
                 return False, "Запись не найдена"
                 
             # Проверяем, принадлежит ли запись пользователю
-            if appointment[1] != user_id:
+            if appointment.user_id != user_id:
                 return False, "Вы не можете оставить отзыв на чужую запись"
                 
             # Добавляем отзыв
-            success = self.db.add_review({
+            success = await self.db.add_review({
                 'unique_id': unique_id,
                 'user_id': user_id,
                 'rating': rating,
-                'comment': comment
+                'comment': comment,
+                'service': appointment.service,
+                'master_id': appointment.master_id
             })
             
             if not success:
@@ -32,26 +45,47 @@ class ReviewService:
             logging.error(f"Ошибка добавления отзыва: {e}")
             return False, f"Ошибка при добавлении отзыва: {str(e)}"
             
-    def get_user_reviews(self, user_id):
+    async def get_user_reviews(self, user_id):
         """Получение отзывов пользователя"""
         try:
-            return self.db.get_user_reviews(user_id), None
+            return await self.db.get_user_reviews(user_id), None
         except Exception as e:
             logging.error(f"Ошибка получения отзывов пользователя: {e}")
             return None, f"Ошибка при получении отзывов: {str(e)}"
             
-    def get_all_reviews(self):
-        """Получение всех отзывов"""
+    async def get_reviews_page(self, cursor_id=None, backward=False, pending_only=False, limit=10):
+        """Страница отзывов: (отзывы, есть ли предыдущая, есть ли следующая)"""
         try:
-            return self.db.get_all_reviews(), None
+            reviews = await self.db.get_reviews_page(cursor_id, backward, pending_only, limit)
+            return keyset_page(reviews, limit, cursor_id is not None, backward), None
         except Exception as e:
-            logging.error(f"Ошибка получения всех отзывов: {e}")
+            logging.error(f"Ошибка получения страницы отзывов: {e}")
             return None, f"Ошибка при получении отзывов: {str(e)}"
-            
-    def block_review(self, review_id):
+
+    async def get_rating_stats(self):
+        """Агрегаты рейтингов по услугам и мастерам"""
+        try:
+            return await self.db.get_rating_stats(), None
+        except Exception as e:
+            logging.error(f"Ошибка получения рейтингов: {e}")
+            return None, f"Ошибка при получении рейтингов: {str(e)}"
+
+    async def approve_review(self, review_id):
+        """Одобрение отзыва админом"""
+        try:
+            success = await self.db.approve_review(review_id)
+            if not success:
+                return False, "Ошибка одобрения отзыва"
+
+            return True, None
+        except Exception as e:
+            logging.error(f"Ошибка одобрения отзыва: {e}")
+            return False, f"Ошибка при одобрении отзыва: {str(e)}"
+
+    async def block_review(self, review_id):
         """Блокировка отзыва админом"""
         try:
-            success = self.db.block_review(review_id)
+            success = await self.db.block_review(review_id)
             if not success:
                 return False, "Ошибка блокировки отзыва"
                 
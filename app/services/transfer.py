@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime
+
+from app.services.availability import service_duration
+
+# Колонки выгрузки и загрузки
+APPOINTMENT_COLUMNS = (
+    'id', 'unique_id', 'user_id', 'service', 'date', 'time', 'master_id', 'status', 'created_at',
+    'duration'
+)
+REVIEW_COLUMNS = ('id', 'appointment_id', 'user_id', 'rating', 'comment', 'status', 'created_at')
+MASTER_COLUMNS = ('first_name', 'last_name', 'service', 'telegram_id', 'username')
+
+EXPORT_BATCH_SIZE = 1000
+FORMATS = ('csv', 'jsonl')
+
+def detect_format(filename):
+    """Формат файла по расширению"""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension == 'csv':
+        return 'csv'
+    return None
+
+def read_records(lines, fmt):
+    """Построчное чтение CSV с заголовком или JSONL в словари"""
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+        return
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Строка {number}: некорректный JSON ({e.msg})")
+
+def _required(record, field, number):
+    value = record.get(field)
+    if value is None or str(value).strip() == '':
+        raise ValueError(f"Запись {number}: не заполнено поле {field}")
+    return str(value).strip()
+
+def _optional(record, field):
+    value = record.get(field)
+    if value is None or str(value).strip() == '':
+        return None
+    return str(value).strip()
+
+def _integer(value, field, number):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Запись {number}: поле {field} должно быть числом")
+
+def master_rows(records):
+    """Проверка и преобразование мастеров в строки для вставки"""
+    for number, record in enumerate(records, 1):
+        yield (
+            _required(record, 'first_name', number),
+            _required(record, 'last_name', number),
+            _required(record, 'service', number),
+            _integer(_required(record, 'telegram_id', number), 'telegram_id', number),
+            (_optional(record, 'username') or '').lstrip('@') or None
+        )
+
+def appointment_rows(records):
+    """Проверка и преобразование записей в строки для вставки"""
+    for number, record in enumerate(records, 1):
+        date = _required(record, 'date', number)
+        time = _required(record, 'time', number)
+        try:
+            datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M")
+        except ValueError:
+            raise ValueError(f"Запись {number}: дата и время должны быть в формате ГГГГ-ММ-ДД ЧЧ:ММ")
+        master_id = _optional(record, 'master_id')
+        service = _required(record, 'service', number)
+        # Без длительности запись занимает время по текущей настройке услуги
+        duration = _optional(record, 'duration')
+        duration = _integer(duration, 'duration', number) if duration else service_duration(service)
+        if duration <= 0:
+            raise ValueError(f"Запись {number}: длительность должна быть больше нуля")
+        yield (
+            _required(record, 'unique_id', number).upper(),
+            _integer(_required(record, 'user_id', number), 'user_id', number),
+            service,
+            date,
+            time,
+            _integer(master_id, 'master_id', number) if master_id else None,
+            _optional(record, 'status') or 'active',
+            _optional(record, 'created_at'),
+            duration
+        )
+
+def format_rows(rows, columns, fmt, header=True):
+    """Строки таблицы в текст CSV или JSONL"""
+    if fmt == 'jsonl':
+        return ''.join(
+            json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows
+        )
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buffer.getvalue()
+
+def import_records(db, kind, lines, fmt):
+    """Импорт из итератора строк файла через синхронную Database.
+    Возвращает (число добавленных или обновленных строк, ошибка)"""
+    try:
+        records = read_records(lines, fmt)
+        if kind == 'masters':
+            count = db.import_masters(master_rows(records))
+        elif kind == 'appointments':
+            count = db.import_appointments(appointment_rows(records))
+        else:
+            return None, f"Неизвестный тип данных: {kind}"
+        if count is None:
+            return None, "Ошибка записи в базу данных"
+        return count, None
+    except ValueError as e:
+        return None, str(e)
+    except Exception as e:
+        logging.error(f"Ошибка импорта {kind}: {e}")
+        return None, f"Ошибка чтения файла: {e}"
+
+def export_chunks(db, kind, fmt, batch_size=EXPORT_BATCH_SIZE):
+    """Потоковая выгрузка через синхронную Database: в памяти одна пачка строк"""
+    fetch, columns = _export_source(db, kind)
+    after_id = 0
+    header = True
+    while True:
+        rows = fetch(after_id, batch_size)
+        if rows is None:
+            raise RuntimeError(f"Ошибка выгрузки {kind}")
+        if not rows and not header:
+            return
+        yield format_rows(rows, columns, fmt, header)
+        header = False
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1][0]
+
+def _export_source(db, kind):
+    if kind == 'appointments':
+        return db.get_appointments_batch, APPOINTMENT_COLUMNS
+    if kind == 'archive':
+        return db.get_archive_batch, APPOINTMENT_COLUMNS
+    if kind == 'reviews':
+        return db.get_reviews_batch, REVIEW_COLUMNS
+    raise ValueError(f"Неизвестный тип данных: {kind}")
+
+
+class TransferService:
+    """Импорт и выгрузка данных для админ-панели"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def import_file(self, kind, lines, fmt):
+        """Импорт одной транзакцией в потоке базы данных"""
+        count, error = await self.db.run(import_records, self.db.sync, kind, lines, fmt)
+        if kind == 'masters' and count:
+            # Импорт мог изменить мастеров, которые уже лежат в кэше
+            self.db.master_cache.clear()
+        return count, error
+
+    async def export_to_file(self, kind, fmt, path, batch_size=EXPORT_BATCH_SIZE):
+        """Выгрузка в файл по пачкам: между пачками база доступна боту"""
+        try:
+            fetch, columns = _export_source(self.db, kind)
+            count = 0
+            after_id = 0
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                while True:
+                    rows = await fetch(after_id, batch_size)
+                    if rows is None:
+                        return None, "Ошибка чтения базы данных"
+                    f.write(format_rows(rows, columns, fmt, header=(after_id == 0)))
+                    count += len(rows)
+                    if len(rows) < batch_size:
+                        return count, None
+                    after_id = rows[-1][0]
+        except Exception as e:
+            logging.error(f"Ошибка выгрузки {kind}: {e}")
+            return None, f"Ошибка выгрузки: {e}"
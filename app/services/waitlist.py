@@ -0,0 +1,152 @@
+import logging
+from datetime import datetime, timedelta
+
+from app.config import (
+    WAITLIST_HOLD_MINUTES,
+    REMINDER_BATCH_SIZE,
+    SERVICE_DURATIONS,
+    DEFAULT_SERVICE_DURATION
+)
+from app.models.records import new_unique_id
+from app.services.availability import service_duration, to_minutes, to_time
+from app.services.leader import LeaderElection
+from app.services.notification import JOB_TIME_FORMAT
+
+class WaitlistService:
+    """Лист ожидания: освободившийся слот удерживается за первым в очереди"""
+
+    def __init__(self, db, notification_service, availability):
+        self.db = db
+        self.notification_service = notification_service
+        self.availability = availability
+        # При нескольких процессах истекшие удержания снимает только один
+        self.leader = LeaderElection(db, 'waitlist_sweeper')
+
+    def start(self, scheduler):
+        """Периодическое снятие истекших удержаний"""
+        scheduler.add_job(
+            self.sweep_expired_holds,
+            'interval',
+            minutes=1,
+            id='waitlist_sweeper',
+            max_instances=1,
+            coalesce=True
+        )
+
+    async def join(self, user_id, service, master_id, date, time):
+        """Постановка в очередь на занятый слот"""
+        try:
+            if await self.availability.is_free(master_id, date, time, service_duration(service)):
+                return False, "Это время уже свободно, выберите его"
+
+            added = await self.db.add_to_waitlist({
+                'user_id': user_id,
+                'service': service,
+                'master_id': master_id,
+                'date': date,
+                'time': time
+            })
+            if added is None:
+                return False, "Вы уже в листе ожидания на это время"
+            if not added:
+                return False, "Ошибка добавления в лист ожидания"
+
+            return True, None
+        except Exception as e:
+            logging.error(f"Ошибка постановки в лист ожидания: {e}")
+            return False, f"Ошибка при постановке в лист ожидания: {str(e)}"
+
+    async def offer_interval(self, master_id, date, time, duration):
+        """Удержание освободившегося интервала за ожидающими и отправка предложений"""
+        try:
+            if master_id is None:
+                return []
+
+            start = to_minutes(time)
+            # Ожидающий задевает интервал, если начинается не раньше, чем за
+            # самую длинную услугу до его начала; прошедшее время не предлагаем
+            earliest = max(start - max(*SERVICE_DURATIONS.values(), DEFAULT_SERVICE_DURATION), 0)
+            now = datetime.now()
+            if date < now.strftime("%Y-%m-%d"):
+                return []
+            if date == now.strftime("%Y-%m-%d"):
+                earliest = max(earliest, now.hour * 60 + now.minute + 1)
+            if earliest >= start + duration:
+                return []
+
+            expires_at = now + timedelta(minutes=WAITLIST_HOLD_MINUTES)
+            appointments = await self.db.hold_slots_for_waiters(
+                master_id, date, time, to_time(start + duration), to_time(earliest),
+                expires_at.strftime(JOB_TIME_FORMAT),
+                new_unique_id
+            )
+            for appointment in appointments:
+                self.availability.mark_booked(
+                    master_id, date, appointment.time, appointment.duration
+                )
+                await self.notification_service.send_waitlist_offer(appointment, expires_at)
+            return appointments
+        except Exception as e:
+            logging.error(f"Ошибка предложения слота из листа ожидания: {e}")
+            return []
+
+    async def accept(self, unique_id, user_id):
+        """Подтверждение предложенного слота; возвращает (данные записи, ошибка)"""
+        try:
+            appointment = await self.db.confirm_hold(
+                unique_id, user_id, datetime.now().strftime(JOB_TIME_FORMAT)
+            )
+            if appointment is None:
+                return None, "Предложение больше не действует"
+
+            return {
+                'user_id': appointment.user_id,
+                'service': appointment.service,
+                'date': appointment.date,
+                'time': appointment.time,
+                'unique_id': appointment.unique_id,
+                'master_id': appointment.master_id
+            }, None
+        except Exception as e:
+            logging.error(f"Ошибка подтверждения слота из листа ожидания: {e}")
+            return None, f"Ошибка при подтверждении записи: {str(e)}"
+
+    async def decline(self, unique_id, user_id):
+        """Отказ от предложенного слота: он предлагается следующему в очереди"""
+        try:
+            appointment = await self.db.release_hold(unique_id, user_id)
+            if appointment is None:
+                return False, "Предложение больше не действует"
+
+            await self.release(appointment)
+            return True, None
+        except Exception as e:
+            logging.error(f"Ошибка отказа от слота из листа ожидания: {e}")
+            return False, f"Ошибка при отказе от записи: {str(e)}"
+
+    async def sweep_expired_holds(self):
+        """Снятие истекших удержаний и передача слотов следующим в очереди"""
+        try:
+            if not await self.leader.ensure():
+                return
+
+            while True:
+                expired = await self.db.expire_holds(
+                    datetime.now().strftime(JOB_TIME_FORMAT),
+                    REMINDER_BATCH_SIZE
+                )
+                for appointment in expired:
+                    await self.release(appointment)
+                if len(expired) < REMINDER_BATCH_SIZE:
+                    return
+        except Exception as e:
+            logging.error(f"Ошибка снятия истекших удержаний: {e}")
+
+    async def release(self, appointment):
+        """Освобождение интервала записи и предложение его листу ожидания"""
+        self.availability.mark_free(
+            appointment.master_id, appointment.date, appointment.time, appointment.duration
+        )
+        await self.offer_interval(
+            appointment.master_id, appointment.date, appointment.time, appointment.duration
+        )
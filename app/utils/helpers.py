@@ -19,8 +19,7 @@ def format_master_info(master):
     if not master:
         return "Мастер не найден"
         
-    username = f" (@{master[5]})" if master[5] else ""
-    return f"{master[1]} {master[2]}{username}"
+    return master.full_name
 
 def format_appointment_info(appointment, with_id=True):
     """Форматирование информации о записи"""
@@ -41,3 +40,15 @@ def format_appointment_info(appointment, with_id=True):
         text += f"👤 User ID: {appointment['user_id']}\n"
         
     return text
+
+def keyset_page(rows, limit, has_cursor, backward):
+    """Страница keyset-пагинации из limit + 1 строк запроса:
+    (строки по порядку, есть ли предыдущая, есть ли следующая)"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    # При движении назад следующая страница точно есть, и наоборот
+    has_prev = has_more if backward else has_cursor
+    has_next = True if backward else has_more
+    return rows, has_prev, has_next
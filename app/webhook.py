@@ -0,0 +1,109 @@
+import asyncio
+import hmac
+import logging
+import secrets
+import signal
+from aiohttp import web
+
+from app.config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_CONCURRENCY,
+    WEBHOOK_DRAIN_TIMEOUT,
+    DROP_PENDING_UPDATES
+)
+
+class WebhookServer:
+    """Прием обновлений от Telegram через aiohttp"""
+
+    def __init__(self, dp, bot, secret=WEBHOOK_SECRET, concurrency=WEBHOOK_CONCURRENCY):
+        self.dp = dp
+        self.bot = bot
+        # Без секрета любой может прислать поддельное обновление, поэтому
+        # если он не задан, генерируем свой и передаем его в set_webhook
+        if not secret:
+            logging.warning("WEBHOOK_SECRET не задан, используется случайный секрет")
+        self.secret = secret or secrets.token_urlsafe(32)
+        # Ограничиваем число одновременно обрабатываемых обновлений
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.tasks = set()
+        self.draining = False
+
+    def create_app(self, path=WEBHOOK_PATH):
+        app = web.Application()
+        app.router.add_post(path, self.handle)
+        return app
+
+    async def handle(self, request):
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not hmac.compare_digest(token.encode(), self.secret.encode()):
+            return web.Response(status=401)
+        if self.draining:
+            # Telegram повторит доставку после перезапуска
+            return web.Response(status=503)
+
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        # Отвечаем Telegram сразу, обработка идет в фоне
+        await self.semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return web.Response()
+
+    async def _process(self, update):
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        except Exception as e:
+            logging.error(f"Ошибка обработки обновления {update.get('update_id')}: {e}")
+        finally:
+            self.semaphore.release()
+
+    async def drain(self, timeout=WEBHOOK_DRAIN_TIMEOUT):
+        """Перестаем принимать обновления и дожидаемся обработки принятых"""
+        self.draining = True
+        if not self.tasks:
+            return
+        done, pending = await asyncio.wait(set(self.tasks), timeout=timeout)
+        if pending:
+            logging.error(f"Не завершена обработка обновлений при остановке: {len(pending)}")
+
+
+async def run_webhook(dp, bot):
+    """Запуск бота в режиме webhook до получения SIGINT/SIGTERM"""
+    server = WebhookServer(dp, bot)
+    runner = web.AppRunner(server.create_app())
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    await bot.set_webhook(
+        f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+        secret_token=server.secret,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=DROP_PENDING_UPDATES
+    )
+    logging.info(f"Webhook запущен на {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остановка по KeyboardInterrupt
+            pass
+
+    try:
+        await stop.wait()
+    finally:
+        await server.drain()
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
@@ -0,0 +1,88 @@
+"""Проверка, что горячие запросы Database используют индексы.
+
+Запуск: python -m benchmarks.check_query_plans
+Завершается с кодом 1, если хотя бы один запрос сканирует таблицу целиком.
+"""
+import os
+import sys
+import tempfile
+
+from app.database.db import Database
+
+# Методы Database, которые вызываются на каждом шаге пользователя или админа
+HOT_QUERIES = [
+    ("get_master_day", (1, "2030-01-01", 1)),
+    ("get_service_availability", ("Маникюр", "2030-01-01", "2030-01-30")),
+    ("create_appointment", ({
+        "user_id": 1, "service": "Маникюр", "date": "2030-01-01", "time": "11:00",
+        "unique_id": "PLAN0001", "master_id": 1, "duration": 60
+    },)),
+    ("get_appointments_page_by_service", ("Маникюр",)),
+    ("get_appointments_page_by_service", ("Маникюр", ("2030-01-01", "11:00", 5))),
+    ("get_appointments_page_by_service", ("Маникюр", ("2030-01-01", "11:00", 5), True)),
+    ("get_appointment_by_id", ("ABCDEF12",)),
+    ("get_appointment_by_id", ("ABCDEF12", True)),
+    ("get_user_reviews", (1,)),
+    ("get_reviews_page", ()),
+    ("get_reviews_page", (5, False, True)),
+    ("get_reviews_page", (5, True, True)),
+    ("get_review_by_id", (1,)),
+    ("get_masters_by_service", ("Маникюр",)),
+    ("get_master_by_id", (1,)),
+    ("get_master_by_telegram_id", (1,)),
+    ("get_today_appointments_for_master", (1,)),
+    ("get_upcoming_appointments_for_master", (1,)),
+    ("get_due_notifications", ("2030-01-01 00:00:00", 100)),
+    ("hold_slots_for_waiters", (
+        1, "2030-01-01", "11:00", "12:00", "08:00", "2030-01-01 00:00:00", lambda: "ABCDEF12"
+    )),
+    ("expire_holds", ("2030-01-01 00:00:00", 100)),
+]
+
+
+def capture_statements(db, method, args):
+    """Выполнение метода с записью всех SELECT, отправленных в sqlite"""
+    statements = []
+
+    def trace(sql):
+        if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append(sql)
+
+    db.conn.set_trace_callback(trace)
+    try:
+        getattr(db, method)(*args)
+    finally:
+        db.conn.set_trace_callback(None)
+    return statements
+
+
+def full_scans(db, sql):
+    """Шаги плана, в которых таблица читается без индекса"""
+    plan = db.conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return [
+        row[3] for row in plan
+        if row[3].startswith("SCAN") and "INDEX" not in row[3]
+    ]
+
+
+def main():
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, "plans.db"))
+        for method, args in HOT_QUERIES:
+            statements = capture_statements(db, method, args)
+            if not statements:
+                print(f"?? {method}: запросы не перехвачены")
+                failed = True
+                continue
+            for sql in statements:
+                scans = full_scans(db, sql)
+                status = "FAIL" if scans else "ok"
+                failed = failed or bool(scans)
+                print(f"{status:>4} {method}" + (f": {'; '.join(scans)}" if scans else ""))
+        db.close()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
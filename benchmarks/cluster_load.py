@@ -0,0 +1,161 @@
+"""Проверка режима кластера: несколько процессов-обработчиков с общей базой.
+
+Запускает входной процесс и --workers обработчиков против фейкового Bot API,
+после чего проверяет:
+  * каждое обновление обработано ровно один раз;
+  * лидер рассылки напоминаний один;
+  * конкурентные записи на одни и те же слоты не приводят к двойной брони.
+
+Запуск: python -m benchmarks.cluster_load --workers 4 --users 200 --slots 5 [--json]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from aiogram import Bot
+
+from app.database.db import Database
+from benchmarks.fake_telegram import FakeTelegramAPI, percentiles, dump
+
+SERVICE = "Маникюр"
+# Пауза между шагами диалога: ответ бота приходит до сохранения состояния FSM
+STEP_PAUSE = 0.3
+
+
+def seed(path, masters):
+    db = Database(path)
+    for i in range(masters):
+        db.add_master({
+            "first_name": f"Мастер{i}", "last_name": "Тестов", "service": SERVICE,
+            "telegram_id": 900000 + i, "username": None
+        })
+    ids = [row[0] for row in db.conn.execute("SELECT id FROM masters ORDER BY id")]
+    db.close()
+    return ids
+
+
+async def step(api, chat_id, update):
+    reply = api.wait_reply(chat_id)
+    started = time.perf_counter()
+    api.push_update(update)
+    latency = await asyncio.wait_for(reply, 30) - started
+    await asyncio.sleep(STEP_PAUSE)
+    return latency
+
+
+async def run(workers, users, slots):
+    from app.cluster import run_cluster
+
+    api = FakeTelegramAPI()
+    await api.start()
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "cluster.db")
+    # Настройки для процессов-обработчиков передаются через окружение
+    os.environ["DATABASE_NAME"] = path
+    os.environ["TELEGRAM_API_URL"] = api.base_url
+    os.environ["FSM_STORAGE"] = "sqlite"
+
+    master_ids = seed(path, max(1, slots // 2))
+    booking_date = (date.today() + timedelta(days=3)).strftime("%Y-%m-%d")
+    # Слоты, за которые конкурируют пользователи
+    targets = [(master_ids[i % len(master_ids)], f"{11 + i // len(master_ids):02d}:00")
+               for i in range(slots)]
+
+    stop, ready = asyncio.Event(), asyncio.Event()
+    bot = Bot(token="123456:BENCH", session=api.session())
+    cluster = asyncio.create_task(run_cluster(workers, bot=bot, stop=stop, ready=ready))
+    await ready.wait()
+
+    # Этап 1: по одному /start от каждого пользователя
+    chats = [200000 + i for i in range(users)]
+    started = time.perf_counter()
+    start_latencies = await asyncio.gather(
+        *(step(api, chat_id, api.message_update(chat_id, "/start")) for chat_id in chats)
+    )
+    start_elapsed = time.perf_counter() - started - STEP_PAUSE
+    start_replies = api.calls["sendmessage"]
+
+    # Этап 2: все пользователи пытаются записаться на несколько слотов
+    async def book(i, chat_id):
+        master_id, slot = targets[i % len(targets)]
+        latencies = [
+            await step(api, chat_id, api.callback_update(chat_id, f"service_{SERVICE}")),
+            await step(api, chat_id, api.callback_update(chat_id, f"master_{master_id}")),
+            await step(api, chat_id, api.callback_update(chat_id, f"date_{booking_date}")),
+            await step(api, chat_id, api.callback_update(chat_id, f"time_{slot}")),
+            await step(api, chat_id, api.callback_update(chat_id, "confirm_yes")),
+        ]
+        return latencies
+
+    booking_latencies = await asyncio.gather(*(book(i, c) for i, c in enumerate(chats)))
+
+    conn = sqlite3.connect(path)
+    leaders = conn.execute(
+        "SELECT COUNT(DISTINCT holder) FROM leases WHERE name = 'notification_dispatcher'"
+    ).fetchone()[0]
+    conn.close()
+
+    stop.set()
+    await cluster
+    await api.stop()
+
+    conn = sqlite3.connect(path)
+    double_booked = conn.execute('''
+        SELECT COUNT(*) FROM (
+            SELECT master_id, date, time FROM appointments
+            WHERE status = 'active'
+            GROUP BY master_id, date, time HAVING COUNT(*) > 1
+        )
+    ''').fetchone()[0]
+    booked = conn.execute(
+        "SELECT COUNT(*) FROM appointments WHERE status = 'active'"
+    ).fetchone()[0]
+    conn.close()
+
+    return {
+        "workers": workers,
+        "users": users,
+        "slots": slots,
+        "start_throughput_rps": round(users / start_elapsed, 1),
+        "start_latency_ms": percentiles(start_latencies),
+        "booking_step_latency_ms": percentiles([l for steps in booking_latencies for l in steps]),
+        "start_replies": start_replies,
+        "booked_slots": booked,
+        "double_booked_slots": double_booked,
+        "leaders": leaders,
+        "ok": start_replies == users and booked == slots and double_booked == 0 and leaders == 1,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--slots", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.workers, args.users, args.slots))
+    if args.json:
+        dump(result)
+    else:
+        latency = result["start_latency_ms"]
+        print(
+            f"{result['workers']} обработчика: {result['start_throughput_rps']} обн/с, "
+            f"p50={latency['p50']}мс p95={latency['p95']}мс p99={latency['p99']}мс"
+        )
+        print(
+            f"ответов на /start: {result['start_replies']} из {result['users']}, "
+            f"занято слотов: {result['booked_slots']} из {result['slots']}, "
+            f"двойных броней: {result['double_booked_slots']}"
+        )
+    sys.exit(0 if result["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
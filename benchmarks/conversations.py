@@ -0,0 +1,250 @@
+"""Сквозной нагрузочный тест диалогов бота.
+
+Настоящий Dispatcher из register_handlers получает обновления от множества
+пользователей, которые проходят сценарии записи, отмены и отзыва. Ответы бота
+принимает фейковый Bot API. Для каждого шага сценария измеряются время
+обработки обновления и время, проведенное в базе данных.
+
+Запуск: python -m benchmarks.conversations --users 2000 --concurrency 100 [--json] [--compare old.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import random
+import re
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from aiogram import Bot, Dispatcher
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.config import SERVICES
+from app.database.async_db import AsyncDatabase
+from app.database.fsm_storage import create_fsm_storage
+from app.handlers import register_handlers
+from app.services.availability import default_start_times, service_duration
+from benchmarks.fake_telegram import FakeTelegramAPI, percentiles, dump
+
+# Время в базе для текущего обновления: [секунды, число запросов]
+DB_USAGE = contextvars.ContextVar("db_usage", default=None)
+DAYS = 7
+SCENARIOS = ("booking", "cancel", "review")
+
+
+class TimedDatabase(AsyncDatabase):
+    """AsyncDatabase, учитывающая время запросов в контексте обновления"""
+
+    async def run(self, func, *args, **kwargs):
+        with self._track():
+            return await super().run(func, *args, **kwargs)
+
+    async def run_read(self, name, *args, **kwargs):
+        if self._reader_executor is None:
+            # Запрос уйдет в run и будет учтен там
+            return await super().run_read(name, *args, **kwargs)
+        with self._track():
+            return await super().run_read(name, *args, **kwargs)
+
+    @contextlib.contextmanager
+    def _track(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            usage = DB_USAGE.get()
+            if usage is not None:
+                usage[0] += time.perf_counter() - started
+                usage[1] += 1
+
+
+class Simulation:
+    def __init__(self, api, bot, dp, db):
+        self.api = api
+        self.bot = bot
+        self.dp = dp
+        self.db = db
+        # шаг -> списки задержек, времени в базе и числа запросов
+        self.latencies = defaultdict(list)
+        self.db_times = defaultdict(list)
+        self.db_queries = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def feed(self, step, update):
+        usage = [0.0, 0]
+        token = DB_USAGE.set(usage)
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_raw_update(self.bot, update)
+        finally:
+            self.latencies[step].append(time.perf_counter() - started)
+            self.db_times[step].append(usage[0])
+            self.db_queries[step].append(usage[1])
+            DB_USAGE.reset(token)
+
+    async def book(self, chat_id, service, master_id, day, slot):
+        api = self.api
+        await self.feed("start", api.message_update(chat_id, "/start"))
+        await self.feed("service", api.callback_update(chat_id, f"service_{service}"))
+        await self.feed("master", api.callback_update(chat_id, f"master_{master_id}"))
+        await self.feed("date", api.callback_update(chat_id, f"date_{day}"))
+        await self.feed("time", api.callback_update(chat_id, f"time_{slot}"))
+        await self.feed("confirm", api.callback_update(chat_id, "confirm_yes"))
+        match = re.search(r"Ваш ID: (\w+)", api.last_texts.get(chat_id, ""))
+        if not match:
+            self.errors["booking"] += 1
+            return None
+        return match.group(1)
+
+    async def cancel(self, chat_id, unique_id):
+        await self.feed("cancel_command", self.api.message_update(chat_id, "/cancel"))
+        await self.feed("cancel_id", self.api.message_update(chat_id, unique_id))
+        if "отменена" not in self.api.last_texts.get(chat_id, ""):
+            self.errors["cancel"] += 1
+
+    async def review(self, chat_id, unique_id):
+        await self.feed("review_rating", self.api.callback_update(chat_id, f"review_{unique_id}_5"))
+        await self.feed("review_comment", self.api.message_update(chat_id, "Отлично"))
+        if "Спасибо" not in self.api.last_texts.get(chat_id, ""):
+            self.errors["review"] += 1
+
+    async def user(self, i, scenario, slot):
+        chat_id = 100000 + i
+        unique_id = await self.book(chat_id, *slot)
+        if unique_id is None:
+            return
+        if scenario == "cancel":
+            await self.cancel(chat_id, unique_id)
+        elif scenario == "review":
+            await self.review(chat_id, unique_id)
+
+
+async def seed_masters(db, users):
+    """Мастера с таким запасом слотов, чтобы у каждого пользователя был свой"""
+    services = list(SERVICES)
+    per_master = DAYS * min(len(default_start_times(service_duration(s))) for s in services)
+    count = max(len(services), -(-users // per_master))
+    for i in range(count):
+        await db.add_master({
+            "first_name": f"Мастер{i}", "last_name": "Тестов",
+            "service": services[i % len(services)],
+            "telegram_id": 500000 + i, "username": None
+        })
+    rows = await db.run(lambda: db.sync.conn.execute(
+        "SELECT id, service FROM masters ORDER BY id"
+    ).fetchall())
+    first_day = date.today() + timedelta(days=1)
+    slots = [
+        (service, master_id, (first_day + timedelta(days=d)).strftime("%Y-%m-%d"), slot)
+        for master_id, service in rows
+        for d in range(DAYS)
+        for slot in default_start_times(service_duration(service))
+    ]
+    return slots
+
+
+async def run(users, concurrency, mix, seed):
+    api = FakeTelegramAPI()
+    await api.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        db = TimedDatabase(os.path.join(tmp, "bench.db"))
+        storage = create_fsm_storage(db)
+        bot = Bot(token="123456:BENCH", session=api.session())
+        dp = Dispatcher(storage=storage)
+        register_handlers(dp, bot, AsyncIOScheduler(), db)
+        await dp.emit_startup(bot=bot, dispatcher=dp)
+
+        slots = await seed_masters(db, users)
+        rng = random.Random(seed)
+        rng.shuffle(slots)
+        scenarios = rng.choices(SCENARIOS, weights=mix, k=users)
+
+        simulation = Simulation(api, bot, dp, db)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(i):
+            async with semaphore:
+                await simulation.user(i, scenarios[i], slots[i])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(limited(i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+
+        await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        await bot.session.close()
+        await storage.close()
+        db.close()
+    await api.stop()
+
+    updates = sum(len(samples) for samples in simulation.latencies.values())
+    return {
+        "users": users,
+        "concurrency": concurrency,
+        "scenarios": {name: scenarios.count(name) for name in SCENARIOS},
+        "updates": updates,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(updates / elapsed, 1),
+        "errors": dict(simulation.errors),
+        "steps": {
+            step: {
+                "count": len(samples),
+                "latency_ms": percentiles(samples),
+                "db_ms": percentiles(simulation.db_times[step]),
+                "db_queries": round(sum(simulation.db_queries[step]) / len(samples), 2),
+            }
+            for step, samples in simulation.latencies.items()
+        },
+    }
+
+
+def print_report(result, baseline=None):
+    print(
+        f"{result['users']} пользователей, {result['updates']} обновлений за "
+        f"{result['elapsed_s']}с: {result['throughput_rps']} обн/с"
+    )
+    if baseline:
+        print(f"  было: {baseline['throughput_rps']} обн/с")
+    if result["errors"]:
+        print(f"  ошибки: {result['errors']}")
+    print(f"{'шаг':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'БД p50':>9}{'БД p95':>9}{'запросов':>10}")
+    for step, stats in result["steps"].items():
+        latency, db_time = stats["latency_ms"], stats["db_ms"]
+        line = (
+            f"{step:<16}{latency['p50']:>9}{latency['p95']:>9}{latency['p99']:>9}"
+            f"{db_time['p50']:>9}{db_time['p95']:>9}{stats['db_queries']:>10}"
+        )
+        old = (baseline or {}).get("steps", {}).get(step)
+        if old and old["latency_ms"]["p50"]:
+            change = (latency["p50"] / old["latency_ms"]["p50"] - 1) * 100
+            line += f"  p50 {change:+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--mix", type=float, nargs=3, default=[0.5, 0.25, 0.25],
+                        metavar=("BOOKING", "CANCEL", "REVIEW"), help="доли сценариев")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего запуска для сравнения")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.users, args.concurrency, args.mix, args.seed))
+    if args.json:
+        dump(result)
+        return
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+
+if __name__ == "__main__":
+    main()
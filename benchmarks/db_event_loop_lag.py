@@ -0,0 +1,106 @@
+"""Задержка event loop при работе с базой из множества корутин.
+
+Запуск: python -m benchmarks.db_event_loop_lag --users 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from app.database.db import Database
+from app.database.async_db import AsyncDatabase
+
+SERVICE = "Маникюр"
+
+
+class SyncAdapter:
+    """Прямые вызовы Database внутри корутин (прежнее поведение)"""
+
+    def __init__(self, db_name):
+        self.db = Database(db_name)
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+
+        return call
+
+    def close(self):
+        self.db.close()
+
+
+async def simulate_user(db, user_id, master_ids):
+    """Один проход сценария записи: мастера, даты, время, подтверждение"""
+    await db.get_masters_by_service(SERVICE)
+    master_id = master_ids[user_id % len(master_ids)]
+    await db.get_master_by_id(master_id)
+    date = f"2030-01-{user_id % 28 + 1:02d}"
+    await db.get_master_day(master_id, date, user_id % 7)
+    await db.create_appointment({
+        'user_id': user_id,
+        'service': SERVICE,
+        'date': date,
+        'time': f"{11 + user_id % 12:02d}:00",
+        'unique_id': f"U{user_id:07d}",
+        'master_id': master_id,
+    })
+
+
+async def monitor_lag(samples, stop, interval=0.005):
+    """Измерение опоздания таймера event loop"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected) * 1000)
+
+
+async def run(adapter_cls, users):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = adapter_cls(os.path.join(tmp, "bench.db"))
+        for i in range(5):
+            await db.add_master({
+                'first_name': f"Мастер{i}", 'last_name': "Тест",
+                'service': SERVICE, 'telegram_id': 1000 + i, 'username': None,
+            })
+        master_ids = [master.id for master in await db.get_masters_by_service(SERVICE)]
+
+        samples, stop = [], asyncio.Event()
+        monitor = asyncio.create_task(monitor_lag(samples, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(simulate_user(db, i, master_ids) for i in range(users)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await monitor
+        db.close()
+
+    samples.sort()
+    return {
+        'elapsed_s': elapsed,
+        'lag_p50_ms': statistics.median(samples) if samples else 0.0,
+        'lag_p99_ms': samples[int(len(samples) * 0.99) - 1] if samples else 0.0,
+        'lag_max_ms': samples[-1] if samples else 0.0,
+        'ticks': len(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    for name, adapter in (("sync", SyncAdapter), ("async", AsyncDatabase)):
+        result = asyncio.run(run(adapter, args.users))
+        print(
+            f"{name:>5}: {args.users} пользователей за {result['elapsed_s']:.2f}с, "
+            f"тиков {result['ticks']}, задержка p50={result['lag_p50_ms']:.2f}мс "
+            f"p99={result['lag_p99_ms']:.2f}мс max={result['lag_max_ms']:.2f}мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
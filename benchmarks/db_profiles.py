@@ -0,0 +1,118 @@
+"""Пропускная способность SQLite для сценария записи при разных профилях подключения.
+
+Сравниваются:
+  * before  — профиль default, SELECT обернуты в with conn (прежнее поведение);
+  * default — профиль default, SELECT без транзакции;
+  * tuned   — WAL, synchronous=NORMAL, mmap, кэш страниц.
+
+Запуск: python -m benchmarks.db_profiles --bookings 2000 --reads 20000 [--json]
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+from app.database.db import Database
+from app.services.availability import default_start_times
+from benchmarks.fake_telegram import dump
+
+SERVICE = "Маникюр"
+MASTERS = 20
+
+
+def seed(db):
+    for i in range(MASTERS):
+        db.add_master({
+            "first_name": f"Мастер{i}", "last_name": "Тестов", "service": SERVICE,
+            "telegram_id": 700000 + i, "username": None
+        })
+    return [master.id for master in db.get_all_masters()]
+
+
+def slots(master_ids):
+    """Бесконечный перебор свободных слотов мастеров по дням"""
+    day = date.today() + timedelta(days=1)
+    while True:
+        for time_slot in default_start_times():
+            for master_id in master_ids:
+                yield master_id, day.strftime("%Y-%m-%d"), time_slot
+        day += timedelta(days=1)
+
+
+def transactional(db, method):
+    """Вызов метода чтения внутри with conn, как было до профилей"""
+    def call(*args):
+        with db.conn:
+            return method(*args)
+    return call
+
+
+def run_profile(name, bookings, reads):
+    profile = "default" if name == "before" else name
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, f"{name}.db"), profile=profile)
+        master_ids = seed(db)
+        read = (lambda method: transactional(db, method)) if name == "before" else (lambda method: method)
+
+        # Запись: бронирование и постановка уведомлений, как в AppointmentService
+        generator = slots(master_ids)
+        unique_ids = []
+        started = time.perf_counter()
+        for user_id in range(bookings):
+            master_id, day, time_slot = next(generator)
+            unique_id = uuid.uuid4().hex[:8].upper()
+            db.create_appointment({
+                "user_id": user_id, "service": SERVICE, "date": day, "time": time_slot,
+                "unique_id": unique_id, "master_id": master_id
+            })
+            db.add_notification_jobs(unique_id, [
+                ("reminder", f"{day} 09:00:00"), ("review", f"{day} 23:00:00")
+            ])
+            unique_ids.append(unique_id)
+        write_elapsed = time.perf_counter() - started
+
+        # Чтение: шаги пользователя при выборе мастера, даты и отмене
+        get_masters = read(db.get_masters_by_service)
+        get_day = read(db.get_master_day)
+        get_appointment = read(db.get_appointment_by_id)
+        get_fsm = read(db.get_fsm_record)
+        first_day = (date.today() + timedelta(days=1)).strftime("%Y-%m-%d")
+        first_weekday = (date.today() + timedelta(days=1)).weekday()
+        started = time.perf_counter()
+        for i in range(reads // 4):
+            get_masters(SERVICE)
+            get_day(master_ids[i % len(master_ids)], first_day, first_weekday)
+            get_appointment(unique_ids[i % len(unique_ids)])
+            get_fsm(f"bot:{i}:{i}")
+        read_elapsed = time.perf_counter() - started
+        db.close()
+
+    return {
+        "profile": name,
+        "bookings_per_s": round(bookings / write_elapsed, 1),
+        "reads_per_s": round(reads // 4 * 4 / read_elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--reads", type=int, default=20000)
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args()
+
+    results = [run_profile(name, args.bookings, args.reads) for name in ("before", "default", "tuned")]
+    if args.json:
+        dump(results)
+        return
+    for result in results:
+        print(
+            f"{result['profile']:>8}: {result['bookings_per_s']} записей/с, "
+            f"{result['reads_per_s']} чтений/с"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Влияние пула читателей на запись под тяжелыми чтениями.
+
+Параллельно выполняются тяжелые чтения (список отзывов с JOIN, выгрузка
+записей) и бронирования. Сравнивается работа через одно соединение
+(--readers 0) и через пул соединений только для чтения.
+
+Запуск: python -m benchmarks.db_readers --reviews 20000 --bookings 300 --readers 4 [--json]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+from app.database.async_db import AsyncDatabase
+from app.database.db import Database
+from app.services.availability import default_start_times
+from benchmarks.fake_telegram import percentiles, dump
+
+SERVICE = "Маникюр"
+READERS = 8
+ALL_TIMES = default_start_times()
+
+
+def seed(path, reviews):
+    db = Database(path)
+    db.add_master({
+        "first_name": "Мастер", "last_name": "Тестов", "service": SERVICE,
+        "telegram_id": 800000, "username": None
+    })
+    with db.conn:
+        db.conn.executemany('''
+            INSERT INTO appointments (user_id, service, date, time, unique_id, status, master_id)
+            VALUES (?, ?, '2020-01-01', '11:00', ?, 'canceled', 1)
+        ''', ((i, SERVICE, f"R{i:07d}") for i in range(reviews)))
+        db.conn.executemany('''
+            INSERT INTO reviews (appointment_id, user_id, rating, comment)
+            VALUES (?, ?, 5, 'Отлично')
+        ''', ((f"R{i:07d}", i) for i in range(reviews)))
+    db.close()
+
+
+async def run(path, readers, bookings):
+    db = AsyncDatabase(path, readers=readers)
+    stop = asyncio.Event()
+    reads = 0
+
+    async def reader():
+        nonlocal reads
+        while not stop.is_set():
+            await db.get_reviews_page(limit=5000)
+            await db.get_appointments_batch(0, 5000)
+            reads += 2
+
+    async def booker():
+        latencies = []
+        day = date.today() + timedelta(days=1)
+        for i in range(bookings):
+            slot = ALL_TIMES[i % len(ALL_TIMES)]
+            if i and i % len(ALL_TIMES) == 0:
+                day += timedelta(days=1)
+            started = time.perf_counter()
+            await db.create_appointment({
+                "user_id": i, "service": SERVICE, "date": day.strftime("%Y-%m-%d"),
+                "time": slot, "unique_id": uuid.uuid4().hex[:8].upper(), "master_id": 1
+            })
+            latencies.append(time.perf_counter() - started)
+        return latencies
+
+    readers_tasks = [asyncio.create_task(reader()) for _ in range(READERS)]
+    started = time.perf_counter()
+    latencies = await booker()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*readers_tasks)
+    db.close()
+    return {
+        "readers": readers,
+        "heavy_reads_per_s": round(reads / elapsed, 1),
+        "booking_latency_ms": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reviews", type=int, default=20000)
+    parser.add_argument("--bookings", type=int, default=300)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args()
+
+    results = []
+    for readers in (0, args.readers):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "readers.db")
+            seed(path, args.reviews)
+            results.append(asyncio.run(run(path, readers, args.bookings)))
+
+    if args.json:
+        dump(results)
+        return
+    for result in results:
+        latency = result["booking_latency_ms"]
+        print(
+            f"читателей {result['readers']}: {result['heavy_reads_per_s']} тяжелых чтений/с, "
+            f"запись p50={latency['p50']}мс p95={latency['p95']}мс p99={latency['p99']}мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Локальная имитация Telegram Bot API для нагрузочных тестов.
+
+Сервер принимает запросы бота (sendMessage, editMessageText, getUpdates, ...),
+отвечает правдоподобными объектами и сообщает тесту о каждом ответе бота.
+"""
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+from aiohttp import web
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "SalonBot", "username": "salon_bot"}
+
+
+class FakeTelegramAPI:
+    def __init__(self):
+        self.updates = []
+        self.updates_event = asyncio.Event()
+        self.next_update_id = 1
+        self.next_message_id = 1
+        # callback_query_id -> chat_id, чтобы связать answerCallbackQuery с пользователем
+        self.callback_chats = {}
+        # chat_id -> ожидающие ответа бота futures
+        self.waiters = defaultdict(list)
+        self.calls = defaultdict(int)
+        # chat_id -> текст последнего сообщения бота
+        self.last_texts = {}
+        self.runner = None
+        self.base_url = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    def session(self):
+        """Сессия aiogram, направляющая запросы бота на этот сервер"""
+        return AiohttpSession(api=TelegramAPIServer.from_base(self.base_url))
+
+    # Генерация обновлений
+    def message_update(self, chat_id, text):
+        update = {
+            "update_id": self._update_id(),
+            "message": {
+                "message_id": self._message_id(),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"},
+                "text": text,
+            },
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            update["message"]["entities"] = [
+                {"type": "bot_command", "offset": 0, "length": len(command)}
+            ]
+        return update
+
+    def callback_update(self, chat_id, data, message_id=1):
+        update_id = self._update_id()
+        callback_id = str(update_id)
+        self.callback_chats[callback_id] = chat_id
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": callback_id,
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"User{chat_id}"},
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": BOT_USER,
+                    "text": "...",
+                },
+            },
+        }
+
+    def push_update(self, update):
+        """Постановка обновления в очередь getUpdates (режим polling)"""
+        self.updates.append(update)
+        self.updates_event.set()
+
+    def wait_reply(self, chat_id):
+        """Future, который завершится при следующем ответе бота в чат"""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[chat_id].append(future)
+        return future
+
+    # Обработка запросов бота
+    async def handle(self, request):
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+        self.calls[method] += 1
+        handler = getattr(self, f"api_{method}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    async def api_getme(self, params):
+        return BOT_USER
+
+    async def api_getupdates(self, params):
+        offset = int(params.get("offset", 0))
+        timeout = float(params.get("timeout", 0))
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self.updates_event.clear()
+            try:
+                await asyncio.wait_for(self.updates_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit", 100))
+        return self.updates[:limit]
+
+    async def api_sendmessage(self, params):
+        chat_id = int(params["chat_id"])
+        self.last_texts[chat_id] = params.get("text", "")
+        self._notify(chat_id)
+        return self._message(chat_id, params.get("text", ""))
+
+    async def api_editmessagetext(self, params):
+        chat_id = int(params["chat_id"])
+        self.last_texts[chat_id] = params.get("text", "")
+        self._notify(chat_id)
+        message = self._message(chat_id, params.get("text", ""))
+        message["message_id"] = int(params.get("message_id", message["message_id"]))
+        return message
+
+    async def api_answercallbackquery(self, params):
+        chat_id = self.callback_chats.pop(params.get("callback_query_id"), None)
+        if chat_id is not None:
+            self._notify(chat_id)
+        return True
+
+    async def api_getchat(self, params):
+        chat_id = int(params["chat_id"])
+        return {"id": chat_id, "type": "private", "first_name": f"User{chat_id}", "username": None}
+
+    def _notify(self, chat_id):
+        waiters, self.waiters[chat_id] = self.waiters[chat_id], []
+        for future in waiters:
+            if not future.done():
+                future.set_result(time.perf_counter())
+
+    def _message(self, chat_id, text):
+        return {
+            "message_id": self._message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    def _update_id(self):
+        self.next_update_id += 1
+        return self.next_update_id
+
+    def _message_id(self):
+        self.next_message_id += 1
+        return self.next_message_id
+
+
+def percentiles(samples):
+    """p50/p95/p99/max в миллисекундах"""
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))] * 1000, 3)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1] * 1000, 3)}
+
+
+def dump(result):
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,44 @@
+"""Стоимость отрисовки клавиатур: построение заново против кэша.
+
+Запуск: python -m benchmarks.keyboards
+"""
+import timeit
+from datetime import date
+
+from app.keyboards import admin_kb, user_kb
+
+BOOKED = {"12:00", "15:00", "18:00"}
+SLOTS = [(f"{hour:02d}:00", f"{hour:02d}:00" not in BOOKED) for hour in range(11, 23)]
+
+CASES = [
+    ("get_services_kb", user_kb._build_services_kb, user_kb.get_services_kb),
+    ("get_confirmation_kb", user_kb._build_confirmation_kb, user_kb.get_confirmation_kb),
+    ("get_admin_main_kb", admin_kb._build_admin_main_kb, admin_kb.get_admin_main_kb),
+    ("get_admin_masters_kb", admin_kb._build_admin_masters_kb, admin_kb.get_admin_masters_kb),
+    (
+        "get_dates_kb",
+        lambda: user_kb._build_dates_kb.__wrapped__(date.today()),
+        user_kb.get_dates_kb,
+    ),
+    (
+        "get_times_kb",
+        lambda: user_kb._build_times_kb.__wrapped__(tuple(SLOTS)),
+        lambda: user_kb.get_times_kb("2030-01-01", SLOTS),
+    ),
+]
+
+
+def per_call_us(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    print(f"{'клавиатура':<22}{'без кэша, мкс':>16}{'с кэшем, мкс':>16}{'ускорение':>12}")
+    for name, build, cached in CASES:
+        uncached_us = per_call_us(build, 200)
+        cached_us = per_call_us(cached, 20000)
+        print(f"{name:<22}{uncached_us:>16.1f}{cached_us:>16.2f}{uncached_us / cached_us:>11.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Нагрузочный тест приема обновлений: webhook против polling.
+
+Генератор отправляет /start от множества пользователей и измеряет время
+от появления обновления до ответа бота в фейковом Bot API.
+
+Запуск: python -m benchmarks.webhook_load --users 1000 --rate 200 [--mode webhook|polling|both] [--json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.database.async_db import AsyncDatabase
+from app.database.fsm_storage import create_fsm_storage
+from app.handlers import register_handlers
+from app.webhook import WebhookServer
+from benchmarks.fake_telegram import FakeTelegramAPI, percentiles, dump
+
+SECRET = "bench-secret"
+
+
+async def build_bot(api, tmp):
+    db = AsyncDatabase(os.path.join(tmp, "bench.db"))
+    storage = create_fsm_storage(db)
+    bot = Bot(token="123456:BENCH", session=api.session())
+    dp = Dispatcher(storage=storage)
+    register_handlers(dp, bot, AsyncIOScheduler(), db)
+    return db, storage, bot, dp
+
+
+async def generate(users, rate, deliver, api):
+    """Отправка /start от users пользователей с частотой rate в секунду"""
+    latencies = []
+
+    async def one(chat_id):
+        reply = api.wait_reply(chat_id)
+        started = time.perf_counter()
+        await deliver(api.message_update(chat_id, "/start"))
+        latencies.append(await asyncio.wait_for(reply, 30) - started)
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(users):
+        tasks.append(asyncio.create_task(one(100000 + i)))
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return latencies, time.perf_counter() - started
+
+
+async def run_webhook(api, bot, dp, users, rate, concurrency):
+    server = WebhookServer(dp, bot, secret=SECRET, concurrency=concurrency)
+    runner = web.AppRunner(server.create_app("/webhook"), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/webhook"
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+
+    async with aiohttp.ClientSession() as session:
+        async def deliver(update):
+            async with session.post(
+                url, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}
+            ) as response:
+                response.raise_for_status()
+
+        result = await generate(users, rate, deliver, api)
+
+    await server.drain()
+    await runner.cleanup()
+    await dp.emit_shutdown(bot=bot, dispatcher=dp)
+    await bot.session.close()
+    return result
+
+
+async def run_polling(api, bot, dp, users, rate):
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+    await asyncio.sleep(0.5)
+
+    async def deliver(update):
+        api.push_update(update)
+
+    result = await generate(users, rate, deliver, api)
+    await dp.stop_polling()
+    await polling
+    return result
+
+
+async def run(mode, users, rate, concurrency):
+    api = FakeTelegramAPI()
+    await api.start()
+    with tempfile.TemporaryDirectory() as tmp:
+        db, storage, bot, dp = await build_bot(api, tmp)
+        if mode == "webhook":
+            latencies, elapsed = await run_webhook(api, bot, dp, users, rate, concurrency)
+        else:
+            latencies, elapsed = await run_polling(api, bot, dp, users, rate)
+        await storage.close()
+        db.close()
+    await api.stop()
+    return {
+        "mode": mode,
+        "users": users,
+        "rate": rate,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": percentiles(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mode", choices=["webhook", "polling", "both"], default="both")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--json", action="store_true", help="вывести результат в JSON")
+    args = parser.parse_args()
+
+    if args.mode == "both":
+        # Роутеры aiogram подключаются к диспетчеру один раз, поэтому режимы
+        # запускаются в отдельных процессах
+        results = []
+        for mode in ("webhook", "polling"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.webhook_load", "--mode", mode,
+                 "--users", str(args.users), "--rate", str(args.rate),
+                 "--concurrency", str(args.concurrency), "--json"],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results.append(json.loads(output))
+    else:
+        results = [asyncio.run(run(args.mode, args.users, args.rate, args.concurrency))]
+
+    if args.json:
+        dump(results[0] if len(results) == 1 else results)
+        return
+    for result in results:
+        latency = result["latency_ms"]
+        print(
+            f"{result['mode']:>8}: {result['throughput_rps']} обн/с, "
+            f"p50={latency['p50']}мс p95={latency['p95']}мс "
+            f"p99={latency['p99']}мс max={latency['max']}мс"
+        )
+
+
+if __name__ == "__main__":
+    main()
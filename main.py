@@ -1,5 +1,11 @@
-from app.main import main
 import asyncio
+import sys
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    if len(sys.argv) > 1:
+        # Команды импорта и выгрузки данных (без загрузки aiogram)
+        from app.cli import run_cli
+        sys.exit(run_cli(sys.argv[1:]))
+
+    from app.main import main
+    asyncio.run(main())